@@ -0,0 +1,229 @@
+"""
+QUARTERLY TO ANNUAL AGGREGATION
+===============================
+Bank-year table built from the sorted quarterly panel (panel.build_panel)
+with the reporting semantics of each field, instead of a plain mean of
+every column per (bank, year, tier):
+
+    flows    RIAD income-statement items, reported year-to-date. The annual
+             value is the Q4 year-to-date figure (annualized from the last
+             quarter for partial years); quarterly values are the
+             de-cumulated differences, and trailing-twelve-month (TTM)
+             values the sum of the last four of them.
+    stocks   RCON/RCFD balance-sheet items and the merged split columns,
+             reported at end of quarter. The annual value is the year-end
+             (last quarter) value, or the average over the year.
+    ratios   recomputed from the annual flows and stocks with the ratio
+             registry; ratios whose inputs are missing fall back to the mean
+             of the quarterly ratio.
+
+Each bank-year is one row. Its tier is the tier at year end, so a tier
+change mid-year no longer splits the bank-year in two. Everything is a
+grouped NumPy operation over contiguous (bank, year) blocks of the panel.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from panel import BANK_COL, NAME_COL, TIER_COL, block_offsets
+from ratios import ADDITIONAL_RATIOS, CORE_RATIOS, evaluate_ratios, required_columns
+from split_columns import SPLIT_PAIRS
+
+FLOW_PATTERN = re.compile(r'^riad', re.IGNORECASE)
+STOCK_PATTERN = re.compile(r'^(rcon|rcfd)', re.IGNORECASE)
+STOCK_COLUMNS = {new_name for _, _, new_name in SPLIT_PAIRS}
+RATIO_SPECS = CORE_RATIOS + ADDITIONAL_RATIOS
+
+
+def field_kind(column):
+    """'flow' (year-to-date), 'stock' (end of quarter) or 'other'."""
+    if FLOW_PATTERN.match(column):
+        return 'flow'
+    if STOCK_PATTERN.match(column) or column in STOCK_COLUMNS:
+        return 'stock'
+    return 'other'
+
+
+def _periods(panel):
+    """Quarter count since year 0 (consecutive quarters differ by 1), as int64."""
+    years = panel['year'].to_numpy(dtype=np.int64)
+    quarters = panel['quarter'].to_numpy(dtype=np.int64)
+    return years * 4 + quarters - 1
+
+
+# ============================================================================
+# QUARTERLY FLOWS
+# ============================================================================
+
+def decumulate(ytd, banks, periods):
+    """
+    Quarterly flows from year-to-date values (1-D, or 2-D with one column per
+    field) sorted by (bank, period).
+
+    Q1 keeps its year-to-date value; later quarters are the difference from
+    the previous quarter of the same bank and year, and NaN when that
+    quarter is missing.
+    """
+    ytd = np.asarray(ytd, dtype=float)
+    flows = ytd.copy()
+    quarter = periods % 4
+    follows = np.zeros(len(periods), dtype=bool)
+    follows[1:] = (banks[1:] == banks[:-1]) & (periods[1:] == periods[:-1] + 1)
+    later = quarter > 0
+    flows[later] = np.nan
+    rows = np.flatnonzero(later & follows)
+    flows[rows] = ytd[rows] - ytd[rows - 1]
+    return flows
+
+
+def trailing_sum(flows, banks, periods, window=4):
+    """
+    Sum of each row and the ``window - 1`` rows before it when they are the
+    same bank's consecutive quarters with no missing values; NaN otherwise.
+    """
+    flows = np.asarray(flows, dtype=float)
+    squeeze = flows.ndim == 1
+    flows = flows.reshape(len(flows), -1)
+    n = len(flows)
+    result = np.full(flows.shape, np.nan)
+    if n < window:
+        return result[:, 0] if squeeze else result
+
+    observed = ~np.isnan(flows)
+    sums = np.vstack([np.zeros((1, flows.shape[1])), np.cumsum(np.where(observed, flows, 0.0), axis=0)])
+    counts = np.vstack([np.zeros((1, flows.shape[1])), np.cumsum(observed, axis=0)])
+    end = np.arange(window - 1, n)
+    start = end - (window - 1)
+    contiguous = (banks[end] == banks[start]) & (periods[end] - periods[start] == window - 1)
+    window_sums = sums[end + 1] - sums[start]
+    complete = (counts[end + 1] - counts[start]) == window
+    result[end] = np.where(contiguous[:, None] & complete, window_sums, np.nan)
+    return result[:, 0] if squeeze else result
+
+
+def add_quarterly_flows(panel, columns=None, ttm=True, bank_col=BANK_COL):
+    """
+    Add '<col>_q' quarterly flows (and '<col>_ttm' when ``ttm``) for YTD columns.
+
+    ``panel`` must be sorted by (bank, year, quarter), as from build_panel.
+    """
+    columns = [col for col in (columns or panel.columns) if field_kind(col) == 'flow']
+    banks = panel[bank_col].to_numpy()
+    periods = _periods(panel)
+    ytd = panel[columns].to_numpy(dtype=float)
+    flows = decumulate(ytd, banks, periods)
+    new = {f'{col}_q': flows[:, j] for j, col in enumerate(columns)}
+    if ttm:
+        trailing = trailing_sum(flows, banks, periods)
+        new.update({f'{col}_ttm': trailing[:, j] for j, col in enumerate(columns)})
+    return panel.assign(**new)
+
+
+# ============================================================================
+# ANNUAL TABLE
+# ============================================================================
+
+def _block_mean(values, starts):
+    observed = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(observed, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(observed, starts, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / counts
+
+
+def aggregate_annual(panel, features, stock_method='last', partial_years='annualize',
+                     ratio_specs=RATIO_SPECS, bank_col=BANK_COL, name_col=NAME_COL, tier_col=TIER_COL,
+                     verbose=True):
+    """
+    One row per (bank, year) from a panel sorted by (bank, year, quarter).
+
+    Parameters:
+    -----------
+    panel : quarterly DataFrame from panel.build_panel (with sticky tiers)
+    features : feature columns to aggregate
+    stock_method : 'last' (year-end value) or 'mean' (average of the quarters)
+    partial_years : flows for years whose last report is before Q4:
+                    'annualize' scales the latest year-to-date value by 4 / quarter,
+                    'nan' leaves them missing
+    ratio_specs : ratio registry entries recomputed from the annual values
+
+    Returns:
+    --------
+    annual : DataFrame with bank_col, year, tier_col (year end), name_col,
+             n_quarters, has_q4 and ``features``
+    """
+    if stock_method not in ('last', 'mean'):
+        raise ValueError(f"stock_method must be 'last' or 'mean', got {stock_method!r}")
+    if partial_years not in ('annualize', 'nan'):
+        raise ValueError(f"partial_years must be 'annualize' or 'nan', got {partial_years!r}")
+
+    banks = panel[bank_col].to_numpy()
+    years = panel['year'].to_numpy(dtype=np.int64)
+    quarters = panel['quarter'].to_numpy(dtype=np.int64)
+    offsets = block_offsets(banks, years)
+    starts, last = offsets[:-1], offsets[1:] - 1
+    has_q4 = quarters[last] == 4 if len(panel) else np.zeros(0, dtype=bool)
+
+    ratio_specs = [spec for spec in ratio_specs if spec['name'] in features]
+    ratio_names = {spec['name'] for spec in ratio_specs}
+    kinds = {col: field_kind(col) for col in features}
+    flows = [col for col in features if kinds[col] == 'flow']
+    stocks = [col for col in features if kinds[col] == 'stock']
+    others = [col for col in features if kinds[col] == 'other' and col not in ratio_names]
+
+    columns = {
+        bank_col: banks[starts],
+        'year': years[starts],
+    }
+    if tier_col in panel.columns:
+        columns[tier_col] = panel[tier_col].iloc[last].reset_index(drop=True)
+    if name_col in panel.columns:
+        columns[name_col] = panel[name_col].iloc[last].reset_index(drop=True)
+    columns['n_quarters'] = np.diff(offsets)
+    columns['has_q4'] = has_q4
+
+    values = {}
+    if len(starts):
+        if flows:
+            ytd = panel[flows].to_numpy(dtype=float)[last]
+            if partial_years == 'annualize':
+                ytd *= (4 / quarters[last])[:, None]
+            else:
+                ytd[~has_q4] = np.nan
+            values.update(zip(flows, ytd.T))
+        if stocks:
+            stock_values = panel[stocks].to_numpy(dtype=float)
+            annual_stocks = stock_values[last] if stock_method == 'last' else _block_mean(stock_values, starts)
+            values.update(zip(stocks, annual_stocks.T))
+        if others:
+            values.update(zip(others, _block_mean(panel[others].to_numpy(dtype=float), starts).T))
+    else:
+        values = {col: np.empty(0) for col in flows + stocks + others}
+
+    annual = pd.DataFrame({**columns, **values})
+
+    # Ratios from annual components where every input was aggregated above
+    available = set(flows + stocks)
+    recomputed = [spec for spec in ratio_specs if set(required_columns([spec])) <= available]
+    evaluate_ratios(annual, recomputed)
+    averaged = [spec['name'] for spec in ratio_specs if spec not in recomputed]
+    if averaged:
+        means = _block_mean(panel[averaged].to_numpy(dtype=float), starts) if len(starts) \
+            else np.empty((0, len(averaged)))
+        for j, col in enumerate(averaged):
+            annual[col] = means[:, j]
+
+    annual = annual[list(columns) + [col for col in features if col in annual.columns]]
+
+    if verbose:
+        print(f"\n{'='*80}")
+        print("AGGREGATING QUARTERS TO BANK-YEARS")
+        print(f"{'='*80}")
+        print(f"✓ {len(annual):,} bank-years from {len(panel):,} quarterly rows")
+        print(f"  Flows (Q4 year-to-date): {len(flows)} | Stocks ({stock_method}): {len(stocks)} | "
+              f"Ratios recomputed: {len(recomputed)} | Averaged: {len(others) + len(averaged)}")
+        print(f"  Bank-years without Q4 (flows {'annualized' if partial_years == 'annualize' else 'NaN'}): "
+              f"{int((~has_q4).sum()):,}")
+    return annual
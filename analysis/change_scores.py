@@ -0,0 +1,360 @@
+"""
+INNOVATION CHANGE SCORES
+========================
+Batched first/last/change and trend features for the bank-year panel.
+
+Every statistic is computed for all banks and all features at once from a
+single stable sort of the bank-year frame: first/last values are gathered at
+the group offsets, and per-bank OLS slopes, CAGR and volatility come from
+grouped sums (``np.add.reduceat``) rather than a Python loop per bank.
+
+``calculate_rolling_change_scores`` computes the same features over every
+fixed-length window of each bank (one row per bank and window end year),
+using shifted sums over the same sorted array.
+"""
+
+import numpy as np
+import pandas as pd
+
+from tiers import group_offsets
+
+TREND_SUFFIXES = ('_slope', '_cagr', '_volatility')
+
+
+# ============================================================================
+# ARRAY ENGINE
+# ============================================================================
+
+def grouped_trends(values, years, offsets):
+    """
+    Per-group OLS slope, CAGR and volatility for every column of ``values``.
+
+    Parameters:
+    -----------
+    values : (n_rows, n_features) float array sorted by (group, year)
+    years : (n_rows,) array of years aligned with ``values``
+    offsets : group offsets as returned by ``tiers.group_offsets``
+
+    Returns:
+    --------
+    slope, cagr, volatility : (n_groups, n_features) float arrays
+
+    Missing values are ignored. The slope is the least-squares change per
+    year; CAGR compounds first to last over the elapsed years and is NaN
+    unless both endpoints are positive; volatility is the sample standard
+    deviation of the bank's values.
+    """
+    values = np.asarray(values, dtype=float)
+    n_groups = len(offsets) - 1
+    if n_groups == 0:
+        empty = np.empty((0, values.shape[1]))
+        return empty, empty.copy(), empty.copy()
+
+    starts = offsets[:-1]
+    x, t, observed = _trend_inputs(values, years)
+    n, sum_t, sum_tt, sum_x = [np.add.reduceat(column, starts, axis=0) for column in
+                               (observed.astype(float), t, t * t, x)]
+    # Second pass on values centred on each bank's mean
+    centre = np.repeat(_mean(sum_x, n), np.diff(offsets), axis=0)
+    d = np.where(observed, x - centre, 0.0)
+    sum_x, sum_tx, sum_xx = [np.add.reduceat(column, starts, axis=0) for column in (d, t * d, d * d)]
+
+    years = np.asarray(years, dtype=float)
+    span = years[offsets[1:] - 1] - years[starts]
+    return _trend_statistics(n, sum_t, sum_x, sum_tt, sum_tx, sum_xx,
+                             values[starts], values[offsets[1:] - 1], span)
+
+
+def _trend_inputs(values, years):
+    observed = ~np.isnan(values)
+    x = np.where(observed, values, 0.0)
+    # Centre years to keep the normal equations well conditioned
+    t = np.asarray(years, dtype=float)[:, None] - float(np.nanmin(years))
+    t = np.where(observed, t, 0.0)
+    return x, t, observed
+
+
+def _mean(total, n):
+    return np.divide(total, n, out=np.zeros_like(total), where=n > 0)
+
+
+def _trend_statistics(n, sum_t, sum_x, sum_tt, sum_tx, sum_xx, first, last, span):
+    """
+    OLS slope, CAGR and volatility from per-group sums and endpoints.
+
+    The x sums are of values centred on the group mean: raw sums of squares
+    of large, slowly varying values cancel catastrophically in the variance.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = n * sum_tt - sum_t ** 2
+        slope = np.where(denom > 0, (n * sum_tx - sum_t * sum_x) / denom, np.nan)
+
+        variance = (sum_xx - sum_x ** 2 / n) / (n - 1)
+        volatility = np.where(n > 1, np.sqrt(variance), np.nan)
+
+        growth = (last / first) ** (1.0 / span[:, None]) - 1
+        valid = (first > 0) & (last > 0) & (span[:, None] > 0)
+        cagr = np.where(valid, growth, np.nan)
+
+    return slope, cagr, volatility
+
+
+def window_starts(banks, years, window):
+    """
+    For rows sorted by (bank, year), one row per bank-year: the first row of
+    the same bank with year >= year - window, and whether that row is
+    exactly ``window`` years earlier.
+    """
+    banks = np.asarray(banks, dtype=np.int64)
+    years = np.asarray(years, dtype=np.int64)
+    if len(years) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=bool)
+    # Each bank's keys sit in their own range, wider than any window
+    span = int(years.max() - years.min()) + window + 1
+    keys = banks * span + (years - years.min())
+    if np.any(keys[1:] <= keys[:-1]):
+        raise ValueError("Rows must be sorted by (bank, year) with one row per bank-year")
+    target = keys - window
+    start = np.searchsorted(keys, target)
+    return start, keys[start] == target
+
+
+def rolling_trends(values, years, start):
+    """
+    Slope, CAGR and volatility over rows ``start[i]..i`` for every row ``i``
+    (windows from ``window_starts``).
+
+    A window holds at most ``window + 1`` rows, so its sums are built from
+    that many shifted copies of the array instead of a loop per bank and
+    window (prefix-sum differences would lose precision on large values).
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        empty = np.empty((0, values.shape[1]))
+        return empty, empty.copy(), empty.copy()
+
+    x, t, observed = _trend_inputs(values, years)
+    rows = np.arange(len(values))
+    lags = [(lag, rows[lag:] - lag >= start[lag:])
+            for lag in range(1, int((rows - start).max(initial=0)) + 1)]
+    columns = (observed.astype(float), t, t * t, x)
+    n, sum_t, sum_tt, sum_x = [column.copy() for column in columns]
+    for lag, inside in lags:
+        for total, column in zip((n, sum_t, sum_tt, sum_x), columns):
+            total[lag:][inside] += column[:-lag][inside]
+
+    # Second pass on values centred on each window's mean (window i ends at row i)
+    centre = _mean(sum_x, n)
+    d = np.where(observed, x - centre, 0.0)
+    sum_x, sum_tx, sum_xx = d.copy(), t * d, d * d
+    for lag, inside in lags:
+        d = np.where(observed[:-lag], x[:-lag] - centre[lag:], 0.0)[inside]
+        sum_x[lag:][inside] += d
+        sum_tx[lag:][inside] += t[:-lag][inside] * d
+        sum_xx[lag:][inside] += d * d
+
+    years = np.asarray(years, dtype=float)
+    return _trend_statistics(n, sum_t, sum_x, sum_tt, sum_tx, sum_xx,
+                             values[start], values, years - years[start])
+
+
+# ============================================================================
+# DATAFRAME INTERFACE
+# ============================================================================
+
+def _bank_year_order(df, bank_col, offsets=None):
+    """Row order sorting ``df`` by (bank, year), the bank offsets in that order and the bank ids."""
+    if offsets is None:
+        # Banks keep their order of first appearance; rows within a bank are sorted by year
+        bank_codes, bank_ids = pd.factorize(df[bank_col], sort=False)
+        order = np.lexsort((df['year'].to_numpy(), bank_codes))
+        order = order[bank_codes[order] >= 0]
+        sorted_codes = bank_codes[order]
+        offsets = group_offsets(sorted_codes)
+        return order, offsets, np.asarray(bank_ids)[sorted_codes[offsets[:-1]]]
+    return np.arange(len(df)), offsets, df[bank_col].to_numpy()[offsets[:-1]]
+
+def calculate_innovation_change_scores(df, feature_list, min_years=10, trends=False,
+                                       bank_col='rssd9001', offsets=None, verbose=True):
+    """
+    Calculate change in innovation metrics from first to last year for each bank.
+    Each bank will appear ONCE in the output.
+
+    Parameters:
+    -----------
+    df : DataFrame with bank-year observations
+    feature_list : list of features to calculate changes for
+    min_years : minimum number of years a bank must have data for (default 10)
+    trends : bool, also add per-bank '_slope', '_cagr' and '_volatility' columns
+    bank_col : str, column identifying a bank
+    offsets : per-bank offsets when ``df`` is already sorted by (bank, year),
+              e.g. the output of ``annual.aggregate_annual``
+    verbose : bool, print the summary
+
+    Returns:
+    --------
+    df_changes : DataFrame with one row per bank showing feature changes
+    """
+    if verbose:
+        print(f"\n{'='*80}")
+        print("CALCULATING INNOVATION CHANGE SCORES (2010-2021)")
+        print(f"{'='*80}")
+
+    features = [feat for feat in feature_list if feat in df.columns]
+
+    order, offsets, bank_ids = _bank_year_order(df, bank_col, offsets)
+    counts = np.diff(offsets)
+    keep = counts >= min_years
+    first_idx = order[offsets[:-1][keep]]
+    last_idx = order[offsets[1:][keep] - 1]
+
+    years = df['year'].to_numpy()
+    bank_ids = bank_ids[keep]
+
+    columns = {
+        bank_col: bank_ids,
+        'rssd9017_name': df['rssd9017'].to_numpy()[first_idx] if 'rssd9017' in df.columns else bank_ids,
+        'bank_tier': df['bank_tier'].to_numpy()[last_idx],
+        'first_year': years[first_idx],
+        'last_year': years[last_idx],
+        'years_observed': counts[keep],
+    }
+
+    values = df[features].to_numpy(dtype=float)
+    first = values[first_idx]
+    last = values[last_idx]
+    change = last - first
+
+    if trends:
+        slope, cagr, volatility = (stat[keep] for stat in
+                                   grouped_trends(values[order], years[order], offsets))
+
+    for j, feat in enumerate(features):
+        columns[f'{feat}_change'] = change[:, j]
+        columns[f'{feat}_first'] = first[:, j]
+        columns[f'{feat}_last'] = last[:, j]
+        if trends:
+            columns[f'{feat}_slope'] = slope[:, j]
+            columns[f'{feat}_cagr'] = cagr[:, j]
+            columns[f'{feat}_volatility'] = volatility[:, j]
+
+    df_changes = pd.DataFrame(columns)
+
+    if not verbose:
+        return df_changes
+
+    banks_processed = int(keep.sum())
+    banks_excluded = len(keep) - banks_processed
+    print(f"\n✓ Processed {banks_processed:,} banks")
+    print(f"✗ Excluded {banks_excluded:,} banks (less than {min_years} years of data)")
+    print(f"\nTier distribution:")
+    tier_counts = df_changes['bank_tier'].value_counts()
+    for tier in ['Small', 'Medium', 'Large']:
+        if tier in tier_counts.index:
+            print(f"  {tier:8s}: {tier_counts[tier]:>6,} banks")
+
+    # Check for missing values in change scores
+    change_cols = [col for col in df_changes.columns if col.endswith('_change')]
+    missing_pct = (df_changes[change_cols].isna().sum().sum() /
+                   (len(df_changes) * len(change_cols))) * 100
+    print(f"\nMissing values in change scores: {missing_pct:.2f}%")
+
+    return df_changes
+
+
+def calculate_rolling_change_scores(df, feature_list, window=3, trends=False,
+                                    bank_col='rssd9001', offsets=None, verbose=True):
+    """
+    Change in innovation metrics over every ``window``-year span of each bank.
+
+    One row per (bank, window end year) whose bank also has a row exactly
+    ``window`` years earlier, so banks with short histories still contribute
+    and the rows trace when a bank's metrics moved. Windows are located with
+    one ``searchsorted`` over the sorted bank-year keys and the trend
+    statistics from ``window + 1`` shifted sums, so the cost stays a few
+    passes over the panel rather than a loop per bank. A window never reaches across a gap at its
+    start; a bank missing the start year has no window ending that year.
+
+    Parameters:
+    -----------
+    df : DataFrame with bank-year data
+    feature_list : list of feature names to track
+    window : int, years between the window's first and last year
+    trends : bool, also add _slope, _cagr and _volatility over each window
+    bank_col : str, bank identifier column
+    offsets : per-bank offsets when ``df`` is already sorted by (bank, year)
+    verbose : bool, print the summary
+
+    Returns:
+    --------
+    df_windows : DataFrame with one row per bank-window: bank_col,
+                 rssd9017_name, bank_tier (tier in the end year),
+                 window_start, window_end, years_observed and the same
+                 per-feature columns as calculate_innovation_change_scores
+    """
+    if verbose:
+        print(f"\n{'='*80}")
+        print(f"CALCULATING ROLLING {window}-YEAR CHANGE SCORES")
+        print(f"{'='*80}")
+
+    if window < 1:
+        raise ValueError(f"window must be at least 1 year, got {window}")
+
+    features = [feat for feat in feature_list if feat in df.columns]
+    order, offsets, bank_ids = _bank_year_order(df, bank_col, offsets)
+
+    counts = np.diff(offsets)
+    codes = np.repeat(np.arange(len(counts)), counts)
+    years = df['year'].to_numpy()[order]
+    start, exact = window_starts(codes, years, window)
+    end_rows = np.flatnonzero(exact)
+
+    last_idx = order[end_rows]
+    columns = {
+        bank_col: bank_ids[codes[end_rows]],
+        'rssd9017_name': df['rssd9017'].to_numpy()[last_idx] if 'rssd9017' in df.columns
+        else bank_ids[codes[end_rows]],
+        'bank_tier': df['bank_tier'].to_numpy()[last_idx],
+        'window_start': years[start[end_rows]],
+        'window_end': years[end_rows],
+        'years_observed': end_rows - start[end_rows] + 1,
+    }
+
+    values = df[features].to_numpy(dtype=float)[order]
+    first = values[start[end_rows]]
+    last = values[end_rows]
+    change = last - first
+
+    if trends:
+        slope, cagr, volatility = (stat[end_rows] for stat in
+                                   rolling_trends(values, years, start))
+
+    for j, feat in enumerate(features):
+        columns[f'{feat}_change'] = change[:, j]
+        columns[f'{feat}_first'] = first[:, j]
+        columns[f'{feat}_last'] = last[:, j]
+        if trends:
+            columns[f'{feat}_slope'] = slope[:, j]
+            columns[f'{feat}_cagr'] = cagr[:, j]
+            columns[f'{feat}_volatility'] = volatility[:, j]
+
+    df_windows = pd.DataFrame(columns)
+
+    if not verbose:
+        return df_windows
+
+    banks_with_windows = df_windows[bank_col].nunique()
+    print(f"\n✓ {len(df_windows):,} bank-windows from {banks_with_windows:,} banks")
+    print(f"✗ {len(counts) - banks_with_windows:,} banks have no {window}-year window")
+    print(f"\nTier distribution (bank-windows):")
+    tier_counts = df_windows['bank_tier'].value_counts()
+    for tier in ['Small', 'Medium', 'Large']:
+        if tier in tier_counts.index:
+            print(f"  {tier:8s}: {tier_counts[tier]:>7,}")
+
+    change_cols = [col for col in df_windows.columns if col.endswith('_change')]
+    if len(df_windows) and change_cols:
+        missing_pct = df_windows[change_cols].isna().to_numpy().mean() * 100
+        print(f"\nMissing values in change scores: {missing_pct:.2f}%")
+
+    return df_windows
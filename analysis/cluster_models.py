@@ -0,0 +1,316 @@
+"""
+PER-TIER CLUSTER MODELS
+=======================
+Fits, saves and reuses the per-tier StandardScaler -> UMAP -> HDBSCAN models
+behind the innovation clusters.
+
+Each tier gets its own UMAP reducer (the notebook used to reuse one reducer
+across tiers, so only the last tier's fit survived). Fitted models are saved
+as versioned joblib artifacts under data/models/<version>/, together with the
+training embedding and labels. New or updated banks are then scored with
+``scaler.transform`` + ``reducer.transform`` and an approximate HDBSCAN
+assignment, without refitting, so existing cluster labels stay stable. The
+hand-assigned names in bank_innovation_clusters_named.csv are carried over to
+a new fit by member overlap (match_cluster_names), never by bare label.
+
+sklearn's HDBSCAN has no ``approximate_predict``. A new point takes the label
+of its nearest training point in the embedding, provided it lies within that
+cluster's largest core distance; otherwise it is noise (-1).
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import umap
+from sklearn.cluster import HDBSCAN
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
+
+from wrds_cache import DATA_DIR
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MODEL_DIR = os.path.join(DATA_DIR, 'models')
+CLUSTER_NAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'bank_innovation_clusters_named.csv')
+
+# Minimum member Jaccard for a new cluster to inherit a hand-assigned name
+MIN_NAME_JACCARD = 0.5
+
+UMAP_PARAMS = {'n_neighbors': 15, 'min_dist': 0.1, 'metric': 'euclidean', 'random_state': 42}
+
+# HDBSCAN params based on tier size
+HDBSCAN_PARAMS = {
+    'Large': {'min_cluster_size': 15, 'min_samples': 3},   # Lower for small sample
+    'Medium': {'min_cluster_size': 30, 'min_samples': 5},
+    'Small': {'min_cluster_size': 50, 'min_samples': 10},
+}
+
+
+# ============================================================================
+# FIT
+# ============================================================================
+
+def _core_distances(embedding, min_samples):
+    """Distance to the min_samples-th neighbour (self included, as HDBSCAN does)."""
+    k = min(min_samples, len(embedding))
+    distances, _ = NearestNeighbors(n_neighbors=k).fit(embedding).kneighbors(embedding)
+    return distances[:, -1]
+
+
+def fit_tier_model(features, umap_params=UMAP_PARAMS, hdbscan_params=None):
+    """
+    Fit scaler, UMAP and HDBSCAN for one tier.
+
+    Returns:
+    --------
+    model : dict with 'scaler', 'reducer', 'embedding', 'labels', 'nn',
+            'cluster_radius' and the parameters used
+    """
+    hdbscan_params = hdbscan_params or HDBSCAN_PARAMS['Small']
+    scaler = StandardScaler()
+    scaled = scaler.fit_transform(features)
+    reducer = umap.UMAP(**umap_params)
+    embedding = reducer.fit_transform(scaled)
+
+    clusterer = HDBSCAN(cluster_selection_method='eom', **hdbscan_params)
+    labels = clusterer.fit_predict(embedding)
+
+    core = _core_distances(embedding, hdbscan_params['min_samples'])
+    cluster_radius = {int(c): float(core[labels == c].max()) for c in np.unique(labels) if c != -1}
+
+    return {
+        'scaler': scaler,
+        'reducer': reducer,
+        'embedding': embedding,
+        'labels': labels,
+        'nn': NearestNeighbors(n_neighbors=1).fit(embedding),
+        'cluster_radius': cluster_radius,
+        'umap_params': dict(umap_params),
+        'hdbscan_params': dict(hdbscan_params),
+    }
+
+
+def tier_umap_params(umap_params, tier):
+    """UMAP settings for one tier from a shared dict or a {tier: dict} mapping (e.g. sweep.umap_params_from)."""
+    if umap_params and all(isinstance(value, dict) for value in umap_params.values()):
+        return {**UMAP_PARAMS, **umap_params.get(tier, {})}
+    return umap_params
+
+
+def fit_tier_models(df_changes, feature_cols, tier_col='bank_tier',
+                    umap_params=UMAP_PARAMS, hdbscan_params=HDBSCAN_PARAMS):
+    """
+    Fit one model per tier and attach cluster labels and UMAP coordinates.
+
+    ``umap_params`` is one dict for every tier or {tier: dict}, and
+    ``hdbscan_params`` is {tier: dict}, as from sweep.umap_params_from and
+    sweep.hdbscan_params_from.
+
+    Returns:
+    --------
+    df_changes : DataFrame with 'innovation_cluster', 'umap_1', 'umap_2'
+    models : dict tier -> model (see fit_tier_model)
+    """
+    df_changes = df_changes.copy()
+    df_changes['innovation_cluster'] = -1
+    df_changes['umap_1'] = np.nan
+    df_changes['umap_2'] = np.nan
+
+    models = {}
+    for tier, data in df_changes.groupby(tier_col):
+        print(f"\nProcessing {tier} banks: {len(data):,} observations")
+        model = fit_tier_model(data[feature_cols].to_numpy(), tier_umap_params(umap_params, tier),
+                               hdbscan_params.get(tier, HDBSCAN_PARAMS['Small']))
+        models[tier] = model
+
+        labels = model['labels']
+        n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
+        n_noise = (labels == -1).sum()
+        print(f"  Clusters found: {n_clusters}")
+        print(f"  Noise points: {n_noise:,} ({n_noise/len(data)*100:.1f}%)")
+
+        df_changes.loc[data.index, 'innovation_cluster'] = labels
+        df_changes.loc[data.index, 'umap_1'] = model['embedding'][:, 0]
+        df_changes.loc[data.index, 'umap_2'] = model['embedding'][:, 1]
+
+    print(f"\n✓ Clustering complete!")
+    return df_changes, models
+
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+def match_cluster_names(df_changes, path=CLUSTER_NAMES_FILE, tier_col='bank_tier',
+                        cluster_col='innovation_cluster', key_col='rssd9017_name',
+                        min_jaccard=MIN_NAME_JACCARD):
+    """
+    Carry the hand-assigned names over to a new fit by member overlap.
+
+    The names in the export belong to one earlier fit, and HDBSCAN numbers
+    clusters arbitrarily, so a bare (tier, label) match is meaningless. Each
+    new cluster takes the name of the old cluster in the same tier with the
+    highest Jaccard overlap of member banks (matched on ``key_col``, the bank
+    name the export is keyed on), provided it reaches ``min_jaccard``. Every
+    old name is used at most once, best overlap first; unmatched clusters get
+    no entry and fall back to 'Cluster N' downstream.
+
+    Returns:
+    --------
+    cluster_names : {tier: {cluster label: cluster name}}
+    """
+    if not os.path.exists(path) or key_col not in df_changes.columns:
+        return {}
+    named = pd.read_csv(path, usecols=['rssd9017_name', 'bank_tier', 'innovation_cluster', 'cluster_name'])
+    named = named[named['innovation_cluster'] != -1]
+
+    cluster_names = {}
+    for tier, data in df_changes[df_changes[cluster_col] != -1].groupby(tier_col):
+        old = named[named['bank_tier'] == tier]
+        new_members = data.groupby(cluster_col)[key_col].agg(set)
+        old_members = old.groupby('cluster_name')['rssd9017_name'].agg(set)
+        candidates = sorted(
+            ((len(new & old_set) / len(new | old_set), int(cluster), name)
+             for cluster, new in new_members.items()
+             for name, old_set in old_members.items()),
+            key=lambda c: (-c[0], c[1], c[2]))
+
+        names = {}
+        for jaccard, cluster, name in candidates:
+            if jaccard < min_jaccard:
+                break
+            if cluster not in names and name not in names.values():
+                names[cluster] = name
+        cluster_names[tier] = names
+    return cluster_names
+
+
+def save_tier_models(models, feature_cols, model_dir=MODEL_DIR, version=None, cluster_names=None,
+                     min_years=None):
+    """
+    Save fitted tier models as a new artifact version.
+
+    ``cluster_names`` ({tier: {cluster: name}}, e.g. from match_cluster_names)
+    is stored in the manifest; without it clusters are reported as 'Cluster N'.
+    ``min_years`` is the change-score minimum the models were trained with;
+    scoring.score_banks applies the same one to new bank-year rows.
+
+    Returns:
+    --------
+    version : str, directory name under model_dir (also written to model_dir/LATEST)
+    """
+    if version is None:
+        digest = hashlib.sha256()
+        for tier in sorted(models):
+            digest.update(np.ascontiguousarray(models[tier]['embedding']).tobytes())
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{digest.hexdigest()[:8]}"
+    cluster_names = cluster_names or {}
+
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    for tier, model in models.items():
+        joblib.dump(model, os.path.join(version_dir, f'{tier}.joblib'))
+
+    manifest = {
+        'version': version,
+        'feature_cols': list(feature_cols),
+        'min_years': min_years,
+        'tiers': sorted(models),
+        'cluster_names': {tier: {str(k): v for k, v in names.items()}
+                          for tier, names in cluster_names.items()},
+        'umap_params': {tier: model['umap_params'] for tier, model in models.items()},
+        'hdbscan_params': {tier: model['hdbscan_params'] for tier, model in models.items()},
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    with open(os.path.join(model_dir, 'LATEST'), 'w') as f:
+        f.write(version)
+
+    print(f"✓ Saved {len(models)} tier models to {version_dir}")
+    return version
+
+
+def load_tier_models(version='latest', model_dir=MODEL_DIR, warm_up=True):
+    """
+    Load a saved artifact version.
+
+    The first UMAP ``transform`` in a process compiles numba kernels, which
+    takes seconds; ``warm_up`` pays that cost here with a one-row transform
+    per tier so later scoring calls take milliseconds.
+
+    Returns:
+    --------
+    models : dict tier -> model
+    manifest : dict with feature columns, cluster names and parameters
+    """
+    if version == 'latest':
+        with open(os.path.join(model_dir, 'LATEST')) as f:
+            version = f.read().strip()
+    version_dir = os.path.join(model_dir, version)
+    with open(os.path.join(version_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    models = {tier: joblib.load(os.path.join(version_dir, f'{tier}.joblib'))
+              for tier in manifest['tiers']}
+    if warm_up:
+        for model in models.values():
+            model['reducer'].transform(model['scaler'].transform(
+                model['scaler'].mean_.reshape(1, -1)))
+    return models, manifest
+
+
+# ============================================================================
+# OUT-OF-SAMPLE ASSIGNMENT
+# ============================================================================
+
+def approximate_predict(model, embedding):
+    """Cluster labels for new embedded points from the nearest training point."""
+    distances, nearest = model['nn'].kneighbors(embedding)
+    labels = model['labels'][nearest[:, 0]]
+    radius = np.array([model['cluster_radius'].get(int(c), -np.inf) for c in labels])
+    return np.where((labels != -1) & (distances[:, 0] <= radius), labels, -1)
+
+
+def assign_clusters(df, models, manifest, tier_col='bank_tier'):
+    """
+    Score banks against the saved tier models without refitting.
+
+    Parameters:
+    -----------
+    df : DataFrame of change scores with the manifest's feature columns and a tier column
+    models, manifest : as returned by load_tier_models
+
+    Returns:
+    --------
+    scored : DataFrame indexed like ``df`` with 'innovation_cluster',
+             'cluster_name', 'umap_1' and 'umap_2'
+    """
+    feature_cols = manifest['feature_cols']
+    scored = pd.DataFrame(index=df.index)
+    scored['innovation_cluster'] = -1
+    scored['cluster_name'] = 'Noise'
+    scored['umap_1'] = np.nan
+    scored['umap_2'] = np.nan
+
+    for tier, data in df.groupby(tier_col):
+        if tier not in models:
+            continue
+        model = models[tier]
+        scaled = model['scaler'].transform(data[feature_cols].to_numpy())
+        embedding = model['reducer'].transform(scaled)
+        labels = approximate_predict(model, embedding)
+
+        names = manifest['cluster_names'].get(tier, {})
+        scored.loc[data.index, 'innovation_cluster'] = labels
+        scored.loc[data.index, 'cluster_name'] = [names.get(str(c), 'Noise' if c == -1 else f'Cluster {c}')
+                                                  for c in labels]
+        scored.loc[data.index, 'umap_1'] = embedding[:, 0]
+        scored.loc[data.index, 'umap_2'] = embedding[:, 1]
+    return scored
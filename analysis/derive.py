@@ -0,0 +1,145 @@
+"""
+PANEL DERIVATIONS
+=================
+Lags, leads, growth rates and within-period percentile ranks for any list of
+columns of a bank panel, such as the derived fields documented in help.py
+(Asset_Growth_YoY, Branch_Growth_YoY, Branch_Efficiency_Percentile).
+
+Each row gets an integer period (the year for annual panels, year * 4 +
+quarter - 1 for quarterly ones). A lag of k looks up the same bank's row at
+exactly period - k with one ``np.searchsorted`` over the sorted
+(bank, period) keys, for all requested columns at once. A bank that skipped
+a year has no row at period - k, so its lag is missing instead of reaching
+across the gap to an older report.
+
+    derive_panel(annual, yoy=['total_assets'], percentile=['roa'])
+
+adds 'total_assets_yoy' and 'roa_pctile' (0-1 within each year).
+"""
+
+import numpy as np
+import pandas as pd
+
+from panel import BANK_COL
+
+
+def panel_periods(df, time_cols=None):
+    """
+    Integer period per row and the number of periods in a year.
+
+    Quarterly when ``df`` has a 'quarter' column (unless ``time_cols`` says
+    otherwise): year * 4 + quarter - 1, 4 periods a year. Annual otherwise.
+    """
+    time_cols = time_cols or (('year', 'quarter') if 'quarter' in df.columns else ('year',))
+    years = df[time_cols[0]].to_numpy(dtype=np.int64)
+    if len(time_cols) == 1:
+        return years, 1
+    return years * 4 + df[time_cols[1]].to_numpy(dtype=np.int64) - 1, 4
+
+
+# ============================================================================
+# ARRAY ENGINE
+# ============================================================================
+
+def shift_index(banks, periods, k):
+    """
+    Row holding the same bank's value ``k`` periods earlier (negative ``k``:
+    later), or -1 when that period is missing. Rows must be sorted by (bank, period).
+    """
+    banks = np.asarray(banks, dtype=np.int64)
+    periods = np.asarray(periods, dtype=np.int64)
+    if len(banks) == 0:
+        return np.empty(0, dtype=np.int64)
+    span = int(periods.max() - periods.min()) + abs(int(k)) + 1
+    keys = banks * span + (periods - periods.min())
+    if np.any(keys[1:] <= keys[:-1]):
+        raise ValueError("Panel must be sorted by (bank, period) with one row per bank-period")
+    target = keys - k
+    index = np.searchsorted(keys, target)
+    found = index < len(keys)
+    found[found] = keys[index[found]] == target[found]
+    return np.where(found, index, -1)
+
+
+def take_shifted(values, index):
+    """``values`` rows at ``index`` (NaN where the index is -1)."""
+    values = np.asarray(values, dtype=float)
+    out = values[np.maximum(index, 0)]
+    out[index < 0] = np.nan
+    return out
+
+
+def growth_rate(current, previous):
+    """(current - previous) / previous; NaN where previous is missing or zero."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = current / previous - 1
+    rate[~np.isfinite(rate)] = np.nan
+    return rate
+
+
+def period_percentile(values, periods):
+    """Percentile rank (0-1, ties averaged, NaN kept) of each column within each period."""
+    frame = pd.DataFrame(np.asarray(values, dtype=float))
+    return frame.groupby(np.asarray(periods)).rank(pct=True).to_numpy()
+
+
+# ============================================================================
+# DATAFRAME INTERFACE
+# ============================================================================
+
+def derive_panel(df, lags=None, leads=None, yoy=None, qoq=None, percentile=None, lag_periods=(1,),
+                 bank_col=BANK_COL, time_cols=None):
+    """
+    Add lagged, led, growth and percentile columns to a bank panel.
+
+    Parameters:
+    -----------
+    df : bank-year or bank-quarter DataFrame, one row per bank and period
+    lags, leads : columns to add '<col>_lag<k>' / '<col>_lead<k>' for every k in ``lag_periods``
+    yoy : columns to add '<col>_yoy', growth over the same period one year earlier
+    qoq : columns to add '<col>_qoq', growth over the previous quarter (quarterly panels)
+    percentile : columns to add '<col>_pctile', rank within the period
+    lag_periods : lag/lead distances, in periods
+    bank_col : str, column identifying a bank
+    time_cols : ('year',) or ('year', 'quarter'); inferred when None
+
+    Returns:
+    --------
+    df : copy of ``df`` with the new columns, rows in their original order
+    """
+    lags, leads, yoy, qoq, percentile = (list(cols or []) for cols in (lags, leads, yoy, qoq, percentile))
+    periods, per_year = panel_periods(df, time_cols)
+    if qoq and per_year == 1:
+        raise ValueError("QoQ growth needs a quarterly panel (year and quarter columns)")
+
+    banks, _ = pd.factorize(df[bank_col], sort=False)
+    order = np.lexsort((periods, banks))
+    banks, periods = banks[order], periods[order]
+
+    def sorted_values(columns):
+        return df[columns].to_numpy(dtype=float)[order]
+
+    derived = {}
+    for columns, distances, suffix in ((lags, lag_periods, 'lag'), (leads, lag_periods, 'lead')):
+        if not columns:
+            continue
+        values = sorted_values(columns)
+        for k in distances:
+            shifted = take_shifted(values, shift_index(banks, periods, k if suffix == 'lag' else -k))
+            derived.update({f'{col}_{suffix}{k}': shifted[:, j] for j, col in enumerate(columns)})
+
+    for columns, k, suffix in ((yoy, per_year, 'yoy'), (qoq, 1, 'qoq')):
+        if not columns:
+            continue
+        values = sorted_values(columns)
+        rates = growth_rate(values, take_shifted(values, shift_index(banks, periods, k)))
+        derived.update({f'{col}_{suffix}': rates[:, j] for j, col in enumerate(columns)})
+
+    if percentile:
+        ranks = period_percentile(sorted_values(percentile), periods)
+        derived.update({f'{col}_pctile': ranks[:, j] for j, col in enumerate(percentile)})
+
+    # Back to the caller's row order
+    inverse = np.empty_like(order)
+    inverse[order] = np.arange(len(order))
+    return df.assign(**{name: values[inverse] for name, values in derived.items()})
@@ -0,0 +1,182 @@
+"""
+CLUSTER PROFILING AND SIZE DIAGNOSTICS
+======================================
+Per-cluster profiles and between-cluster tests for every feature in every
+tier, replacing the per-cluster filtered copies of ``analyze_cluster_by_size``.
+
+    cluster_profiles   count, mean, median, min, max and quantiles per
+                       (tier, cluster, feature) from one grouped aggregation
+    cluster_tests      one-way ANOVA and Kruskal-Wallis per (tier, feature),
+                       vectorized across features: group sums and rank sums
+                       come from one indicator-matrix product per tier
+    print_size_check   the old "is this cluster just asset size?" printout,
+                       read off the two tables above
+
+Noise (-1) is profiled but left out of the tests, as before.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+PROFILE_STATS = ['count', 'mean', 'median', 'min', 'max']
+QUANTILES = (0.25, 0.75)
+
+
+def attach_clusters(bank_year, df_changes, bank_col='rssd9001', cluster_col='innovation_cluster'):
+    """
+    Bank-year rows labelled with each bank's cluster and change-score tier.
+
+    Clusters are fitted within the change-score tier, so that tier replaces
+    the bank-year 'bank_tier'; banks without change scores are dropped.
+    """
+    labels = df_changes[[bank_col, 'bank_tier', cluster_col]]
+    return bank_year.drop(columns=['bank_tier', cluster_col], errors='ignore').merge(labels, on=bank_col)
+
+
+# ============================================================================
+# PROFILES
+# ============================================================================
+
+def cluster_profiles(df, features, tier_col='bank_tier', cluster_col='innovation_cluster',
+                     quantiles=QUANTILES):
+    """
+    Tidy per-cluster summary statistics.
+
+    Returns:
+    --------
+    profiles : DataFrame with one row per (tier, cluster, feature) and
+               columns count, mean, median, min, max, q25, q75, ...
+    """
+    grouped = df.groupby([tier_col, cluster_col], sort=True)[features]
+    summary = grouped.agg(PROFILE_STATS)
+    summary.columns.names = ['feature', 'stat']
+    profiles = summary.stack('feature', future_stack=True)
+
+    if quantiles:
+        quantile_values = grouped.quantile(list(quantiles))
+        quantile_values.index.names = [tier_col, cluster_col, 'quantile']
+        quantile_values.columns.name = 'feature'
+        quantile_values = quantile_values.stack('feature', future_stack=True).unstack('quantile')
+        quantile_values.columns = [f'q{round(q * 100):02d}' for q in quantile_values.columns]
+        profiles = profiles.join(quantile_values)
+
+    profiles = profiles.reset_index()
+    profiles['count'] = profiles['count'].astype(int)
+    return profiles
+
+
+# ============================================================================
+# TESTS
+# ============================================================================
+
+def _group_tests(values, codes, n_groups):
+    """ANOVA and Kruskal-Wallis for every column of ``values`` across ``codes``."""
+    indicator = (codes[:, None] == np.arange(n_groups)).astype(float)
+    observed = ~np.isnan(values)
+    filled = np.where(observed, values, 0.0)
+
+    n_g = indicator.T @ observed                       # (groups, features)
+    n = n_g.sum(axis=0)
+    k = (n_g > 0).sum(axis=0)
+    means = np.divide(indicator.T @ filled, n_g, out=np.full(n_g.shape, np.nan), where=n_g > 0)
+    grand = filled.sum(axis=0) / np.maximum(n, 1)
+
+    ss_between = np.nansum(n_g * (means - grand) ** 2, axis=0)
+    ss_total = (np.where(observed, values - grand, 0.0) ** 2).sum(axis=0)
+    ss_within = ss_total - ss_between
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = (ss_between / (k - 1)) / (ss_within / (n - k))
+        eta_squared = ss_between / ss_total
+    anova_p = stats.f.sf(f_stat, k - 1, n - k)
+
+    ranks = stats.rankdata(values, axis=0, nan_policy='omit')
+    rank_sums = indicator.T @ np.where(observed, ranks, 0.0)
+    ties = np.array([stats.tiecorrect(ranks[observed[:, j], j]) if observed[:, j].any() else np.nan
+                     for j in range(values.shape[1])])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = 12.0 / (n * (n + 1)) * np.nansum(np.divide(rank_sums ** 2, n_g, out=np.zeros(n_g.shape),
+                                                       where=n_g > 0), axis=0) - 3 * (n + 1)
+        h = h / ties
+        epsilon_squared = h / (n - 1)
+    kruskal_p = stats.chi2.sf(h, k - 1)
+
+    invalid = k < 2
+    for arr in (f_stat, eta_squared, anova_p, h, epsilon_squared, kruskal_p):
+        arr[invalid] = np.nan
+    return {
+        'n_obs': n.astype(int), 'n_clusters': k.astype(int),
+        'anova_f': f_stat, 'anova_p': anova_p, 'eta_squared': eta_squared,
+        'kruskal_h': h, 'kruskal_p': kruskal_p, 'epsilon_squared': epsilon_squared,
+    }
+
+
+def cluster_tests(df, features, tier_col='bank_tier', cluster_col='innovation_cluster'):
+    """
+    Between-cluster ANOVA and Kruskal-Wallis for every (tier, feature), noise excluded.
+
+    eta_squared and epsilon_squared are the effect sizes; with thousands of
+    banks almost every p-value is tiny, so they say more about whether a
+    feature separates the clusters.
+
+    Returns:
+    --------
+    tests : DataFrame with one row per (tier, feature)
+    """
+    clustered = df[df[cluster_col] != -1]
+    frames = []
+    for tier, data in clustered.groupby(tier_col, sort=True):
+        codes, _ = pd.factorize(data[cluster_col], sort=True)
+        result = _group_tests(data[features].to_numpy(dtype=float), codes, codes.max() + 1)
+        frame = pd.DataFrame(result)
+        frame.insert(0, 'feature', features)
+        frame.insert(0, tier_col, tier)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def cluster_diagnostics(df, features, tier_col='bank_tier', cluster_col='innovation_cluster',
+                        quantiles=QUANTILES):
+    """Profiles and tests for every tier and feature: (profiles, tests)."""
+    return (cluster_profiles(df, features, tier_col, cluster_col, quantiles),
+            cluster_tests(df, features, tier_col, cluster_col))
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def print_size_check(profiles, tests, feature='total_assets', alpha=0.001,
+                     tiers=('Large', 'Medium', 'Small'), tier_col='bank_tier',
+                     cluster_col='innovation_cluster'):
+    """Check if clusters within each tier are just grouping by asset size."""
+    for tier in tiers:
+        print(f"\n{'='*80}")
+        print(f"CLUSTER vs ASSET SIZE ANALYSIS - {tier} Banks")
+        print(f"{'='*80}")
+
+        rows = profiles[(profiles[tier_col] == tier) & (profiles['feature'] == feature)]
+        rows = pd.concat([rows[rows[cluster_col] != -1], rows[rows[cluster_col] == -1]])
+
+        print(f"\nAsset statistics by cluster:")
+        print(f"{'Cluster':<10} {'Count':>8} {'Mean Assets':>15} {'Median Assets':>15} {'Min Assets':>15} {'Max Assets':>15}")
+        print("-" * 80)
+        for row in rows.itertuples():
+            cluster = 'Noise' if getattr(row, cluster_col) == -1 else getattr(row, cluster_col)
+            print(f"{cluster:<10} {row.count:>8,} {row.mean:>15,.0f} {row.median:>15,.0f} {row.min:>15,.0f} {row.max:>15,.0f}")
+
+        test = tests[(tests[tier_col] == tier) & (tests['feature'] == feature)]
+        if test.empty or np.isnan(test['anova_p'].iloc[0]):
+            continue
+        test = test.iloc[0]
+        print(f"\nANOVA test for asset size across clusters:")
+        print(f"  F-statistic: {test['anova_f']:.4f}")
+        print(f"  p-value: {test['anova_p']:.6f}")
+        print(f"  Kruskal-Wallis H: {test['kruskal_h']:.4f} (p = {test['kruskal_p']:.6f})")
+        print(f"  Effect size: eta² = {test['eta_squared']:.3f}")
+
+        if test['anova_p'] < alpha:
+            print(f"  ⚠️  WARNING: Clusters have significantly different asset sizes (p < {alpha})")
+            print(f"     This suggests clustering may be driven by size, not innovation")
+        else:
+            print(f"  ✓ Clusters have similar asset distributions (p >= {alpha})")
@@ -0,0 +1,157 @@
+"""
+MEMORY-MAPPED TIER FEATURE MATRICES
+===================================
+Writes each tier's standardized change-score matrix once, as .npy files that
+any process can open zero-copy with ``np.load(..., mmap_mode='r')``. Sweep
+and stability workers, notebooks and a scoring process then read the same
+page-cached copy instead of each rebuilding (and holding) its own frame.
+
+Layout under data/.feature_store/<version>/:
+
+    manifest.json           feature columns, tiers, shapes, bank column
+    <tier>/features.npy     float32 (n_banks, n_features), standardized
+    <tier>/banks.npy        bank id of each row (row -> bank index)
+    <tier>/mean.npy         scaler mean, float64
+    <tier>/scale.npy        scaler scale, float64
+
+The version is a hash of the inputs, so writing unchanged change scores
+again reuses the existing files. ``use_version`` checks that a version's
+files are still on disk and points LATEST at it; the pipeline calls it when
+the 'scaling' stage is loaded from cache. float32 loses nothing downstream: UMAP
+converts its input to float32 anyway.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+from wrds_cache import DATA_DIR
+
+FEATURE_STORE_DIR = os.path.join(DATA_DIR, '.feature_store')
+ARRAYS = ('features', 'banks', 'mean', 'scale')
+
+
+def _store_version(df_changes, feature_cols, tier_col, bank_col):
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(feature_cols), tier_col, bank_col]).encode())
+    digest.update(np.ascontiguousarray(df_changes[feature_cols].to_numpy(dtype=np.float64)).tobytes())
+    digest.update(df_changes[tier_col].astype(str).str.cat(sep='|').encode())
+    digest.update(df_changes[bank_col].astype(str).str.cat(sep='|').encode())
+    return digest.hexdigest()[:16]
+
+
+def write_tier_matrices(df_changes, feature_cols, tier_col='bank_tier', bank_col='rssd9001',
+                        store_dir=FEATURE_STORE_DIR, verbose=True):
+    """
+    Standardize each tier's features and write them as memory-mappable arrays.
+
+    Rows keep the order of ``df_changes`` within each tier, the same order
+    ``groupby(tier_col)`` gives the clustering, sweep and stability code.
+
+    Returns:
+    --------
+    version : str, directory name under store_dir (also written to store_dir/LATEST)
+    """
+    version = _store_version(df_changes, feature_cols, tier_col, bank_col)
+    version_dir = os.path.join(store_dir, version)
+    manifest_file = os.path.join(version_dir, 'manifest.json')
+
+    if not os.path.exists(manifest_file):
+        staging = version_dir + '.building'
+        os.makedirs(staging, exist_ok=True)
+        tiers = {}
+        for tier, data in df_changes.groupby(tier_col, sort=True):
+            tier_dir = os.path.join(staging, str(tier))
+            os.makedirs(tier_dir, exist_ok=True)
+            scaler = StandardScaler().fit(data[feature_cols].to_numpy(dtype=np.float64))
+            scaled = scaler.transform(data[feature_cols].to_numpy(dtype=np.float64))
+
+            # Written straight into the mapped file, without an extra float32 copy in memory
+            out = np.lib.format.open_memmap(os.path.join(tier_dir, 'features.npy'), mode='w+',
+                                            dtype=np.float32, shape=scaled.shape)
+            out[:] = scaled
+            out.flush()
+            del out
+            np.save(os.path.join(tier_dir, 'banks.npy'), data[bank_col].to_numpy())
+            np.save(os.path.join(tier_dir, 'mean.npy'), scaler.mean_)
+            np.save(os.path.join(tier_dir, 'scale.npy'), scaler.scale_)
+            tiers[str(tier)] = {'n_banks': int(scaled.shape[0])}
+
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump({'version': version, 'feature_cols': list(feature_cols), 'tier_col': tier_col,
+                       'bank_col': bank_col, 'tiers': tiers}, f, indent=2)
+        os.replace(staging, version_dir)
+        if verbose:
+            print(f"✓ Wrote {len(tiers)} tier feature matrices to {version_dir}")
+    elif verbose:
+        print(f"✓ Tier feature matrices up to date ({version})")
+
+    _write_latest(version, store_dir)
+    return version
+
+
+def _write_latest(version, store_dir):
+    with open(os.path.join(store_dir, 'LATEST.tmp'), 'w') as f:
+        f.write(version)
+    os.replace(os.path.join(store_dir, 'LATEST.tmp'), os.path.join(store_dir, 'LATEST'))
+
+
+def use_version(version, store_dir=FEATURE_STORE_DIR):
+    """
+    Point store_dir/LATEST at a stored version if all its files are there.
+
+    Returns:
+    --------
+    found : bool, False when the version was deleted or moved (LATEST is left alone)
+    """
+    version_dir = os.path.join(store_dir, version)
+    manifest_file = os.path.join(version_dir, 'manifest.json')
+    if not os.path.exists(manifest_file):
+        return False
+    with open(manifest_file) as f:
+        tiers = json.load(f)['tiers']
+    if not all(os.path.exists(os.path.join(version_dir, tier, f'{name}.npy'))
+               for tier in tiers for name in ARRAYS):
+        return False
+    _write_latest(version, store_dir)
+    return True
+
+
+def store_path(version='latest', store_dir=FEATURE_STORE_DIR):
+    """Directory of a stored version ('latest' follows store_dir/LATEST)."""
+    if version == 'latest':
+        with open(os.path.join(store_dir, 'LATEST')) as f:
+            version = f.read().strip()
+    return os.path.join(store_dir, version)
+
+
+def open_tier_matrices(version='latest', store_dir=FEATURE_STORE_DIR, tiers=None):
+    """
+    Open stored tier matrices read-only and zero-copy.
+
+    Returns:
+    --------
+    matrices : dict tier -> {'features', 'banks', 'mean', 'scale'} (memory-mapped arrays)
+    manifest : dict with feature columns, tier and bank columns and tier sizes
+    """
+    version_dir = store_path(version, store_dir)
+    with open(os.path.join(version_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    matrices = {}
+    for tier in (tiers or manifest['tiers']):
+        matrices[tier] = {name: np.load(os.path.join(version_dir, tier, f'{name}.npy'), mmap_mode='r')
+                          for name in ARRAYS}
+    return matrices, manifest
+
+
+def stored_scaler(matrix):
+    """StandardScaler rebuilt from a stored tier's mean and scale, for scoring new banks."""
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(matrix['mean'])
+    scaler.scale_ = np.array(matrix['scale'])
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(scaler.mean_)
+    return scaler
@@ -0,0 +1,148 @@
+"""
+CLUSTERING FEATURE DEFINITIONS
+==============================
+Column lists shared by the pandas workflow in Jdorval.ipynb, the polars
+lazy pipeline and the WRDS cache loader.
+"""
+
+from split_columns import SPLIT_PAIRS
+
+# Identifiers - MUST KEEP THESE
+IDENTIFIERS = ['rssd9001', 'rssd9999', 'rssd9017', 'year', 'quarter']
+
+# RIAD columns - Universal coverage (<2% missing)
+RIAD_UNIVERSAL = [
+    'riad4010', 'riad4012', 'riad4020', 'riad4073', 'riad4074', 'riad4079',
+    'riad4080', 'riad4092', 'riad4093', 'riad4107', 'riad4115', 'riad4135',
+    'riad4150', 'riad4180', 'riad4217', 'riad4230', 'riad4266', 'riad4267',
+    'riad4300', 'riad4301', 'riad4302', 'riad4313', 'riad4340', 'riad4356',
+    'riad4415', 'riad4435', 'riad4436', 'riad4460', 'riad4470', 'riad4498',
+    'riad4499', 'riad4507', 'riad4508', 'riad4518', 'riad4605', 'riad4608',
+    'riad4628', 'riad4635', 'riad4638', 'riad4644', 'riad4769'
+]
+
+# RCON columns - Universal coverage (<2% missing), no 2011 split
+RCON_UNIVERSAL = [
+    'rcon2_rcon2200',  # Total deposits
+    'rcon2_rcon2202',  # Transaction accounts
+    'rcon2_rcon2215',  # Nontransaction accounts
+    'rcon2_rcon6631',  # NIB deposits
+    'rcon1_rcon1766',  # C&I loans
+]
+
+# Merged columns (from split pairs)
+MERGED_COLUMNS = [
+    'total_assets',
+    'total_loans',
+    'total_equity',
+    'allowance_loan_losses',
+    'agricultural_loans',
+    'htm_securities',
+    'afs_securities',
+    'goodwill',
+    'cash_items_process',
+    'farmland_loans',
+    'multifamily_loans',
+]
+
+# Ratios - Successfully calculated (<2% missing)
+RATIOS_CLEAN = [
+    'tech_investment_ratio',
+    'nib_deposit_ratio',
+    'service_charge_intensity',
+    'efficiency_ratio',
+    'nonint_income_pct',
+    'loans_to_assets',
+    'equity_to_assets',
+    'deposits_to_assets',
+    'roa',
+    'roe',
+    'nontrans_deposits_pct'
+]
+
+# All clustering features kept by prepare_clustering_features
+FEATURE_COLUMNS = RIAD_UNIVERSAL + RCON_UNIVERSAL + MERGED_COLUMNS + RATIOS_CLEAN
+
+# Size-independent ratios used for change scores
+INNOVATION_ONLY_FEATURES = RATIOS_CLEAN + [
+    'digital_revenue_ratio',
+    'non_branch_revenue_pct',
+    'loan_yield',
+    'securities_to_assets',
+    'expense_per_salary_dollar',
+    'occupancy_intensity',
+    'chargeoff_rate',
+    'provision_intensity',
+    'asset_growth_capacity'
+]
+
+# Raw source columns read by the workflow
+SOURCE_COLUMNS = (['rssd9001', 'rssd9017', 'rssd9999'] + RIAD_UNIVERSAL + RCON_UNIVERSAL
+                  + [col for rcfd_col, rcon_col, _ in SPLIT_PAIRS for col in (rcfd_col, rcon_col)])
+
+
+# ============================================================================
+# FEATURE SELECTION
+# ============================================================================
+
+def prepare_clustering_features(df, feature_cols=FEATURE_COLUMNS):
+    """Select universal coverage features AND keep identifiers"""
+    print(f"\n{'='*80}")
+    print("PREPARING CLUSTERING FEATURES - UNIVERSAL COVERAGE ONLY")
+    print(f"{'='*80}")
+
+    # Check which identifiers exist
+    existing_identifiers = [col for col in IDENTIFIERS if col in df.columns]
+    if len(existing_identifiers) < len(IDENTIFIERS):
+        missing = [col for col in IDENTIFIERS if col not in df.columns]
+        print(f"\n⚠️  WARNING: Missing identifier columns: {missing}")
+
+    # Check which features actually exist
+    existing_features = [col for col in feature_cols if col in df.columns]
+    missing_features = [col for col in feature_cols if col not in df.columns]
+
+    print(f"\n📊 Feature selection:")
+    print(f"  Expected: {len(feature_cols)} features")
+    print(f"  Found: {len(existing_features)} features")
+    if missing_features:
+        print(f"  Missing: {len(missing_features)} features: {missing_features}")
+
+    # Create dataset with BOTH identifiers AND features
+    all_cols = existing_identifiers + existing_features
+    df_subset = df[all_cols].copy()
+
+    print(f"\n🔍 Missing value summary:")
+    # Check missing values ONLY in feature columns
+    features_only = df_subset[existing_features]
+    total_missing = features_only.isna().sum().sum()
+    total_cells = features_only.shape[0] * features_only.shape[1]
+    missing_pct = (total_missing / total_cells) * 100
+    print(f"  Total missing values in FEATURES: {total_missing:,} ({missing_pct:.2f}% of feature cells)")
+
+    # Drop rows with ANY missing values IN FEATURE COLUMNS ONLY
+    print(f"\n{'='*80}")
+    print("REMOVING ROWS WITH MISSING VALUES (checking features only)")
+    print(f"{'='*80}")
+
+    before_rows = len(df_subset)
+    # Get mask of complete rows based on features only
+    complete_features_mask = features_only.notna().all(axis=1)
+    df_clean = df_subset[complete_features_mask].copy()
+    after_rows = len(df_clean)
+
+    print(f"  Before: {before_rows:,} rows")
+    print(f"  After:  {after_rows:,} rows")
+    print(f"  Retained: {after_rows/before_rows*100:.1f}%")
+
+    print(f"\n{'='*80}")
+    print(f"✓ FINAL DATASET READY FOR CLUSTERING")
+    print(f"{'='*80}")
+    print(f"  Observations: {len(df_clean):,}")
+    print(f"  Identifiers: {len(existing_identifiers)} columns - {existing_identifiers}")
+    print(f"  Features: {len(existing_features)} columns")
+    print(f"  Total columns: {len(df_clean.columns)}")
+    print(f"  Missing values: {df_clean.isna().sum().sum()}")
+    print(f"\n  Ready for: Z-score standardization → UMAP → HDBSCAN")
+
+    # Return COMPLETE dataframe (identifiers + features)
+    return df_clean, existing_features
@@ -0,0 +1,298 @@
+"""
+INCREMENTAL QUARTER APPEND
+==========================
+Keeps the per-bank state of the clustering pipeline on disk so a new
+call-report quarter only touches the banks that reported in it.
+
+Persisted state (under data/.pipeline_state/ by default):
+
+    tier_state.parquet   sticky-tier state machine per bank: current tier,
+                         pending raw tier and how many quarters it has run,
+                         last (year, quarter) seen
+    open_quarters.parquet
+                         prepared rows of each bank's latest year, the only
+                         bank-year an appended quarter can still change
+    bank_year.parquet    bank-year table (annual.aggregate_annual)
+    changes.parquet      change scores (one row per bank)
+    params.json          settings the state was built with
+
+``append_quarter`` runs steps 1-4 on the new rows only, continues each
+affected bank's tier state machine, re-aggregates each affected bank's open
+year together with the new rows, and recomputes change scores for the
+affected banks before splicing them back into the stored tables. Bank-years
+go through the same ``aggregate_annual`` as the full pipeline (Q4 or
+annualized year-to-date flows, year-end stocks, recomputed ratios, year-end
+tier), so an append gives the same result as a rebuild. Restated
+(non-appended) quarters need a full ``build_incremental_state``.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from annual import aggregate_annual
+from change_scores import calculate_innovation_change_scores
+from features import INNOVATION_ONLY_FEATURES, prepare_clustering_features
+from panel import build_panel
+from ratios import calculate_additional_innovation_ratios, calculate_ratios
+from split_columns import merge_split_columns
+from tiers import (TIER_LABELS, TIER_THRESHOLDS, group_offsets, raw_tier_codes,
+                   sticky_tier_codes, tier_labels_from_codes)
+from wrds_cache import DATA_DIR
+
+STATE_DIR = os.path.join(DATA_DIR, '.pipeline_state')
+STATE_TABLES = ('tier_state', 'open_quarters', 'bank_year', 'changes')
+
+
+# ============================================================================
+# STEPS 1-4 ON RAW ROWS
+# ============================================================================
+
+def prepare_rows(raw):
+    """Report period, split merge, ratios and feature selection for raw call-report rows."""
+    df = raw.copy()
+    df['report_date'] = pd.to_datetime(raw['rssd9999'], errors='coerce')
+    df['year'] = df['report_date'].dt.year
+    df['quarter'] = df['report_date'].dt.quarter
+    df = merge_split_columns(df)
+    df = calculate_ratios(df)
+    df = calculate_additional_innovation_ratios(df)
+    return prepare_clustering_features(df)
+
+
+# ============================================================================
+# TIER STATE
+# ============================================================================
+
+def _tier_state(banks, raw, sticky, offsets, years, quarters):
+    """State machine position after the last row of each bank's sorted history."""
+    n = len(raw)
+    last = offsets[1:] - 1
+    is_run_start = np.zeros(n, dtype=bool)
+    is_run_start[offsets[:-1]] = True
+    is_run_start[1:] |= raw[1:] != raw[:-1]
+    run_start = np.maximum.accumulate(np.where(is_run_start, np.arange(n), 0))
+
+    pending = raw[last] != sticky[last]
+    return pd.DataFrame({
+        'bank': banks,
+        'current_tier': sticky[last],
+        'pending_tier': raw[last],
+        'pending_count': np.where(pending, last - run_start[last] + 1, 0),
+        'last_year': years[last],
+        'last_quarter': quarters[last],
+    })
+
+
+def _continue_tiers(rows, tier_state, bank_col, params):
+    """
+    Sticky tiers for appended rows, resuming each bank's saved state.
+
+    Each bank with saved state gets a synthetic prefix - its current tier
+    followed by ``pending_count`` copies of its pending tier - which puts the
+    run-length engine in exactly the saved state before the new rows.
+    """
+    banks = rows[bank_col].to_numpy()
+    offsets = group_offsets(banks)
+    group_banks = banks[offsets[:-1]]
+    raw = raw_tier_codes(rows['total_assets'].to_numpy(), params['thresholds'])
+
+    state = tier_state.set_index('bank').reindex(group_banks)
+    known = state['current_tier'].notna().to_numpy()
+
+    first_new = offsets[:-1]
+    stale = known & (
+        (rows['year'].to_numpy()[first_new] < state['last_year'].to_numpy())
+        | ((rows['year'].to_numpy()[first_new] == state['last_year'].to_numpy())
+           & (rows['quarter'].to_numpy()[first_new] <= state['last_quarter'].to_numpy()))
+    )
+    if stale.any():
+        raise ValueError(f"{stale.sum():,} banks have rows at or before their last processed quarter "
+                         f"(e.g. {group_banks[stale][0]!r}); rebuild the state instead of appending")
+
+    prefix_len = np.where(known, 1 + state['pending_count'].fillna(0).to_numpy(), 0).astype(np.int64)
+    prefix_group = np.repeat(np.arange(len(group_banks)), prefix_len)
+    prefix_pos = np.arange(prefix_len.sum()) - np.repeat(np.cumsum(prefix_len) - prefix_len, prefix_len)
+    current = state['current_tier'].fillna(0).to_numpy().astype(raw.dtype)
+    pending = state['pending_tier'].fillna(0).to_numpy().astype(raw.dtype)
+    prefix = np.where(prefix_pos == 0, current[prefix_group], pending[prefix_group])
+
+    row_group = np.repeat(np.arange(len(group_banks)), np.diff(offsets))
+    combined_group = np.concatenate([prefix_group, row_group])
+    combined_new = np.concatenate([np.zeros(len(prefix), dtype=bool), np.ones(len(raw), dtype=bool)])
+    combined_raw = np.concatenate([prefix, raw])
+    order = np.lexsort((np.arange(len(combined_raw)), combined_new, combined_group))
+
+    combined_offsets = group_offsets(combined_group[order])
+    sticky, tier_changes = sticky_tier_codes(combined_raw[order], combined_offsets,
+                                             params['min_consecutive_quarters'])
+    is_new = combined_new[order]
+
+    # Appended rows come last in each combined group, so the periods line up
+    combined_years = np.zeros(len(order), dtype=np.int64)
+    combined_quarters = np.zeros(len(order), dtype=np.int64)
+    combined_years[is_new] = rows['year'].to_numpy()
+    combined_quarters[is_new] = rows['quarter'].to_numpy()
+    new_state = _tier_state(group_banks, combined_raw[order], sticky, combined_offsets,
+                            combined_years, combined_quarters)
+    return sticky[is_new], new_state, tier_changes
+
+
+# ============================================================================
+# BANK-YEARS
+# ============================================================================
+
+def _open_quarters(panel, bank_col):
+    """Rows of each bank's latest year in a panel sorted by (bank, year, quarter)."""
+    offsets = group_offsets(panel[bank_col].to_numpy())
+    years = panel['year'].to_numpy()
+    latest = np.repeat(years[offsets[1:] - 1], np.diff(offsets))
+    return panel[years == latest].reset_index(drop=True)
+
+
+def _bank_years(panel, params):
+    return aggregate_annual(panel, params['feature_names'], stock_method=params['stock_method'],
+                            partial_years=params['partial_years'], bank_col=params['bank_col'],
+                            verbose=False)
+
+
+# ============================================================================
+# PERSISTENCE
+# ============================================================================
+
+def save_state(state, state_dir=STATE_DIR):
+    os.makedirs(state_dir, exist_ok=True)
+    for name in STATE_TABLES:
+        state[name].to_parquet(os.path.join(state_dir, f'{name}.parquet'), index=False)
+    with open(os.path.join(state_dir, 'params.json'), 'w') as f:
+        json.dump(state['params'], f, indent=2)
+
+
+def load_state(state_dir=STATE_DIR):
+    with open(os.path.join(state_dir, 'params.json')) as f:
+        params = json.load(f)
+    state = {'params': params}
+    for name in STATE_TABLES:
+        state[name] = pd.read_parquet(os.path.join(state_dir, f'{name}.parquet'))
+    return state
+
+
+# ============================================================================
+# BUILD AND APPEND
+# ============================================================================
+
+def build_incremental_state(raw, min_consecutive_quarters=3, min_years=9, stock_method='last',
+                            partial_years='annualize', innovation_features=INNOVATION_ONLY_FEATURES,
+                            bank_col='rssd9001', state_dir=STATE_DIR):
+    """
+    Run steps 1-8 on the full raw panel and persist the incremental state.
+
+    Returns:
+    --------
+    state : dict with 'tier_state', 'open_quarters', 'bank_year', 'changes' and 'params'
+    """
+    params = {
+        'min_consecutive_quarters': min_consecutive_quarters,
+        'min_years': min_years,
+        'stock_method': stock_method,
+        'partial_years': partial_years,
+        'thresholds': list(TIER_THRESHOLDS),
+        'labels': list(TIER_LABELS),
+        'bank_col': bank_col,
+    }
+
+    rows, feature_names = prepare_rows(raw)
+    rows, offsets = build_panel(rows, bank_col=bank_col)
+    raw_codes = raw_tier_codes(rows['total_assets'].to_numpy(), TIER_THRESHOLDS)
+    sticky, _ = sticky_tier_codes(raw_codes, offsets, min_consecutive_quarters)
+    rows['bank_tier'] = tier_labels_from_codes(sticky, TIER_LABELS)
+
+    change_features = [feat for feat in innovation_features if feat in feature_names]
+    params['feature_names'] = feature_names
+    params['change_features'] = change_features
+
+    bank_year = _bank_years(rows, params)
+    state = {
+        'params': params,
+        'tier_state': _tier_state(rows[bank_col].to_numpy()[offsets[:-1]], raw_codes, sticky, offsets,
+                                  rows['year'].to_numpy(), rows['quarter'].to_numpy()),
+        'open_quarters': _open_quarters(rows, bank_col),
+        'bank_year': bank_year,
+        'changes': calculate_innovation_change_scores(bank_year, change_features, min_years,
+                                                      bank_col=bank_col),
+    }
+    save_state(state, state_dir)
+    print(f"\n✓ Saved incremental state for {len(state['tier_state']):,} banks to {state_dir}")
+    return state
+
+
+def append_quarter(raw, state_dir=STATE_DIR):
+    """
+    Fold newly reported call-report rows into the persisted state.
+
+    Parameters:
+    -----------
+    raw : DataFrame of raw call-report rows for the new quarter(s)
+    state_dir : directory written by build_incremental_state
+
+    Returns:
+    --------
+    df_changes : updated change scores for all banks
+    affected_banks : array of banks whose state changed
+    """
+    state = load_state(state_dir)
+    params = state['params']
+    bank_col = params['bank_col']
+
+    print(f"\n{'='*80}")
+    print("APPENDING QUARTER TO INCREMENTAL STATE")
+    print(f"{'='*80}")
+
+    rows, _ = prepare_rows(raw)
+    rows, _ = build_panel(rows, bank_col=bank_col)
+    if rows.empty:
+        print("✓ No complete rows to append")
+        return state['changes'], np.array([])
+
+    sticky, new_tier_state, tier_changes = _continue_tiers(rows, state['tier_state'], bank_col, params)
+    rows['bank_tier'] = tier_labels_from_codes(sticky, params['labels'])
+    affected = new_tier_state['bank'].to_numpy()
+
+    tier_state = state['tier_state']
+    state['tier_state'] = pd.concat(
+        [tier_state[~tier_state['bank'].isin(affected)], new_tier_state], ignore_index=True)
+
+    # Earlier years are closed; only each bank's open year can gain quarters
+    open_quarters = state['open_quarters']
+    touched = open_quarters[bank_col].isin(affected)
+    combined = (pd.concat([open_quarters[touched], rows], ignore_index=True)
+                .sort_values([bank_col, 'year', 'quarter'], kind='mergesort')
+                .reset_index(drop=True))
+    state['open_quarters'] = pd.concat([open_quarters[~touched], _open_quarters(combined, bank_col)],
+                                       ignore_index=True)
+
+    keys = [bank_col, 'year']
+    updated = _bank_years(combined, params)
+    bank_year = state['bank_year']
+    replaced = pd.MultiIndex.from_frame(bank_year[keys]).isin(pd.MultiIndex.from_frame(updated[keys]))
+    state['bank_year'] = (pd.concat([bank_year[~replaced], updated], ignore_index=True)
+                          .sort_values(keys, kind='mergesort')
+                          .reset_index(drop=True))
+
+    bank_year = state['bank_year'][state['bank_year'][bank_col].isin(affected)]
+    new_changes = calculate_innovation_change_scores(bank_year, params['change_features'],
+                                                     params['min_years'], bank_col=bank_col,
+                                                     verbose=False)
+    changes = state['changes']
+    state['changes'] = (pd.concat([changes[~changes[bank_col].isin(affected)], new_changes],
+                                  ignore_index=True)
+                        .sort_values(bank_col, kind='mergesort')
+                        .reset_index(drop=True))
+
+    save_state(state, state_dir)
+    print(f"✓ Appended {len(rows):,} rows for {len(affected):,} banks")
+    print(f"✓ Tier changes in appended rows: {tier_changes:,}")
+    print(f"✓ Change scores: {len(state['changes']):,} banks")
+    return state['changes'], affected
@@ -0,0 +1,248 @@
+"""
+STAGE INSTRUMENTATION
+=====================
+Structured timing and memory records for pipeline stages, written as a JSON
+run report instead of being read off the console banners.
+
+``measure`` runs one stage function and records:
+
+    wall_seconds, cpu_seconds   time.perf_counter / time.process_time
+    peak_rss_mb                 highest resident set size seen while the stage
+                                ran (sampled from /proc/self/statm every few
+                                milliseconds; the process-lifetime peak from
+                                getrusage where /proc is unavailable)
+    rss_delta_mb                resident set size after minus before
+    rows_in, rows_out           rows of the first DataFrame argument / result
+    columns_added               result columns the input did not have
+
+With ``quiet=True`` the stage's own print banners are captured into the
+record's 'log' instead of the console.
+
+    report = new_report('refresh')
+    df = measure(report, 'merge', merge_split_columns, df)
+    write_report(report)                     # data/.run_reports/<time>-refresh.json
+    compare_reports(load_report(old_path), report)
+
+``compare_reports`` flags stages whose wall time grew beyond a tolerance.
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from wrds_cache import DATA_DIR
+
+RUN_REPORT_DIR = os.path.join(DATA_DIR, '.run_reports')
+SAMPLE_SECONDS = 0.005
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+# ============================================================================
+# MEMORY
+# ============================================================================
+
+def current_rss():
+    """Resident set size of this process in bytes (None without /proc)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def lifetime_peak_rss():
+    """Peak resident set size of the process so far, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _sample_peak(peak, stop):
+    """Keep the highest RSS in ``peak[0]`` until ``stop`` is set (run in a thread)."""
+    while not stop.wait(SAMPLE_SECONDS):
+        rss = current_rss()
+        if rss is not None and rss > peak[0]:
+            peak[0] = rss
+
+
+# ============================================================================
+# MEASURE
+# ============================================================================
+
+def _frame(value):
+    """The DataFrame in a stage input or output (first element of a tuple), or None."""
+    if isinstance(value, (tuple, list)) and value:
+        value = value[0]
+    return value if isinstance(value, pd.DataFrame) else None
+
+
+def new_report(name):
+    """Empty run report."""
+    return {
+        'name': name,
+        'started': datetime.now().isoformat(timespec='milliseconds'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'stages': [],
+    }
+
+
+def measure(report, stage, func, *args, quiet=False, **kwargs):
+    """
+    Call ``func(*args, **kwargs)`` and append its record to ``report``.
+
+    Parameters:
+    -----------
+    report : dict from new_report (None to just call ``func``)
+    stage : str, name recorded for this call
+    quiet : bool, capture the stage's console output into the record's 'log'
+
+    Returns:
+    --------
+    result : whatever ``func`` returns
+    """
+    if report is None:
+        return func(*args, **kwargs)
+
+    frame_in = next((frame for frame in map(_frame, args) if frame is not None), None)
+    start_rss = current_rss()
+    peak, stop = [start_rss], threading.Event()
+    sampler = threading.Thread(target=_sample_peak, args=(peak, stop), daemon=True) \
+        if start_rss is not None else None
+    if sampler:
+        sampler.start()
+    log = io.StringIO()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        with contextlib.redirect_stdout(log) if quiet else contextlib.nullcontext():
+            result = func(*args, **kwargs)
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        end_rss = current_rss()
+        if sampler:
+            stop.set()
+            sampler.join()
+
+    peak = max(peak[0], end_rss or 0) if sampler else lifetime_peak_rss()
+    frame_out = _frame(result)
+    record = {
+        'stage': stage,
+        'status': 'ran',
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'peak_rss_mb': peak / 1e6,
+        'rss_delta_mb': (end_rss - start_rss) / 1e6 if start_rss is not None else None,
+        'rows_in': len(frame_in) if frame_in is not None else None,
+        'rows_out': len(frame_out) if frame_out is not None else None,
+        'columns_in': frame_in.shape[1] if frame_in is not None else None,
+        'columns_out': frame_out.shape[1] if frame_out is not None else None,
+        'columns_added': ([str(col) for col in frame_out.columns if col not in frame_in.columns]
+                          if frame_in is not None and frame_out is not None else []),
+    }
+    if quiet:
+        record['log'] = log.getvalue()
+    report['stages'].append(record)
+    return result
+
+
+def record_cached(report, stage, seconds, output=None):
+    """Record a stage whose output was loaded from a cache instead of computed."""
+    if report is None:
+        return
+    frame_out = _frame(output)
+    report['stages'].append({
+        'stage': stage,
+        'status': 'cached',
+        'wall_seconds': seconds,
+        'rows_out': len(frame_out) if frame_out is not None else None,
+        'columns_out': frame_out.shape[1] if frame_out is not None else None,
+    })
+
+
+# ============================================================================
+# REPORTS
+# ============================================================================
+
+def report_table(report):
+    """One row per stage record."""
+    columns = ['stage', 'status', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rss_delta_mb',
+               'rows_in', 'rows_out', 'columns_added']
+    table = pd.DataFrame(report['stages'], columns=columns)
+    table['columns_added'] = [len(cols) if isinstance(cols, list) else 0 for cols in table['columns_added']]
+    return table
+
+
+def _number(value, fmt):
+    return format(value, fmt) if pd.notna(value) else '-'
+
+
+def print_report(report):
+    print(f"\n{'='*80}")
+    print(f"RUN REPORT: {report['name']}")
+    print(f"{'='*80}")
+    print(f"{'Stage':<16} {'Status':<7} {'Wall s':>8} {'CPU s':>8} {'Peak MB':>9} "
+          f"{'Rows in':>10} {'Rows out':>10} {'+Cols':>6}")
+    print("-" * 80)
+    for row in report_table(report).itertuples():
+        print(f"{row.stage:<16} {row.status:<7} {_number(row.wall_seconds, '.2f'):>8} "
+              f"{_number(row.cpu_seconds, '.2f'):>8} {_number(row.peak_rss_mb, ',.0f'):>9} "
+              f"{_number(row.rows_in, ',.0f'):>10} {_number(row.rows_out, ',.0f'):>10} {row.columns_added:>6}")
+    total = sum(record['wall_seconds'] for record in report['stages'])
+    print(f"\n✓ {len(report['stages'])} stages, {total:.2f}s wall")
+
+
+def write_report(report, path=None, report_dir=RUN_REPORT_DIR):
+    """Write the report as JSON (default: report_dir/<started>-<name>.json); returns the path."""
+    if path is None:
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"{report['started'].replace(':', '')}-{report['name']}.json")
+    report['total_wall_seconds'] = sum(record['wall_seconds'] for record in report['stages'])
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_reports(previous, current, tolerance=0.2, min_seconds=0.05):
+    """
+    Wall time per stage in two reports, with stages that slowed down flagged.
+
+    A stage is a regression when it ran in both reports, took at least
+    ``min_seconds`` now and is more than ``tolerance`` (as a fraction) slower.
+    """
+    def ran(report):
+        return {record['stage']: record for record in report['stages'] if record['status'] == 'ran'}
+
+    before, after = ran(previous), ran(current)
+    rows = []
+    for stage in after:
+        if stage not in before:
+            continue
+        old, new = before[stage]['wall_seconds'], after[stage]['wall_seconds']
+        rows.append({
+            'stage': stage,
+            'previous_seconds': old,
+            'current_seconds': new,
+            'ratio': new / old if old else float('inf'),
+            'previous_peak_mb': before[stage]['peak_rss_mb'],
+            'current_peak_mb': after[stage]['peak_rss_mb'],
+        })
+    table = pd.DataFrame(rows, columns=['stage', 'previous_seconds', 'current_seconds', 'ratio',
+                                        'previous_peak_mb', 'current_peak_mb'])
+    table['regression'] = (table['current_seconds'] >= min_seconds) & (table['ratio'] > 1 + tolerance)
+    return table
@@ -0,0 +1,110 @@
+"""
+CACHED NEAREST-NEIGHBOUR GRAPHS
+===============================
+The nearest-neighbour search in a UMAP fit depends only on the scaled data,
+the metric and ``n_neighbors``, yet every change to ``min_dist`` or the
+HDBSCAN settings used to repeat it. This module builds each tier's kNN
+graph once, with the same NNDescent call UMAP makes internally, caches it on
+disk under a hash of the data, and hands UMAP a slice of it through
+``precomputed_knn``. The parameter sweep (sweep.py) builds each tier's graph
+at the largest n_neighbors in its grid and shares it with every worker.
+
+A graph built for k neighbours serves every ``n_neighbors <= k``: columns
+are sorted by distance, so the first n columns are the n nearest points.
+When a larger ``n_neighbors`` is requested the graph is rebuilt at that size
+and replaces the cached one.
+
+Tiers smaller than 4,096 rows get NNDescent here where UMAP would have used
+exact distances, which can move embeddings slightly; the neighbour sets are
+the same in practice at this size.
+"""
+
+import hashlib
+import os
+import warnings
+
+import numpy as np
+import umap
+from sklearn.utils import check_random_state
+from umap.umap_ import nearest_neighbors
+
+from wrds_cache import DATA_DIR
+
+KNN_CACHE_DIR = os.path.join(DATA_DIR, '.knn_cache')
+
+
+def data_hash(scaled, metric='euclidean', random_state=42):
+    """SHA-256 of the matrix contents, shape, metric and seed."""
+    scaled = np.ascontiguousarray(scaled, dtype=np.float64)
+    digest = hashlib.sha256()
+    digest.update(repr((scaled.shape, metric, random_state)).encode())
+    digest.update(scaled.tobytes())
+    return digest.hexdigest()
+
+
+def compute_knn(scaled, n_neighbors, metric='euclidean', random_state=42):
+    """(knn_indices, knn_dists, search_index) exactly as UMAP's approximate path builds them."""
+    return nearest_neighbors(np.ascontiguousarray(scaled, dtype=np.float64), n_neighbors, metric, {},
+                             False, check_random_state(random_state), low_memory=True,
+                             use_pynndescent=True, n_jobs=-1)
+
+
+def cached_knn(scaled, n_neighbors, metric='euclidean', random_state=42,
+               cache_dir=KNN_CACHE_DIR, verbose=False):
+    """
+    kNN graph for ``scaled`` with at least ``n_neighbors`` columns, from disk when possible.
+
+    Only the graph is cached, as .npy arrays that load in milliseconds. The
+    NNDescent search index is not: unpickling it costs more than rebuilding
+    the graph, so reducers fitted from a cached graph cannot ``transform``.
+
+    Returns:
+    --------
+    knn : dict with 'indices' and 'dists' (n_rows x k, k >= n_neighbors)
+    """
+    key = data_hash(scaled, metric, random_state)
+    graph_dir = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(graph_dir, 'dists.npy')):
+        knn = {name: np.load(os.path.join(graph_dir, f'{name}.npy')) for name in ('indices', 'dists')}
+        if knn['indices'].shape[1] >= n_neighbors:
+            if verbose:
+                print(f"✓ kNN graph cache hit ({key[:12]}, k={knn['indices'].shape[1]})")
+            return knn
+
+    if verbose:
+        print(f"  Building kNN graph: {len(scaled):,} rows, k={n_neighbors}")
+    indices, dists, _ = compute_knn(scaled, n_neighbors, metric, random_state)
+    os.makedirs(graph_dir, exist_ok=True)
+    np.save(os.path.join(graph_dir, 'indices.npy'), indices)
+    # dists.npy is written last and marks the entry as complete
+    np.save(os.path.join(graph_dir, 'dists.npy'), dists)
+    return {'indices': indices, 'dists': dists}
+
+
+def precomputed_knn(knn, n_neighbors):
+    """
+    ``precomputed_knn`` tuple for ``umap.UMAP`` from a cached graph.
+
+    Slices to ``n_neighbors`` columns here (UMAP skips its own pruning on
+    small inputs) and copies, since UMAP marks disconnected edges in place.
+    """
+    return np.array(knn['indices'][:, :n_neighbors]), np.array(knn['dists'][:, :n_neighbors])
+
+
+def fit_umap(scaled, umap_params, knn):
+    """
+    Fit a UMAP embedding on a cached kNN graph (see ``cached_knn``).
+
+    For exploring embedding and clustering parameters; the final per-tier
+    models in cluster_models are fitted normally so they can ``transform``.
+
+    Returns:
+    --------
+    reducer, embedding
+    """
+    reducer = umap.UMAP(**umap_params, precomputed_knn=precomputed_knn(knn, umap_params['n_neighbors']))
+    with warnings.catch_warnings():
+        # Without a search index UMAP warns that transform is unavailable
+        warnings.filterwarnings('ignore', message='precomputed_knn')
+        embedding = reducer.fit_transform(scaled)
+    return reducer, embedding
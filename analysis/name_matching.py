@@ -0,0 +1,320 @@
+"""
+BANK NAME ENTITY RESOLUTION
+===========================
+Matches call-report bank names (RSSD universe) to EDGAR registrants, the
+job behind data/bank_registry.csv (CIK <-> RSSD_ID <-> CERT through
+Bank_Name / Edgar_Name).
+
+Instead of scoring all pairs, names are:
+
+1. normalized - upper case, punctuation removed, legal and holding-company
+   words dropped (CORP, INC, BANCORP, BANKING, N.A., FSB, THE, ...), and
+   EDGAR state tags such as "/VA/" split off into a state column;
+2. indexed by character n-grams - TF-IDF weighted, l2-normalized sparse
+   vectors, so a sparse product walks the n-gram posting lists only for
+   n-grams two names share (n-grams in more than ``max_ngram_df`` of names
+   are dropped as stop-grams);
+3. blocked - pairs must share at least one normalized name token and, when
+   both sides have a state, the same state.
+
+The cosine of the n-gram vectors is the Match_Score. Identical normalized
+names are 'exact' matches only when the name is distinctive (not just
+generic words such as FIRST or COMMUNITY); everything else above the
+threshold is 'fuzzy'. EDGAR names that tie on the score, such as several
+"Sterling Bancorp" registrants, are ranked by the cosine of their canonical
+names (bank words kept, so a Bank prefers a Bancorp over a Financial Corp)
+and then by name. A tie that remains is marked 'ambiguous' for review.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from wrds_cache import DATA_DIR
+
+REGISTRY_FILE = os.path.join(DATA_DIR, 'bank_registry.csv')
+REGISTRY_COLUMNS = ['BANK_ID', 'CIK', 'RSSD_ID', 'CERT', 'Bank_Name', 'Edgar_Name', 'Match_Type', 'Match_Score']
+
+# Words that say what kind of legal entity it is, not which bank
+ENTITY_WORDS = [
+    'NATIONAL ASSOCIATION', 'N A', 'NA', 'FSB', 'SSB', 'F S B', 'S S B',
+    'INCORPORATED', 'INC', 'CORPORATION', 'CORP', 'CO', 'COMPANY', 'LTD', 'LLC', 'PLC', 'THE', 'OF', 'AND',
+]
+# Bank and holding-company words; the bank ones read as BANK in canonical names
+BANK_WORDS = [
+    'BANCORPORATION', 'BANCORP', 'BANCSHARES', 'BANKSHARES', 'BANKCORP', 'BANCGROUP', 'BANCSYSTEM',
+    'BANKING', 'BANC', 'BANKS', 'BANK',
+]
+HOLDING_WORDS = ['FINANCIAL SERVICES', 'FINANCIAL', 'HOLDINGS', 'HOLDING', 'GROUP']
+LEGAL_WORDS = ENTITY_WORDS + BANK_WORDS + HOLDING_WORDS
+
+# Words too common among bank names to identify one on their own
+GENERIC_WORDS = {
+    'FIRST', '1ST', 'ONE', 'COMMUNITY', 'NATIONAL', 'STATE', 'FEDERAL', 'SAVINGS', 'TRUST', 'CAPITAL',
+    'UNITED', 'AMERICAN', 'AMERICA', 'CITIZENS', 'PEOPLES', 'FARMERS', 'MERCHANTS', 'COMMERCE',
+    'COMMERCIAL', 'SECURITY', 'GUARANTY', 'HOME', 'HOMETOWN', 'CITY', 'COUNTY', 'VALLEY', 'CENTRAL',
+    'NORTH', 'SOUTH', 'EAST', 'WEST', 'NORTHERN', 'SOUTHERN', 'EASTERN', 'WESTERN', 'NEW', 'GREAT',
+    'PREMIER',
+}
+
+
+def _word_pattern(words):
+    return re.compile(r'\b(?:' + '|'.join(sorted(map(re.escape, words), key=len, reverse=True)) + r')\b')
+
+
+_LEGAL_PATTERN = _word_pattern(LEGAL_WORDS)
+_ENTITY_PATTERN = _word_pattern(ENTITY_WORDS)
+_BANK_PATTERN = _word_pattern(BANK_WORDS)
+_STATE_TAG = re.compile(r'/([A-Z]{2})/?\s*$')
+
+MATCH_THRESHOLD = 0.85
+
+
+# ============================================================================
+# NORMALIZATION
+# ============================================================================
+
+def _clean_names(names):
+    """Upper case, no state tag or punctuation, single spaces."""
+    text = pd.Series(names, dtype='object').fillna('').astype(str).str.upper()
+    text = text.str.replace(_STATE_TAG, ' ', regex=True)
+    text = text.str.replace('&', ' AND ', regex=False)
+    text = text.str.replace(r"[.']", '', regex=True)            # N.A. -> NA, BANK'S -> BANKS
+    return text.str.replace(r'[^A-Z0-9]+', ' ', regex=True).str.split().str.join(' ')
+
+
+def canonical_names(names):
+    """Names without entity words, every bank word written as BANK ("MIDDLEFIELD BANC CORP" -> "MIDDLEFIELD BANK")."""
+    text = _clean_names(names)
+    canonical = (text.str.replace(_ENTITY_PATTERN, ' ', regex=True)
+                 .str.replace(_BANK_PATTERN, 'BANK', regex=True)
+                 .str.split().str.join(' '))
+    return canonical.where(canonical != '', text)
+
+
+def is_distinctive(normalized):
+    """True where a normalized name has a non-generic word or two generic ones, legal words aside."""
+    words = pd.Series(normalized, dtype='object').fillna('').str.split()
+    words = words.map(lambda ws: [w for w in ws if not _LEGAL_PATTERN.fullmatch(w)])
+    return words.map(lambda ws: len(ws) > 1 or any(len(w) > 1 and w not in GENERIC_WORDS for w in ws)).astype(bool)
+
+
+def normalize_names(names):
+    """
+    Upper-case names without punctuation, state tags and legal words.
+
+    A name is only cut down that far when something distinctive is left.
+    Otherwise "First Bank" and "First Financial Corp" would both become
+    "FIRST". Those names keep their canonical form ("FIRST BANK",
+    "FIRST FINANCIAL"), and a name made only of legal words ("The Bank")
+    keeps all its words.
+    """
+    text = _clean_names(names)
+    stripped = text.str.replace(_LEGAL_PATTERN, ' ', regex=True).str.split().str.join(' ')
+    return stripped.where(is_distinctive(stripped), canonical_names(names))
+
+
+def edgar_states(names):
+    """State from EDGAR conformed-name tags like 'FIRST NATIONAL CORP /VA/' (None if absent)."""
+    return pd.Series(names, dtype='object').fillna('').astype(str).str.upper().str.extract(_STATE_TAG)[0]
+
+
+# ============================================================================
+# CANDIDATE GENERATION
+# ============================================================================
+
+def _top_k_per_row(scores, top_k):
+    """(rows, cols, values) of the ``top_k`` largest entries in each row of a sparse matrix, plus ties with the k-th."""
+    scores = scores.tocoo()
+    order = np.lexsort((scores.col, -scores.data, scores.row))
+    rows, cols, values = scores.row[order], scores.col[order], scores.data[order]
+    starts = np.searchsorted(rows, rows, side='left')
+    ends = np.searchsorted(rows, rows, side='right') - 1
+    rank = np.arange(len(rows)) - starts
+    keep = (rank < top_k) | (values == values[np.minimum(starts + top_k - 1, ends)])
+    return rows[keep], cols[keep], values[keep]
+
+
+def _block_matches(left_vectors, right_vectors, left_tokens, right_tokens, threshold, top_k, chunk_size):
+    rows, cols, values = [], [], []
+    right_t = right_vectors.T.tocsr()
+    right_tokens_t = right_tokens.T.tocsr()
+    for start in range(0, left_vectors.shape[0], chunk_size):
+        stop = start + chunk_size
+        scores = (left_vectors[start:stop] @ right_t).tocsr()
+        shares_token = (left_tokens[start:stop] @ right_tokens_t) > 0
+        scores = scores.multiply(shares_token).tocsr()
+        scores.data[scores.data < threshold] = 0
+        scores.eliminate_zeros()
+        r, c, v = _top_k_per_row(scores, top_k)
+        rows.append(r + start)
+        cols.append(c)
+        values.append(v)
+    if not rows:
+        return np.empty(0, int), np.empty(0, int), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(values)
+
+
+def match_names(left_names, right_names, left_states=None, right_states=None, threshold=MATCH_THRESHOLD,
+                top_k=1, ngram=3, max_ngram_df=0.5, chunk_size=5_000):
+    """
+    Scored candidate matches between two name lists.
+
+    Parameters:
+    -----------
+    left_names, right_names : sequences of raw names (e.g. call-report and EDGAR)
+    left_states, right_states : optional state codes for blocking; a missing
+                                state on either side matches any state
+    threshold : minimum n-gram cosine score
+    top_k : candidates kept per left name
+
+    Returns:
+    --------
+    matches : DataFrame with left_index, right_index (positions), left_name,
+              right_name, normalized names, score, tie_score (canonical-name
+              cosine used to rank equal scores) and match_type
+    """
+    left_names = pd.Series(left_names, dtype='object').reset_index(drop=True)
+    right_names = pd.Series(right_names, dtype='object').reset_index(drop=True)
+    left_norm = normalize_names(left_names)
+    right_norm = normalize_names(right_names)
+
+    vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(ngram, ngram), lowercase=False,
+                                 max_df=max_ngram_df, sublinear_tf=True, dtype=np.float32)
+    vectorizer.fit(pd.concat([left_norm, right_norm]))
+    left_vectors = vectorizer.transform(left_norm).tocsr()
+    right_vectors = vectorizer.transform(right_norm).tocsr()
+
+    tokenizer = CountVectorizer(lowercase=False, token_pattern=r'\S+', binary=True, dtype=np.int32)
+    tokenizer.fit(pd.concat([left_norm, right_norm]))
+    left_tokens = tokenizer.transform(left_norm).tocsr()
+    right_tokens = tokenizer.transform(right_norm).tocsr()
+
+    left_canonical = canonical_names(left_names)
+    right_canonical = canonical_names(right_names)
+    tie_vectorizer = TfidfVectorizer(analyzer='char', ngram_range=(ngram, ngram), lowercase=False,
+                                     sublinear_tf=True, dtype=np.float32)
+    tie_vectorizer.fit(pd.concat([left_canonical, right_canonical]))
+
+    left_states = (pd.Series(left_states, dtype='object').reset_index(drop=True)
+                   if left_states is not None else pd.Series([None] * len(left_names), dtype='object'))
+    right_states = (pd.Series(right_states, dtype='object').reset_index(drop=True)
+                    if right_states is not None else pd.Series([None] * len(right_names), dtype='object'))
+
+    # Blocks: each state against the same state plus unknown states; unknown against everything
+    blocks = []
+    right_unknown = right_states.isna().to_numpy()
+    for state, left_idx in left_states.groupby(left_states.fillna('')).groups.items():
+        left_idx = np.asarray(left_idx)
+        if state == '':
+            right_idx = np.arange(len(right_names))
+        else:
+            right_idx = np.flatnonzero((right_states == state).to_numpy() | right_unknown)
+        if len(right_idx):
+            blocks.append((left_idx, right_idx))
+
+    rows, cols, values = [], [], []
+    for left_idx, right_idx in blocks:
+        r, c, v = _block_matches(left_vectors[left_idx], right_vectors[right_idx],
+                                 left_tokens[left_idx], right_tokens[right_idx],
+                                 threshold, top_k, chunk_size)
+        rows.append(left_idx[r])
+        cols.append(right_idx[c])
+        values.append(v)
+
+    left_index = np.concatenate(rows) if rows else np.empty(0, int)
+    right_index = np.concatenate(cols) if cols else np.empty(0, int)
+    scores = np.concatenate(values).astype(float) if values else np.empty(0)
+
+    tie_scores = np.asarray(
+        tie_vectorizer.transform(left_canonical.to_numpy()[left_index])
+        .multiply(tie_vectorizer.transform(right_canonical.to_numpy()[right_index]))
+        .sum(axis=1)).ravel().astype(float)
+
+    exact = ((left_norm.to_numpy()[left_index] == right_norm.to_numpy()[right_index])
+             & is_distinctive(left_norm.to_numpy()[left_index]).to_numpy())
+    matches = pd.DataFrame({
+        'left_index': left_index,
+        'right_index': right_index,
+        'left_name': left_names.to_numpy()[left_index],
+        'right_name': right_names.to_numpy()[right_index],
+        'left_normalized': left_norm.to_numpy()[left_index],
+        'right_normalized': right_norm.to_numpy()[right_index],
+        'score': np.where(exact, 1.0, np.minimum(scores, 1.0)),
+        'tie_score': np.round(tie_scores, 6),
+        'match_type': np.where(exact, 'exact', 'fuzzy'),
+    })
+    matches = matches.sort_values(['left_index', 'score', 'tie_score', 'right_name', 'right_index'],
+                                  ascending=[True, False, False, True, True], kind='mergesort')
+    tied = matches.duplicated(['left_index', 'score', 'tie_score'], keep=False)
+    matches.loc[tied, 'match_type'] = 'ambiguous'
+    return matches.groupby('left_index').head(top_k).reset_index(drop=True)
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+def build_registry(banks, edgar, existing=None, threshold=MATCH_THRESHOLD, bank_state_col=None,
+                   edgar_state_col=None):
+    """
+    Rebuild bank_registry.csv from the RSSD universe and the EDGAR company list.
+
+    Parameters:
+    -----------
+    banks : DataFrame with RSSD_ID, Bank_Name and optionally CERT and a state column
+    edgar : DataFrame with CIK, Edgar_Name and optionally a state column (states
+            are otherwise read from EDGAR '/XX/' name tags)
+    existing : previous registry; its manual_verified rows are kept as they are and
+               BANK_IDs stay attached to their RSSD_ID
+
+    Match_Type is 'exact', 'fuzzy' or 'ambiguous' (several EDGAR registrants
+    fit equally well; the first by name is kept and should be checked).
+
+    Returns:
+    --------
+    registry : DataFrame with REGISTRY_COLUMNS, best EDGAR match per bank
+    """
+    manual = pd.DataFrame(columns=REGISTRY_COLUMNS)
+    if existing is not None:
+        manual = existing[existing['Match_Type'] == 'manual_verified']
+        banks = banks[~banks['RSSD_ID'].isin(manual['RSSD_ID'])]
+
+    banks = banks.reset_index(drop=True)
+    # One row per registrant and normalized name, in a fixed order, so ties only
+    # come from different registrants and do not depend on the input order
+    edgar = (edgar.assign(_normalized=normalize_names(edgar['Edgar_Name']).to_numpy())
+             .sort_values(['Edgar_Name', 'CIK'], kind='mergesort')
+             .drop_duplicates(['CIK', '_normalized'])
+             .drop(columns='_normalized')
+             .reset_index(drop=True))
+    matches = match_names(
+        banks['Bank_Name'], edgar['Edgar_Name'],
+        banks[bank_state_col] if bank_state_col else None,
+        edgar[edgar_state_col] if edgar_state_col else edgar_states(edgar['Edgar_Name']),
+        threshold=threshold, top_k=1,
+    )
+
+    matched = pd.DataFrame({
+        'CIK': edgar['CIK'].to_numpy()[matches['right_index']],
+        'RSSD_ID': banks['RSSD_ID'].to_numpy()[matches['left_index']],
+        'CERT': (banks['CERT'].to_numpy()[matches['left_index']] if 'CERT' in banks.columns
+                 else np.nan),
+        'Bank_Name': matches['left_name'],
+        'Edgar_Name': matches['right_name'],
+        'Match_Type': matches['match_type'],
+        'Match_Score': matches['score'],
+    })
+    registry = pd.concat([manual.drop(columns='BANK_ID'), matched], ignore_index=True)
+
+    # Keep existing BANK_IDs; new banks continue the sequence
+    known = {} if existing is None else dict(zip(existing['RSSD_ID'], existing['BANK_ID']))
+    bank_ids = registry['RSSD_ID'].map(known)
+    next_id = int(max(known.values(), default=0)) + 1
+    new = bank_ids.isna()
+    bank_ids[new] = np.arange(next_id, next_id + new.sum())
+    registry.insert(0, 'BANK_ID', bank_ids.astype(int))
+    return registry.sort_values('BANK_ID').reset_index(drop=True)[REGISTRY_COLUMNS]
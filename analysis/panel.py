@@ -0,0 +1,79 @@
+"""
+INTEGER-KEYED BANK PANEL
+========================
+The call-report panel keyed the way help.py documents it: RSSD_ID
+(``rssd9001``) plus period. Grouping on the legal name (``rssd9017``)
+merged unrelated banks that share a name and split banks that were renamed,
+and every string groupby hashed millions of names again.
+
+``build_panel`` sorts the quarterly frame once by (rssd9001, year, quarter),
+stores the bank id as an integer and the name and tier as categoricals, and
+returns the per-bank offsets: bank ``g`` occupies rows
+``offsets[g]:offsets[g+1]``. Sticky tiers (tiers.py), the bank-year table
+(annual.py) and change scores (change_scores.py) take those offsets instead
+of grouping again.
+"""
+
+import numpy as np
+import pandas as pd
+
+from tiers import TIER_LABELS, group_offsets
+
+BANK_COL = 'rssd9001'
+NAME_COL = 'rssd9017'
+TIER_COL = 'bank_tier'
+
+
+def tier_dtype(labels=TIER_LABELS):
+    """Ordered categorical dtype for tier labels (Small < Medium < Large)."""
+    return pd.CategoricalDtype(list(labels), ordered=True)
+
+
+def build_panel(df, bank_col=BANK_COL, name_col=NAME_COL, time_cols=('year', 'quarter'),
+                labels=TIER_LABELS):
+    """
+    Sorted, integer-keyed copy of a quarterly panel.
+
+    Parameters:
+    -----------
+    df : DataFrame with bank_col and time_cols (rows without a bank id or a
+         period, e.g. from an unparseable report date, are dropped)
+    bank_col : str, integer bank identifier
+    name_col : str, bank name column, stored as a categorical
+    time_cols : columns ordering a bank's rows
+
+    Returns:
+    --------
+    panel : DataFrame sorted by (bank_col, *time_cols) with a RangeIndex
+    offsets : per-bank row offsets (see ``tiers.group_offsets``)
+    """
+    banks = pd.to_numeric(df[bank_col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    dated = np.logical_and.reduce([df[col].notna().to_numpy() for col in time_cols])
+    rows = np.flatnonzero(~np.isnan(banks) & dated)
+    keys = [df[col].to_numpy()[rows] for col in reversed(time_cols)]
+    order = rows[np.lexsort(keys + [banks[rows]])]
+
+    panel = df.take(order).reset_index(drop=True)
+    panel[bank_col] = banks[order].astype(np.int64)
+    for col in time_cols:
+        # Unparseable dates left the period columns as float; they are whole now
+        if pd.api.types.is_float_dtype(panel[col]):
+            panel[col] = panel[col].astype(np.int64)
+    if name_col in panel.columns:
+        panel[name_col] = panel[name_col].astype('category')
+    if TIER_COL in panel.columns:
+        panel[TIER_COL] = panel[TIER_COL].astype(tier_dtype(labels))
+    return panel, group_offsets(panel[bank_col].to_numpy())
+
+
+def block_offsets(*keys):
+    """Offsets of contiguous runs where none of the aligned ``keys`` arrays change."""
+    n = len(keys[0])
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    changed = np.zeros(n - 1, dtype=bool)
+    for key in keys:
+        key = np.asarray(key)
+        changed |= key[1:] != key[:-1]
+    return np.concatenate(([0], np.flatnonzero(changed) + 1, [n])).astype(np.int64)
+
@@ -0,0 +1,350 @@
+"""
+CACHED STAGE PIPELINE
+=====================
+The Jdorval workflow as a DAG of stages whose outputs are cached on disk,
+so editing one step reruns that step and what depends on it instead of the
+whole notebook:
+
+    load -> merge -> ratios ------+
+                  -> extra_ratios +-> features -> tiers -> bank_year -> changes -> scaling
+                                                                              -> clusters
+                                                                 -> trajectories
+
+Every stage is declared once with ``stage(...)`` (like ratios.ratio). Its
+cache key is a hash of:
+
+    code     source of the stage function and the modules it calls into
+    params   JSON parameters (ratio specs, HDBSCAN settings, min_years, ...)
+    inputs   keys of the upstream stages it reads
+
+Because each key folds in its inputs' keys, a change anywhere upstream
+reaches every dependent stage and nothing else. Changing an HDBSCAN
+parameter reruns only 'clusters'; editing one entry of ADDITIONAL_RATIOS
+reruns 'extra_ratios' and its descendants but not 'ratios' or 'merge'. The
+'load' key also includes the SHA-256 of the WRDS CSVs (wrds_cache), so
+replacing a file invalidates everything.
+
+Outputs are joblib files under data/.pipeline_cache/<stage>/<key>.joblib.
+Earlier keys are kept, so switching a parameter back is a cache hit. A stage
+whose real output lives outside the cache declares a ``check``. 'scaling'
+is one: it caches only the feature-store version string. The check runs on
+every cache hit. For 'scaling' it confirms the memory-mapped matrices are
+still on disk and repoints the store's LATEST at the cached version. If the
+files are gone, the stage reruns and rewrites them. Every
+run also writes a JSON run report with each stage's wall and CPU time,
+peak RSS and rows in/out (instrument.py) to data/.run_reports/.
+Reports, such as the Quarto manuscript in report/, can read a finished
+stage without running anything:
+
+    from pipeline import load_artifact
+    df_changes, tier_models = load_artifact('clusters')
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import time
+
+import joblib
+import pandas as pd
+
+import annual
+import change_scores
+import cluster_models
+import feature_store
+import features
+import panel
+import ratios
+import schema
+import split_columns
+import tiers
+import wrds_cache
+from cluster_models import HDBSCAN_PARAMS, UMAP_PARAMS
+from features import FEATURE_COLUMNS, INNOVATION_ONLY_FEATURES, prepare_clustering_features
+from instrument import RUN_REPORT_DIR, measure, new_report, print_report, record_cached, write_report
+from ratios import ADDITIONAL_RATIOS, CORE_RATIOS, evaluate_ratios, required_columns
+from wrds_cache import DATA_DIR, PIPELINE_COLUMNS, WRDS_FILES, _load_manifest, load_wrds_panel, source_hash
+
+PIPELINE_CACHE_DIR = os.path.join(DATA_DIR, '.pipeline_cache')
+MIN_YEARS = 9   # bank-years a bank needs for change scores (saved with the cluster models)
+
+
+def stage(name, func, inputs=(), params=None, code=(), fingerprint=None, check=None):
+    """
+    Declare a pipeline stage.
+
+    Parameters:
+    -----------
+    name : str, stage name (cache subdirectory)
+    func : called as ``func(*input outputs, **params)``
+    inputs : names of the upstream stages whose outputs ``func`` takes
+    params : JSON-serializable keyword arguments, part of the cache key
+    code : functions or modules whose source is part of the cache key
+    fingerprint : optional callable returning extra key material (e.g. file hashes)
+    check : optional callable ``check(output, **params)`` run when the stage is
+            loaded from cache, for outputs that stand for files outside the
+            cache; returning False reruns the stage
+    """
+    return {
+        'name': name,
+        'func': func,
+        'inputs': list(inputs),
+        'params': dict(params or {}),
+        'code': [func] + list(code),
+        'fingerprint': fingerprint,
+        'check': check,
+    }
+
+
+# ============================================================================
+# STAGE FUNCTIONS
+# ============================================================================
+
+def _load(sources, columns):
+    return load_wrds_panel(sources=sources, columns=columns)
+
+
+def _merge(data, split_pairs):
+    df = data.copy()
+    df['report_date'] = pd.to_datetime(data['rssd9999'], errors='coerce')
+    df['year'] = df['report_date'].dt.year
+    df['quarter'] = df['report_date'].dt.quarter
+    return split_columns.merge_split_columns(df, [tuple(pair) for pair in split_pairs])
+
+
+def _ratios(merged, specs):
+    """Only the ratio columns, so the merged frame is neither copied nor modified."""
+    inputs = merged[[col for col in required_columns(specs) if col in merged.columns]].copy()
+    evaluate_ratios(inputs, specs)
+    print(f"✓ Calculated {len(specs)} ratios")
+    return inputs[[spec['name'] for spec in specs]]
+
+
+def _features(merged, core, extra, feature_cols):
+    df = pd.concat([merged, core, extra.drop(columns=core.columns, errors='ignore')], axis=1)
+    return prepare_clustering_features(df, feature_cols)
+
+
+def _tiers(features, min_consecutive_quarters):
+    df_umap, feature_names = features
+    df_umap, offsets = panel.build_panel(df_umap)
+    df_umap = tiers.assign_sticky_bank_tiers(df_umap, asset_col='total_assets',
+                                             min_consecutive_quarters=min_consecutive_quarters,
+                                             offsets=offsets)
+    return df_umap, feature_names
+
+
+def _bank_year(tiered, stock_method, partial_years, ratio_specs):
+    df_umap, feature_names = tiered
+    return annual.aggregate_annual(df_umap, feature_names, stock_method=stock_method,
+                                   partial_years=partial_years, ratio_specs=ratio_specs)
+
+
+def _changes(bank_year, innovation_features, min_years):
+    available = [feat for feat in innovation_features if feat in bank_year.columns]
+    return change_scores.calculate_innovation_change_scores(
+        bank_year, available, min_years=min_years,
+        offsets=panel.block_offsets(bank_year[panel.BANK_COL].to_numpy()))
+
+
+def _trajectories(bank_year, innovation_features, window):
+    available = [feat for feat in innovation_features if feat in bank_year.columns]
+    return change_scores.calculate_rolling_change_scores(
+        bank_year, available, window=window, trends=True,
+        offsets=panel.block_offsets(bank_year[panel.BANK_COL].to_numpy()))
+
+
+def _change_cols(df_changes):
+    return [col for col in df_changes.columns if col.endswith('_change')]
+
+
+def _scaling(df_changes, store_dir):
+    return feature_store.write_tier_matrices(df_changes, _change_cols(df_changes), store_dir=store_dir)
+
+
+def _clusters(df_changes, umap_params, hdbscan_params):
+    return cluster_models.fit_tier_models(df_changes, _change_cols(df_changes),
+                                          umap_params=umap_params, hdbscan_params=hdbscan_params)
+
+
+def _source_hashes(sources):
+    manifest = _load_manifest()
+    return {os.path.basename(path): source_hash(path, manifest) for path in sources}
+
+
+def pipeline_stages(sources=None, columns=PIPELINE_COLUMNS, core_ratios=CORE_RATIOS,
+                    additional_ratios=ADDITIONAL_RATIOS, feature_cols=FEATURE_COLUMNS,
+                    min_consecutive_quarters=3, stock_method='last', partial_years='annualize',
+                    innovation_features=INNOVATION_ONLY_FEATURES, min_years=MIN_YEARS, window=3,
+                    umap_params=UMAP_PARAMS, hdbscan_params=HDBSCAN_PARAMS,
+                    feature_store_dir=feature_store.FEATURE_STORE_DIR):
+    """The Jdorval workflow (steps 1-9 and clustering) as stage declarations."""
+    sources = list(WRDS_FILES if sources is None else sources)
+    return [
+        stage('load', _load, params={'sources': sources, 'columns': list(columns)},
+              code=[wrds_cache, schema], fingerprint=lambda: _source_hashes(sources)),
+        stage('merge', _merge, ['load'], {'split_pairs': [list(pair) for pair in split_columns.SPLIT_PAIRS]},
+              code=[split_columns]),
+        stage('ratios', _ratios, ['merge'], {'specs': list(core_ratios)}, code=[ratios]),
+        stage('extra_ratios', _ratios, ['merge'], {'specs': list(additional_ratios)}, code=[ratios]),
+        stage('features', _features, ['merge', 'ratios', 'extra_ratios'], {'feature_cols': list(feature_cols)},
+              code=[features]),
+        stage('tiers', _tiers, ['features'], {'min_consecutive_quarters': min_consecutive_quarters},
+              code=[panel, tiers]),
+        stage('bank_year', _bank_year, ['tiers'],
+              {'stock_method': stock_method, 'partial_years': partial_years,
+               'ratio_specs': list(core_ratios) + list(additional_ratios)}, code=[annual]),
+        stage('changes', _changes, ['bank_year'],
+              {'innovation_features': list(innovation_features), 'min_years': min_years},
+              code=[change_scores]),
+        stage('trajectories', _trajectories, ['bank_year'],
+              {'innovation_features': list(innovation_features), 'window': window},
+              code=[change_scores]),
+        stage('scaling', _scaling, ['changes'], {'store_dir': feature_store_dir}, code=[feature_store],
+              check=feature_store.use_version),
+        stage('clusters', _clusters, ['changes'],
+              {'umap_params': dict(umap_params), 'hdbscan_params': dict(hdbscan_params)},
+              code=[cluster_models]),
+    ]
+
+
+# ============================================================================
+# CACHE KEYS
+# ============================================================================
+
+def code_hash(objects):
+    """SHA-256 over the source of functions and modules."""
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode())
+    return digest.hexdigest()
+
+
+def data_hash(df):
+    """Content hash of a DataFrame (values, index and column names)."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def stage_keys(stages, data=None):
+    """
+    Cache key of every stage.
+
+    ``data`` maps stage names to outputs supplied directly (for example a
+    synthetic raw panel for 'load'); their keys are content hashes.
+    """
+    data = data or {}
+    by_name = {s['name']: s for s in stages}
+    keys = {}
+
+    def key(name):
+        if name not in keys:
+            if name in data:
+                keys[name] = 'data-' + data_hash(data[name])[:16]
+            else:
+                s = by_name[name]
+                material = {
+                    'name': name,
+                    'code': code_hash(s['code']),
+                    'params': s['params'],
+                    'inputs': [key(parent) for parent in s['inputs']],
+                    'fingerprint': s['fingerprint']() if s['fingerprint'] else None,
+                }
+                keys[name] = hashlib.sha256(json.dumps(material, sort_keys=True, default=str)
+                                            .encode()).hexdigest()[:16]
+        return keys[name]
+
+    for name in by_name:
+        key(name)
+    return keys
+
+
+def artifact_path(name, key, cache_dir=PIPELINE_CACHE_DIR):
+    return os.path.join(cache_dir, name, f'{key}.joblib')
+
+
+# ============================================================================
+# RUN
+# ============================================================================
+
+def run_pipeline(stages=None, targets=None, data=None, cache_dir=PIPELINE_CACHE_DIR, force=(),
+                 quiet=False, report=None, report_dir=RUN_REPORT_DIR, verbose=True):
+    """
+    Produce the target stages, reusing every cached output whose key still matches.
+
+    Parameters:
+    -----------
+    stages : stage declarations (default: pipeline_stages())
+    targets : stage names to produce (default: every stage)
+    data : {stage name: output} supplied instead of running those stages
+    force : stage names to rerun even when cached
+    quiet : bool, keep the stages' own console output out of the console
+            (it is kept in the run report instead)
+    report : run report to append the stage records to (default: a new one)
+    report_dir : directory for the JSON run report with per-stage wall/CPU
+                 time, peak RSS and rows (see instrument.py); None to skip
+    verbose : bool, print the run summary
+
+    Returns:
+    --------
+    outputs : dict stage name -> output, for the targets and whatever was
+              loaded or computed on the way (cached upstream stages of a
+              cached target are not loaded)
+    """
+    stages = pipeline_stages() if stages is None else stages
+    data = dict(data or {})
+    by_name = {s['name']: s for s in stages}
+    targets = list(by_name) if targets is None else list(targets)
+    keys = stage_keys(stages, data)
+    outputs = dict(data)
+    report = new_report('pipeline') if report is None else report
+
+    def produce(name):
+        if name in outputs:
+            return outputs[name]
+        s = by_name[name]
+        path = artifact_path(name, keys[name], cache_dir)
+        if name not in force and os.path.exists(path):
+            start = time.perf_counter()
+            cached = joblib.load(path)
+            if s['check'] is None or s['check'](cached, **s['params']):
+                outputs[name] = cached
+                record_cached(report, name, time.perf_counter() - start, cached)
+                report['stages'][-1]['key'] = keys[name]
+                return cached
+            if verbose:
+                print(f"⚠️  Files behind cached '{name}' are missing; rerunning it")
+
+        args = [produce(parent) for parent in s['inputs']]
+        outputs[name] = measure(report, name, s['func'], *args, quiet=quiet, **s['params'])
+        report['stages'][-1]['key'] = keys[name]
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(outputs[name], path + '.tmp')
+        os.replace(path + '.tmp', path)
+        return outputs[name]
+
+    for name in targets:
+        produce(name)
+
+    report_file = write_report(report, report_dir=report_dir) if report_dir else None
+    if verbose:
+        print_report(report)
+        ran = sum(1 for record in report['stages'] if record['status'] == 'ran')
+        print(f"✓ {ran} stage(s) ran, {len(report['stages']) - ran} loaded from {cache_dir}")
+        if report_file:
+            print(f"✓ Run report: {report_file}")
+    return outputs
+
+
+def load_artifact(name, stages=None, data=None, cache_dir=PIPELINE_CACHE_DIR):
+    """Cached output of one stage under the current code and parameters (never runs anything)."""
+    stages = pipeline_stages() if stages is None else stages
+    path = artifact_path(name, stage_keys(stages, data)[name], cache_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Stage '{name}' is not cached for the current code and parameters; "
+                                f"run run_pipeline(targets=['{name}']) first")
+    return joblib.load(path)
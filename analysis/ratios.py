@@ -0,0 +1,201 @@
+"""
+RATIO REGISTRY
+==============
+Every financial ratio used by the clustering workflow is declared once here
+as numerator / denominator * scale. Numerators and denominators are column
+names or sums/differences of columns ("riad4074 + riad4079").
+
+``evaluate_ratios`` computes any set of registered ratios in a single pass
+over NumPy arrays: each input column is pulled out of the frame once, shared
+sub-expressions (such as total revenue) are summed once, and each ratio is
+divided, scaled and cleaned in place in its own output buffer. The results
+are attached to the input frame as new columns; the frame itself is never
+copied. The same declarations drive the polars expressions in
+``lazy_pipeline``.
+
+To add a ratio, add one ``ratio(...)`` line to the relevant list.
+"""
+
+import re
+
+import numpy as np
+import polars as pl
+
+_TERM_PATTERN = re.compile(r'([+-]?)\s*([A-Za-z_]\w*)')
+
+
+def ratio(name, numerator, denominator, scale=1, label=None, inf_to_nan=True):
+    """Declare a ratio; ``inf_to_nan`` maps division-by-zero results to NaN."""
+    return {
+        'name': name,
+        'numerator': numerator,
+        'denominator': denominator,
+        'scale': scale,
+        'label': label or name,
+        'inf_to_nan': inf_to_nan,
+    }
+
+
+# ============================================================================
+# RATIO DEFINITIONS
+# ============================================================================
+
+CORE_RATIOS = [
+    # === CORE INNOVATION METRICS (3 ratios) ===
+    ratio('tech_investment_ratio', 'riad4092', 'total_assets', 1000, 'Tech Investment Ratio'),
+    ratio('nib_deposit_ratio', 'rcon2_rcon6631', 'rcon2_rcon2200', 100, 'NIB Deposit Ratio (Digital Banking Proxy)'),
+    ratio('service_charge_intensity', 'riad4080', 'rcon2_rcon2200', 1000, 'Service Charge Intensity'),
+    # === EFFICIENCY METRICS (2 ratios) ===
+    ratio('efficiency_ratio', 'riad4093', 'riad4074 + riad4079', 100, 'Efficiency Ratio'),
+    ratio('nonint_income_pct', 'riad4079', 'riad4074 + riad4079', 100, 'Noninterest Income %'),
+    # === BALANCE SHEET (3 ratios) ===
+    ratio('loans_to_assets', 'total_loans', 'total_assets', 100, 'Loans-to-Assets'),
+    ratio('equity_to_assets', 'total_equity', 'total_assets', 100, 'Equity-to-Assets'),
+    ratio('deposits_to_assets', 'rcon2_rcon2200', 'total_assets', 100, 'Deposits-to-Assets'),
+    # === PROFITABILITY (2 ratios) ===
+    ratio('roa', 'riad4340', 'total_assets', 100, 'ROA'),
+    ratio('roe', 'riad4340', 'total_equity', 100, 'ROE'),
+    # === DEPOSIT MIX (1 ratio) ===
+    ratio('nontrans_deposits_pct', 'rcon2_rcon2215', 'rcon2_rcon2200', 100, 'Nontransaction Deposits %'),
+]
+
+ADDITIONAL_RATIOS = [
+    # Digital revenue intensity (credit card fees relative to total revenue)
+    ratio('digital_revenue_ratio', 'riad4415', 'riad4074 + riad4079', 100, 'Digital Revenue Ratio'),
+    # Non-branch revenue (noninterest income minus service charges)
+    ratio('non_branch_revenue_pct', 'riad4079 - riad4080', 'riad4074 + riad4079', 100, 'Non-Branch Revenue %'),
+    # Loan efficiency (interest income per dollar of loans)
+    ratio('loan_yield', 'riad4107', 'total_loans', 100, 'Loan Yield'),
+    # Securities intensity (investment in securities relative to assets)
+    ratio('securities_to_assets', 'htm_securities + afs_securities', 'total_assets', 100, 'Securities to Assets'),
+    # Operating leverage (noninterest expense per salary dollar)
+    ratio('expense_per_salary_dollar', 'riad4093', 'riad4135', 1, 'Expense per Salary Dollar'),
+    # Occupancy efficiency (occupancy expense relative to total assets)
+    ratio('occupancy_intensity', 'riad4115', 'total_assets', 1000, 'Occupancy Intensity'),
+    # Credit quality indicators
+    ratio('chargeoff_rate', 'riad4635', 'total_loans', 100, 'Charge-off Rate'),
+    ratio('provision_intensity', 'riad4230', 'total_loans', 100, 'Provision Intensity'),
+    # Capital efficiency
+    ratio('asset_growth_capacity', 'total_equity', 'total_assets', 100, 'Asset Growth Capacity'),
+]
+
+RATIO_REGISTRY = {spec['name']: spec for spec in CORE_RATIOS + ADDITIONAL_RATIOS}
+
+
+# ============================================================================
+# EXPRESSIONS
+# ============================================================================
+
+def parse_terms(expression):
+    """Split 'a + b - c' into [(1, 'a'), (1, 'b'), (-1, 'c')]."""
+    terms = [(-1 if sign == '-' else 1, col) for sign, col in _TERM_PATTERN.findall(expression)]
+    if not terms:
+        raise ValueError(f"Empty ratio expression: {expression!r}")
+    return terms
+
+
+def required_columns(specs):
+    """Input columns referenced by a list of ratio specs, in first-use order."""
+    columns = []
+    for spec in specs:
+        for part in ('numerator', 'denominator'):
+            columns.extend(col for _, col in parse_terms(spec[part]))
+    return list(dict.fromkeys(columns))
+
+
+def polars_expression(spec):
+    """Polars expression for one ratio (inf -> null when ``inf_to_nan``)."""
+    def combine(expression):
+        expr = None
+        for sign, col in parse_terms(expression):
+            term = pl.col(col) if sign > 0 else -pl.col(col)
+            expr = term if expr is None else expr + term
+        return expr
+
+    result = combine(spec['numerator']) / combine(spec['denominator'])
+    if spec['inf_to_nan']:
+        result = pl.when(result.is_infinite()).then(None).otherwise(result)
+    if spec['scale'] != 1:
+        result = result * spec['scale']
+    return result.alias(spec['name'])
+
+
+# ============================================================================
+# EVALUATION
+# ============================================================================
+
+def evaluate_ratios(df, specs):
+    """
+    Evaluate ratio specs in one pass and attach them to ``df`` in place.
+
+    Parameters:
+    -----------
+    df : DataFrame holding the input columns
+    specs : list of ratio specs (see ``ratio``)
+
+    Returns:
+    --------
+    df : the same DataFrame with one new column per spec
+    """
+    columns = {}
+    expressions = {}
+
+    def column(name):
+        if name not in columns:
+            columns[name] = df[name].to_numpy(dtype=float)
+        return columns[name]
+
+    def evaluate(expression):
+        key = ' '.join(expression.split())
+        if key not in expressions:
+            terms = parse_terms(expression)
+            if len(terms) == 1 and terms[0][0] > 0:
+                expressions[key] = column(terms[0][1])
+            else:
+                total = np.zeros(len(df))
+                for sign, col in terms:
+                    if sign > 0:
+                        total += column(col)
+                    else:
+                        total -= column(col)
+                expressions[key] = total
+        return expressions[key]
+
+    outputs = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for spec in specs:
+            out = np.empty(len(df))
+            np.divide(evaluate(spec['numerator']), evaluate(spec['denominator']), out=out)
+            if spec['inf_to_nan']:
+                out[np.isinf(out)] = np.nan
+            if spec['scale'] != 1:
+                out *= spec['scale']
+            outputs[spec['name']] = out
+
+    for name, values in outputs.items():
+        df[name] = values
+    return df
+
+
+def calculate_ratios(df):
+    """Calculate ratios using merged columns (adds columns to ``df`` in place)"""
+    print(f"\n{'='*80}")
+    print("CALCULATING FINANCIAL RATIOS (USING MERGED COLUMNS)")
+    print(f"{'='*80}")
+
+    evaluate_ratios(df, CORE_RATIOS)
+    for spec in CORE_RATIOS:
+        print(f"✓ {spec['label']}")
+
+    print(f"\n✓ Created {len(CORE_RATIOS)} ratios using merged columns")
+    return df
+
+
+def calculate_additional_innovation_ratios(df):
+    """Calculate additional innovation and efficiency metrics (adds columns to ``df`` in place)"""
+    evaluate_ratios(df, ADDITIONAL_RATIOS)
+    for spec in ADDITIONAL_RATIOS:
+        print(f"✓ {spec['label']}")
+
+    print(f"\n✓ Created {len(ADDITIONAL_RATIOS)} additional innovation/efficiency ratios")
+    return df
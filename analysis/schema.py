@@ -0,0 +1,262 @@
+"""
+COMPACT COLUMN SCHEMA
+=====================
+One dtype schema for the pandas and polars readers, built from the
+``Data_Type`` column of COMPLETE_DATA_DICTIONARY_180_FIELDS.csv plus naming
+rules for the columns the dictionary does not list (final-dataset fields,
+identifiers added by the pipeline, the EDA exports):
+
+    currency   Currency ($000s), *_EOQ / *_YTD amounts   float32
+    count      Filing_Count_*, Total_Annual_Filings       smallest int that fits
+    id         rssd9001, RSSD_ID, CIK, CERT               int32
+    period     year, quarter                              int16 / int8
+    category   names, tiers, report dates, BANK_ID        categorical
+    boolean    Has_* and Is_* flags                       boolean
+
+float32 keeps about seven significant digits: amounts in thousands stay
+exact to the dollar below $16.7 billion and within ~$0.5 million at the
+largest banks' $4 trillion. Ratios and other floats are left as float64.
+
+Columns the schema does not know keep the dtype the reader inferred.
+``memory_report`` prints what the schema saves per table.
+"""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from features import MERGED_COLUMNS
+
+DICTIONARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                               'COMPLETE_DATA_DICTIONARY_180_FIELDS.csv')
+
+# Checked in order; the first matching rule wins
+NAME_RULES = [
+    ('boolean', re.compile(r'^(Has|Is)_')),
+    ('count', re.compile(r'^(Filing_Count_\w+|Total_Annual_Filings)$')),
+    ('id', re.compile(r'^(rssd9001|RSSD_ID|CIK|CERT)$')),
+    ('period', re.compile(r'^(year|quarter|Year|Quarter)$')),
+    ('category', re.compile(r'(^rssd9017$|^rssd9999$|^BANK_ID$|_Name$|_Date_\w+$|(^|_)[Tt]ier$)')),
+    ('currency', re.compile(r'(^(riad|rcon|rcfd)|_EOQ$|_YTD$)')),
+]
+
+DICTIONARY_TYPES = {
+    'Integer': 'id',
+    'String': 'category',
+    'Date': 'category',
+}
+
+PANDAS_DTYPES = {
+    'currency': 'float32',
+    'id': 'Int32',
+    'category': 'category',
+    'boolean': 'boolean',
+}
+
+POLARS_DTYPES = {
+    'currency': pl.Float32,
+    'count': pl.Int16,
+    'id': pl.Int32,
+    'category': pl.Categorical,
+    'boolean': pl.Boolean,
+}
+
+PERIOD_DTYPES = {
+    'year': ('Int16', pl.Int16),
+    'quarter': ('Int8', pl.Int8),
+}
+
+_BOOLEAN_TEXT = {'TRUE': True, 'T': True, '1': True, 'YES': True, 'Y': True,
+                 'FALSE': False, 'F': False, '0': False, 'NO': False, 'N': False}
+
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+def dictionary_column_types(dictionary_file=DICTIONARY_FILE):
+    """
+    Logical type of every WRDS column in the data dictionary.
+
+    Column names follow help.load_dictionary_fields: the Field_ID for 'ALL'
+    rows, otherwise '<table without underscores>_<field>' (e.g. rcon2_rcon2200).
+    """
+    if not os.path.exists(dictionary_file):
+        return {}
+    fields = pd.read_csv(dictionary_file, dtype=str).fillna('')
+    types = {}
+    for row in fields.itertuples(index=False):
+        table = row.Table
+        column = row.Field_ID if table == 'ALL' else f"{table.lower().replace('_', '')}_{row.Field_ID.lower()}"
+        types[column] = 'currency' if row.Data_Type.startswith('Currency') else DICTIONARY_TYPES.get(row.Data_Type)
+    return types
+
+
+def column_types(columns, dictionary_file=DICTIONARY_FILE):
+    """{column: logical type} for the columns the schema knows about."""
+    known = dictionary_column_types(dictionary_file)
+    known.update({col: 'currency' for col in MERGED_COLUMNS})
+    types = {}
+    for col in columns:
+        logical = None
+        for rule_type, pattern in NAME_RULES:
+            if pattern.search(col):
+                logical = rule_type
+                break
+        logical = logical or known.get(col)
+        if logical:
+            types[col] = logical
+    return types
+
+
+def pandas_dtypes(columns, dictionary_file=DICTIONARY_FILE):
+    """pandas dtypes for ``columns``; counts are resolved from the data in ``apply_pandas_schema``."""
+    dtypes = {}
+    for col, logical in column_types(columns, dictionary_file).items():
+        if logical == 'period':
+            dtypes[col] = PERIOD_DTYPES[col.lower()][0]
+        elif logical in PANDAS_DTYPES:
+            dtypes[col] = PANDAS_DTYPES[logical]
+    return dtypes
+
+
+def polars_schema(columns, dictionary_file=DICTIONARY_FILE):
+    """polars dtypes for ``columns``, usable as ``schema_overrides`` or in ``cast``."""
+    schema = {}
+    for col, logical in column_types(columns, dictionary_file).items():
+        schema[col] = PERIOD_DTYPES[col.lower()][1] if logical == 'period' else POLARS_DTYPES[logical]
+    return schema
+
+
+# ============================================================================
+# APPLY
+# ============================================================================
+
+def _smallest_int(values):
+    """Smallest nullable pandas integer dtype holding ``values``."""
+    finite = values.dropna()
+    if finite.empty:
+        return 'Int8'
+    low, high = finite.min(), finite.max()
+    for dtype in ('Int8', 'Int16', 'Int32'):
+        info = np.iinfo(dtype.lower())
+        if info.min <= low and high <= info.max:
+            return dtype
+    return 'Int64'
+
+
+def _to_boolean(series):
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype('boolean')
+    if pd.api.types.is_numeric_dtype(series):
+        return series.map({1: True, 0: False}).astype('boolean')
+    return series.astype(str).str.strip().str.upper().map(_BOOLEAN_TEXT).astype('boolean')
+
+
+def apply_pandas_schema(df, dictionary_file=DICTIONARY_FILE):
+    """Cast ``df`` to the compact schema (returns a new frame; unknown columns untouched)."""
+    types = column_types(df.columns, dictionary_file)
+    dtypes = pandas_dtypes(df.columns, dictionary_file)
+    converted = {}
+    for col, logical in types.items():
+        series = df[col]
+        if logical == 'boolean':
+            converted[col] = _to_boolean(series)
+        elif logical == 'category':
+            converted[col] = series.astype('category')
+        else:
+            numbers = pd.to_numeric(series, errors='coerce')
+            dtype = _smallest_int(numbers) if logical == 'count' else dtypes[col]
+            if dtype.startswith('Int'):
+                numbers = numbers.round()
+            converted[col] = numbers.astype(dtype)
+    return df.assign(**converted)
+
+
+def apply_polars_schema(frame, dictionary_file=DICTIONARY_FILE):
+    """Cast a polars DataFrame or LazyFrame to the compact schema."""
+    current = frame.collect_schema()
+    casts = []
+    for col, dtype in polars_schema(current.names(), dictionary_file).items():
+        if dtype == pl.Boolean and current[col] == pl.String:
+            casts.append(pl.col(col).str.strip_chars().str.to_uppercase()
+                         .replace_strict(_BOOLEAN_TEXT, default=None, return_dtype=pl.Boolean))
+        else:
+            casts.append(pl.col(col).cast(dtype, strict=False))
+    return frame.with_columns(casts)
+
+
+def read_polars_csv(path, dictionary_file=DICTIONARY_FILE, **kwargs):
+    """
+    ``pl.read_csv`` with currency columns parsed straight to Float32, then the full schema.
+
+    Parsing amounts as floats also covers values written in scientific
+    notation, which integer inference rejects (the old Total_Deposits_EOQ override).
+    """
+    columns = pl.read_csv(path, n_rows=0).columns
+    floats = {col: pl.Float32 for col, logical in column_types(columns, dictionary_file).items()
+              if logical == 'currency'}
+    frame = pl.read_csv(path, schema_overrides={**floats, **kwargs.pop('schema_overrides', {})}, **kwargs)
+    return apply_polars_schema(frame, dictionary_file)
+
+
+def read_pandas_csv(path, dictionary_file=DICTIONARY_FILE, **kwargs):
+    """``pd.read_csv`` with currency columns parsed straight to float32, then the full schema."""
+    columns = pd.read_csv(path, nrows=0).columns
+    floats = {col: 'float32' for col, logical in column_types(columns, dictionary_file).items()
+              if logical == 'currency'}
+    return apply_pandas_schema(pd.read_csv(path, dtype={**floats, **kwargs.pop('dtype', {})}, **kwargs),
+                               dictionary_file)
+
+
+# ============================================================================
+# MEMORY REPORT
+# ============================================================================
+
+def memory_report(tables, dictionary_file=DICTIONARY_FILE, verbose=True):
+    """
+    Memory of each table as read versus under the compact schema.
+
+    Parameters:
+    -----------
+    tables : {name: pandas or polars DataFrame} as the reader inferred them
+
+    Returns:
+    --------
+    report : DataFrame with rows, columns, typed columns, MB before/after and % saved
+    """
+    rows = []
+    for name, table in tables.items():
+        if isinstance(table, pl.DataFrame):
+            before = table.estimated_size()
+            after = apply_polars_schema(table, dictionary_file).estimated_size()
+            n_rows, columns = table.height, table.columns
+        else:
+            before = table.memory_usage(deep=True).sum()
+            after = apply_pandas_schema(table, dictionary_file).memory_usage(deep=True).sum()
+            n_rows, columns = len(table), table.columns
+        rows.append({
+            'table': name,
+            'rows': n_rows,
+            'columns': len(columns),
+            'typed_columns': len(column_types(columns, dictionary_file)),
+            'before_mb': before / 1e6,
+            'after_mb': after / 1e6,
+            'saved_pct': 100 * (1 - after / before) if before else 0.0,
+        })
+    report = pd.DataFrame(rows)
+
+    if verbose:
+        print(f"\n{'='*80}")
+        print("COMPACT SCHEMA MEMORY REPORT")
+        print(f"{'='*80}")
+        print(f"{'Table':<30} {'Rows':>10} {'Typed':>11} {'Before MB':>10} {'After MB':>10} {'Saved':>7}")
+        print("-" * 80)
+        for row in report.itertuples():
+            typed = f"{row.typed_columns}/{row.columns}"
+            print(f"{row.table:<30} {row.rows:>10,} {typed:>11} {row.before_mb:>10.1f} {row.after_mb:>10.1f} "
+                  f"{row.saved_pct:>6.1f}%")
+    return report
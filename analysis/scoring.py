@@ -0,0 +1,280 @@
+"""
+INNOVATION SCORING
+==================
+Scores banks against the saved per-tier models (cluster_models) without
+rerunning the notebook: load the artifacts once, then pass ``score_banks``
+one of:
+
+    raw call-report rows   rssd9001, rssd9999 and the RIAD/RCON/RCFD source
+                           columns, as downloaded from WRDS; they go through
+                           the pipeline's steps 1-6 (split merge, ratios,
+                           sticky tiers, aggregate_annual) first
+    bank-year rows         as from annual.aggregate_annual, with bank_tier
+    change scores          already holding the model's feature columns
+
+Each bank gets back:
+
+    bank_tier            tier of its last year
+    innovation_cluster   cluster label (-1 noise), assigned as in assign_clusters
+    cluster_name         the model manifest's cluster_names (see
+                         cluster_models.match_cluster_names)
+    umap_1, umap_2       position in the tier's saved UMAP embedding
+    innovation_score     signed mean of the tier-standardized changes along
+                         INNOVATION_DIRECTIONS (0 = tier average, +1 = one
+                         standard deviation more innovative)
+
+All banks of a tier go through one scaler / UMAP / nearest-neighbour call,
+so the full 4,384-bank table is one vectorized batch. The result is built
+from NumPy arrays without per-row ``.loc`` writes, so a single bank takes a
+few milliseconds once load_tier_models has warmed up the UMAP kernels.
+
+    python scoring.py bank_years.csv -o scored.csv      # batch file
+    python scoring.py --serve --port 8765               # local HTTP
+
+In HTTP mode ``POST /score`` takes a JSON list of any of those rows (or
+{"rows": [...]}) and returns one JSON record per bank; ``GET /health``
+returns the model version.
+"""
+
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from annual import aggregate_annual
+from change_scores import calculate_innovation_change_scores
+from cluster_models import MODEL_DIR, approximate_predict, load_tier_models
+from incremental import prepare_rows
+from panel import build_panel
+from tiers import assign_sticky_bank_tiers
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# +1 when a rise in the ratio means more innovation, -1 when a fall does
+INNOVATION_DIRECTIONS = {
+    'tech_investment_ratio': 1,
+    'nib_deposit_ratio': 1,
+    'nonint_income_pct': 1,
+    'digital_revenue_ratio': 1,
+    'non_branch_revenue_pct': 1,
+    'efficiency_ratio': -1,
+    'occupancy_intensity': -1,
+}
+
+SCORE_COLUMNS = ['bank_tier', 'innovation_cluster', 'cluster_name', 'umap_1', 'umap_2', 'innovation_score']
+
+
+def score_weights(feature_cols, directions=INNOVATION_DIRECTIONS):
+    """Weight per change column: direction / number of directional columns (0 for the rest)."""
+    signs = np.array([directions.get(col[:-len('_change')] if col.endswith('_change') else col, 0)
+                      for col in feature_cols], dtype=float)
+    n_directional = np.count_nonzero(signs)
+    return signs / n_directional if n_directional else signs
+
+
+# ============================================================================
+# SCORING
+# ============================================================================
+
+def bank_years_from_call_reports(raw, min_consecutive_quarters=3, stock_method='last',
+                                 partial_years='annualize'):
+    """Bank-year rows with sticky tiers from raw call-report rows (pipeline steps 1-6)."""
+    rows, feature_names = prepare_rows(raw)
+    rows, offsets = build_panel(rows)
+    rows = assign_sticky_bank_tiers(rows, min_consecutive_quarters=min_consecutive_quarters, offsets=offsets)
+    return aggregate_annual(rows, feature_names, stock_method=stock_method, partial_years=partial_years,
+                            verbose=False)
+
+
+def score_changes(df_changes, models, manifest, tier_col='bank_tier', bank_col='rssd9001',
+                  directions=INNOVATION_DIRECTIONS):
+    """
+    Score change-score rows against the saved tier models.
+
+    Parameters:
+    -----------
+    df_changes : DataFrame with the manifest's feature columns and a tier column
+    models, manifest : as returned by cluster_models.load_tier_models
+
+    Returns:
+    --------
+    scored : DataFrame in the row order of ``df_changes`` with bank_col (when
+             present) and SCORE_COLUMNS; banks in a tier without a model are noise
+    """
+    feature_cols = manifest['feature_cols']
+    missing = [col for col in feature_cols if col not in df_changes.columns]
+    if missing:
+        raise ValueError(f"Change scores are missing model features: {missing}")
+
+    n = len(df_changes)
+    tiers = df_changes[tier_col].astype(str).to_numpy()
+    values = df_changes[feature_cols].to_numpy(dtype=float)
+    weights = score_weights(feature_cols, directions)
+
+    labels = np.full(n, -1, dtype=np.int64)
+    names = np.full(n, 'Noise', dtype=object)
+    embedding = np.full((n, 2), np.nan)
+    score = np.full(n, np.nan)
+
+    for tier, model in models.items():
+        rows = np.flatnonzero(tiers == tier)
+        if len(rows) == 0:
+            continue
+        # Same arithmetic as scaler.transform without sklearn's per-call input validation
+        scaled = (values[rows] - model['scaler'].mean_) / model['scaler'].scale_
+        tier_embedding = model['reducer'].transform(scaled)
+        tier_labels = approximate_predict(model, tier_embedding)
+
+        cluster_names = manifest['cluster_names'].get(tier, {})
+        labels[rows] = tier_labels
+        names[rows] = [cluster_names.get(str(c), 'Noise' if c == -1 else f'Cluster {c}') for c in tier_labels]
+        embedding[rows] = tier_embedding[:, :2]
+        score[rows] = scaled @ weights
+
+    columns = {bank_col: df_changes[bank_col].to_numpy()} if bank_col in df_changes.columns else {}
+    columns.update({
+        'bank_tier': tiers,
+        'innovation_cluster': labels,
+        'cluster_name': names,
+        'umap_1': embedding[:, 0],
+        'umap_2': embedding[:, 1],
+        'innovation_score': score,
+    })
+    return pd.DataFrame(columns)
+
+
+def score_banks(rows, models, manifest, min_years=None, tier_col='bank_tier', bank_col='rssd9001',
+                directions=INNOVATION_DIRECTIONS):
+    """
+    Tier, cluster, UMAP coordinates and innovation score for each bank.
+
+    Parameters:
+    -----------
+    rows : raw call-report rows (with rssd9999 and no tier column), a
+           bank-year DataFrame (as from annual.aggregate_annual) with the
+           base features of the model's change columns and a tier column,
+           or change scores that already hold the model's feature columns
+    models, manifest : as returned by cluster_models.load_tier_models
+    min_years : banks with fewer years are dropped (default: the training
+                run's value from the manifest)
+
+    Returns:
+    --------
+    scored : DataFrame with one row per bank (see score_changes)
+    """
+    feature_cols = manifest['feature_cols']
+    if all(col in rows.columns for col in feature_cols):
+        df_changes = rows
+    else:
+        if tier_col not in rows.columns and 'rssd9999' in rows.columns:
+            rows = bank_years_from_call_reports(rows)
+        min_years = manifest.get('min_years') if min_years is None else min_years
+        if min_years is None:
+            raise ValueError("The model manifest has no min_years; pass the training run's min_years")
+        base_features = [col[:-len('_change')] for col in feature_cols]
+        missing = [col for col in base_features + [tier_col, 'year'] if col not in rows.columns]
+        if missing:
+            raise ValueError(f"Bank-year rows are missing columns: {missing}")
+        df_changes = calculate_innovation_change_scores(rows, base_features, min_years=min_years,
+                                                        bank_col=bank_col, verbose=False)
+    return score_changes(df_changes, models, manifest, tier_col, bank_col, directions)
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+def make_handler(models, manifest, min_years=None):
+    """Request handler class bound to loaded models."""
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/health':
+                self._send(200, {'status': 'ok', 'version': manifest['version'], 'tiers': manifest['tiers']})
+            else:
+                self._send(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/score':
+                self._send(404, {'error': f'Unknown path {self.path}'})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                records = payload['rows'] if isinstance(payload, dict) else payload
+                scored = score_banks(pd.DataFrame.from_records(records), models, manifest, min_years)
+            except (ValueError, KeyError, TypeError) as exc:
+                self._send(400, {'error': str(exc)})
+                return
+            scored = scored.astype(object).where(scored.notna(), None)
+            self._send(200, scored.to_dict(orient='records'))
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+
+def serve(models, manifest, host='127.0.0.1', port=8765, min_years=None):
+    """Serve ``POST /score`` and ``GET /health`` until interrupted."""
+    server = ThreadingHTTPServer((host, port), make_handler(models, manifest, min_years))
+    print(f"✓ Scoring models {manifest['version']} on http://{host}:{port}/score")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score banks against the saved innovation cluster models.")
+    parser.add_argument('rows', nargs='?', help="CSV of call-report rows, bank-year rows or change scores")
+    parser.add_argument('-o', '--output', help="CSV to write (default: print)")
+    parser.add_argument('--version', default='latest', help="model version under the model directory")
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    parser.add_argument('--min-years', type=int, help="default: the value saved with the models")
+    parser.add_argument('--serve', action='store_true', help="serve POST /score over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    if not args.serve and not args.rows:
+        parser.error("give a CSV of rows to score, or --serve")
+
+    start = time.perf_counter()
+    models, manifest = load_tier_models(args.version, args.model_dir)
+    print(f"✓ Loaded models {manifest['version']} in {time.perf_counter() - start:.1f}s")
+
+    if args.serve:
+        serve(models, manifest, args.host, args.port, args.min_years)
+        return
+
+    rows = pd.read_csv(args.rows)
+    start = time.perf_counter()
+    scored = score_banks(rows, models, manifest, args.min_years)
+    print(f"✓ Scored {len(scored):,} banks in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if args.output:
+        scored.to_csv(args.output, index=False)
+        print(f"✓ Saved {args.output}")
+    else:
+        print(scored.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
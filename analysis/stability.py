@@ -0,0 +1,249 @@
+"""
+CLUSTER STABILITY
+=================
+Resampling check of whether the per-tier innovation clusters (and names such
+as "Digital Transformers" or "Quality Improvers") survive perturbation of
+the bank sample.
+
+Each resample draws a subsample (default 80% without replacement) or a
+bootstrap sample of a tier's banks, refits UMAP + HDBSCAN with the tier's
+parameters and a fresh seed, and returns only (sampled rows, labels). The
+scaled change-score matrix lives in one shared memory block per tier (see
+sweep.share_array), so workers never receive a pickled copy. Everything
+else is computed in the parent from one contingency table per resample:
+
+    ari            adjusted Rand index of the resample against the reference
+                   labels on the banks it contains
+    co_assignment  per bank: share of its reference-cluster peers that the
+                   resample puts in the same (non-noise) cluster
+    jaccard        per cluster: best Jaccard match among resample clusters
+                   (Hennig's clusterboot); >= 0.75 is usually read as stable
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+import umap
+from sklearn.cluster import HDBSCAN
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import StandardScaler
+
+from cluster_models import HDBSCAN_PARAMS, UMAP_PARAMS, match_cluster_names, tier_umap_params
+from feature_store import store_path
+from sweep import attach_array, share_array, warm_up_umap
+
+STABLE_JACCARD = 0.75
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _resample_labels(descriptor, sample, umap_params, hdbscan_params):
+    """UMAP + HDBSCAN labels for one resample's rows of the shared matrix."""
+    scaled = attach_array(descriptor)
+    embedding = umap.UMAP(**umap_params).fit_transform(scaled[sample])
+    labels = HDBSCAN(cluster_selection_method='eom', **hdbscan_params).fit_predict(embedding)
+    return labels.astype(np.int32)
+
+
+def _draw_samples(n, n_resamples, method, fraction, seed):
+    """Sorted unique row indices per resample (bootstrap duplicates are collapsed)."""
+    rng = np.random.default_rng(seed)
+    samples = []
+    for _ in range(n_resamples):
+        if method == 'bootstrap':
+            sample = np.unique(rng.integers(0, n, n))
+        else:
+            sample = np.sort(rng.choice(n, int(round(n * fraction)), replace=False))
+        samples.append(sample.astype(np.int32))
+    return samples
+
+
+# ============================================================================
+# AGGREGATION
+# ============================================================================
+
+def _score_resample(reference, sample, labels):
+    """
+    Co-assignment per sampled bank and best Jaccard per reference cluster.
+
+    Returns:
+    --------
+    co_assignment : float array over ``sample`` (NaN for reference noise or
+                    banks with no sampled peers)
+    jaccard : dict reference cluster -> best Jaccard in this resample
+    """
+    ref = reference[sample]
+    ref_ids, ref_codes = np.unique(ref, return_inverse=True)
+    new_ids, new_codes = np.unique(labels, return_inverse=True)
+    table = np.zeros((len(ref_ids), len(new_ids)), dtype=np.int64)
+    np.add.at(table, (ref_codes, new_codes), 1)
+
+    ref_sizes = table.sum(axis=1)
+    peers = ref_sizes[ref_codes] - 1
+    same = table[ref_codes, new_codes] - 1
+    co_assignment = np.where((ref != -1) & (peers > 0),
+                             np.where(labels != -1, same, 0) / np.maximum(peers, 1), np.nan)
+
+    clustered = new_ids != -1
+    new_sizes = table.sum(axis=0)
+    jaccard = {}
+    for row, cluster in enumerate(ref_ids):
+        if cluster == -1:
+            continue
+        if not clustered.any():
+            jaccard[int(cluster)] = 0.0
+            continue
+        overlap = table[row, clustered]
+        union = ref_sizes[row] + new_sizes[clustered] - overlap
+        jaccard[int(cluster)] = float((overlap / union).max())
+    return co_assignment, jaccard
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+def cluster_stability(df_changes, feature_cols, tier_col='bank_tier', cluster_col='innovation_cluster',
+                      bank_col='rssd9001', n_resamples=200, method='subsample', fraction=0.8,
+                      umap_params=UMAP_PARAMS, hdbscan_params=HDBSCAN_PARAMS, cluster_names=None,
+                      max_workers=None, seed=42, feature_store=None):
+    """
+    Resampling stability of the clusters in ``df_changes``.
+
+    Parameters:
+    -----------
+    df_changes : change scores with tier and reference cluster columns
+                 (output of cluster_models.fit_tier_models)
+    feature_cols : feature columns the clusters were fitted on
+    n_resamples : resamples per tier
+    method : 'subsample' (``fraction`` of banks without replacement) or 'bootstrap'
+    umap_params, hdbscan_params : as in cluster_models.fit_tier_models; the
+                 UMAP random_state is replaced by a per-resample seed
+    cluster_names : {tier: {cluster: name}}, defaults to match_cluster_names(df_changes)
+    max_workers : process count (defaults to os.cpu_count())
+    feature_store : version of feature_store.write_tier_matrices output (or 'latest')
+                    to map instead of copying each tier's matrix to shared memory;
+                    its bank order must match ``df_changes``
+
+    Returns:
+    --------
+    bank_stability : one row per bank with its mean co-assignment frequency
+    cluster_summary : one row per (tier, cluster) with mean Jaccard and co-assignment
+    resamples : one row per (tier, resample) with ARI, cluster count and noise fraction
+    """
+    if method not in ('subsample', 'bootstrap'):
+        raise ValueError(f"method must be 'subsample' or 'bootstrap', got {method!r}")
+    if cluster_names is None:
+        cluster_names = match_cluster_names(df_changes, tier_col=tier_col, cluster_col=cluster_col)
+    max_workers = max_workers or os.cpu_count()
+    seeds = np.random.SeedSequence(seed)
+
+    tiers = {tier: data for tier, data in df_changes.groupby(tier_col)}
+    order = sorted(tiers, key=lambda tier: len(tiers[tier]), reverse=True)
+
+    print(f"\n{'='*80}")
+    print(f"CLUSTER STABILITY: {n_resamples} {method} resamples per tier")
+    print(f"{'='*80}")
+
+    blocks = []
+    tasks = {}
+    start = time.perf_counter()
+    try:
+        descriptors = {}
+        samples = {}
+        stored = store_path(feature_store) if feature_store is not None else None
+        for tier, tier_seed in zip(order, seeds.spawn(len(order))):
+            if stored is None:
+                block, descriptors[tier] = share_array(
+                    StandardScaler().fit_transform(tiers[tier][feature_cols].to_numpy()))
+                blocks.append(block)
+            else:
+                banks = np.load(os.path.join(stored, str(tier), 'banks.npy'), mmap_mode='r')
+                if not np.array_equal(banks, tiers[tier][bank_col].to_numpy()):
+                    raise ValueError(f"Feature store {feature_store} rows do not match the {tier} banks")
+                descriptors[tier] = os.path.join(stored, str(tier), 'features.npy')
+            samples[tier] = _draw_samples(len(tiers[tier]), n_resamples, method, fraction, tier_seed)
+
+        results = {tier: [None] * n_resamples for tier in order}
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('spawn'),
+                                 initializer=warm_up_umap) as pool:
+            for tier in order:
+                tier_umap = tier_umap_params(umap_params, tier)
+                tier_hdbscan = hdbscan_params.get(tier, HDBSCAN_PARAMS['Small'])
+                for r, sample in enumerate(samples[tier]):
+                    future = pool.submit(_resample_labels, descriptors[tier], sample,
+                                         {**tier_umap, 'random_state': int(seed) + r}, tier_hdbscan)
+                    tasks[future] = (tier, r)
+            for done, future in enumerate(as_completed(tasks), 1):
+                tier, r = tasks[future]
+                results[tier][r] = future.result()
+                print(f"  {done}/{len(tasks)} resamples done", end='\r')
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    print()
+
+    bank_frames, cluster_frames, resample_frames = [], [], []
+    for tier in sorted(order):
+        data = tiers[tier]
+        reference = data[cluster_col].to_numpy()
+        co_sum = np.zeros(len(data))
+        co_count = np.zeros(len(data))
+        sampled = np.zeros(len(data), dtype=int)
+        jaccards = {int(c): [] for c in np.unique(reference) if c != -1}
+        rows = []
+        for r, (sample, labels) in enumerate(zip(samples[tier], results[tier])):
+            co_assignment, jaccard = _score_resample(reference, sample, labels)
+            observed = ~np.isnan(co_assignment)
+            co_sum[sample[observed]] += co_assignment[observed]
+            co_count[sample[observed]] += 1
+            sampled[sample] += 1
+            for cluster, value in jaccard.items():
+                jaccards[cluster].append(value)
+            rows.append({
+                tier_col: tier,
+                'resample': r,
+                'n_banks': len(sample),
+                'n_clusters': len(set(labels)) - (1 if -1 in labels else 0),
+                'noise_fraction': float((labels == -1).mean()),
+                'ari': adjusted_rand_score(reference[sample], labels),
+            })
+
+        names = cluster_names.get(tier, {})
+        banks = pd.DataFrame({
+            bank_col: data[bank_col].to_numpy(),
+            tier_col: tier,
+            cluster_col: reference,
+            'cluster_name': [names.get(c, 'Noise' if c == -1 else f'Cluster {c}') for c in reference],
+            'co_assignment': np.divide(co_sum, co_count, out=np.full(len(data), np.nan), where=co_count > 0),
+            'n_resamples': sampled,
+        })
+        bank_frames.append(banks)
+
+        clustered = banks[banks[cluster_col] != -1]
+        summary = (clustered.groupby(cluster_col)
+                   .agg(cluster_name=('cluster_name', 'first'), n_banks=(bank_col, 'size'),
+                        co_assignment_mean=('co_assignment', 'mean'))
+                   .reset_index())
+        summary.insert(0, tier_col, tier)
+        summary['jaccard_mean'] = [np.mean(jaccards[c]) for c in summary[cluster_col]]
+        summary['jaccard_min'] = [np.min(jaccards[c]) for c in summary[cluster_col]]
+        summary['stable'] = summary['jaccard_mean'] >= STABLE_JACCARD
+        cluster_frames.append(summary)
+        resample_frames.append(pd.DataFrame(rows))
+
+        ari = resample_frames[-1]['ari']
+        print(f"  {tier:8s} ARI {ari.mean():.3f} ± {ari.std():.3f} | "
+              f"stable clusters: {summary['stable'].sum()}/{len(summary)}")
+
+    print(f"✓ Stability complete in {time.perf_counter() - start:.1f}s")
+    return (pd.concat(bank_frames, ignore_index=True),
+            pd.concat(cluster_frames, ignore_index=True),
+            pd.concat(resample_frames, ignore_index=True))
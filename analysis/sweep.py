@@ -0,0 +1,279 @@
+"""
+PARALLEL TIER CLUSTERING SWEEP
+==============================
+Runs the per-tier StandardScaler -> UMAP -> HDBSCAN fit over a parameter
+grid in a process pool, instead of hand-editing the HDBSCAN block and
+re-running one tier after another.
+
+Each tier's scaled feature matrix and its kNN graph (built once at the
+largest n_neighbors in the grid, see knn_cache) are written once to shared
+memory; workers attach to them by name, so tasks only pickle a few
+parameters and no UMAP fit repeats the neighbour search. One task is one
+UMAP fit for a (tier, n_neighbors, min_dist) point, followed by every
+(min_cluster_size, min_samples) HDBSCAN point on that embedding - HDBSCAN on
+a 2-D embedding is cheap next to UMAP. Tasks are submitted largest tier
+first, so with enough grid points the wall time approaches
+(slowest fit x grid size / cores).
+
+Every run lands in one results table with cluster counts, noise fraction and
+validity scores computed on the clustered (non-noise) points.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+import pandas as pd
+import umap
+from sklearn.cluster import HDBSCAN
+from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from cluster_models import HDBSCAN_PARAMS, UMAP_PARAMS
+from feature_store import open_tier_matrices, store_path
+from knn_cache import KNN_CACHE_DIR, cached_knn, fit_umap
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+UMAP_GRID = {'n_neighbors': [10, 15, 30], 'min_dist': [0.0, 0.1]}
+HDBSCAN_GRID = {'min_cluster_size': [15, 30, 50], 'min_samples': [3, 5, 10]}
+
+# Silhouette is O(n^2); larger tiers are scored on a fixed random sample
+SILHOUETTE_SAMPLE = 10_000
+
+RESULT_COLUMNS = ['bank_tier', 'n_neighbors', 'min_dist', 'min_cluster_size', 'min_samples',
+                  'n_obs', 'n_clusters', 'noise_fraction', 'silhouette', 'davies_bouldin',
+                  'calinski_harabasz', 'umap_seconds', 'hdbscan_seconds']
+
+
+def parameter_grid(grid):
+    """List of dicts, one per combination of the grid's values."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+# ============================================================================
+# SHARED MEMORY
+# ============================================================================
+
+def share_array(array):
+    """Copy ``array`` into a new shared memory block; returns (block, descriptor)."""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+_ATTACHED = {}
+
+
+def attach_array(descriptor):
+    """
+    Read-only view of a shared matrix, attached once per worker process.
+
+    A descriptor is either from ``share_array`` or the path of a stored .npy
+    file (see feature_store), which is memory-mapped instead.
+    """
+    if isinstance(descriptor, str):
+        return np.load(descriptor, mmap_mode='r')
+    name, shape, dtype = descriptor
+    if name not in _ATTACHED:
+        # Pool workers share the parent's resource tracker, so attaching only
+        # re-registers a name the parent already owns (and unlinks)
+        _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+    view = np.ndarray(shape, dtype=dtype, buffer=_ATTACHED[name].buf)
+    view.flags.writeable = False
+    return view
+
+
+# ============================================================================
+# WORKER
+# ============================================================================
+
+def _validity_scores(embedding, labels, random_state=42):
+    clustered = labels != -1
+    if len(np.unique(labels[clustered])) < 2:
+        return np.nan, np.nan, np.nan
+    points, point_labels = embedding[clustered], labels[clustered]
+    sample = min(SILHOUETTE_SAMPLE, len(points))
+    return (
+        silhouette_score(points, point_labels, sample_size=sample, random_state=random_state),
+        davies_bouldin_score(points, point_labels),
+        calinski_harabasz_score(points, point_labels),
+    )
+
+
+def warm_up_umap():
+    """Compile UMAP's numba kernels once per worker so fit timings exclude JIT."""
+    points = np.random.default_rng(0).normal(size=(64, 4))
+    umap.UMAP(n_neighbors=5, random_state=0).fit_transform(points)
+
+
+def _run_task(tier, descriptors, umap_params, hdbscan_points):
+    """One UMAP fit and every HDBSCAN point on its embedding."""
+    scaled = attach_array(descriptors['scaled'])
+    knn = None
+    if 'indices' in descriptors:
+        knn = {'indices': attach_array(descriptors['indices']), 'dists': attach_array(descriptors['dists'])}
+
+    start = time.perf_counter()
+    if knn is None:
+        embedding = umap.UMAP(**umap_params).fit_transform(scaled)
+    else:
+        _, embedding = fit_umap(scaled, umap_params, knn)
+    umap_seconds = time.perf_counter() - start
+
+    rows = []
+    for hdbscan_params in hdbscan_points:
+        start = time.perf_counter()
+        labels = HDBSCAN(cluster_selection_method='eom', **hdbscan_params).fit_predict(embedding)
+        hdbscan_seconds = time.perf_counter() - start
+
+        n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
+        silhouette, davies_bouldin, calinski_harabasz = _validity_scores(embedding, labels)
+        rows.append({
+            'bank_tier': tier,
+            'n_neighbors': umap_params['n_neighbors'],
+            'min_dist': umap_params['min_dist'],
+            'min_cluster_size': hdbscan_params['min_cluster_size'],
+            'min_samples': hdbscan_params['min_samples'],
+            'n_obs': len(scaled),
+            'n_clusters': n_clusters,
+            'noise_fraction': float((labels == -1).mean()),
+            'silhouette': silhouette,
+            'davies_bouldin': davies_bouldin,
+            'calinski_harabasz': calinski_harabasz,
+            'umap_seconds': umap_seconds,
+            'hdbscan_seconds': hdbscan_seconds,
+        })
+    return rows
+
+
+# ============================================================================
+# SWEEP
+# ============================================================================
+
+def run_sweep(df_changes, feature_cols, tier_col='bank_tier', umap_grid=UMAP_GRID,
+              hdbscan_grid=HDBSCAN_GRID, max_workers=None, base_umap_params=UMAP_PARAMS,
+              knn_cache_dir=KNN_CACHE_DIR, feature_store=None):
+    """
+    Fit every tier at every grid point in parallel.
+
+    Parameters:
+    -----------
+    df_changes : DataFrame of change scores with a tier column
+    feature_cols : list of feature columns to cluster on
+    umap_grid, hdbscan_grid : dict of parameter name -> list of values
+    max_workers : process count (defaults to os.cpu_count())
+    base_umap_params : UMAP settings not varied by the grid (metric, random_state)
+    knn_cache_dir : kNN graph cache directory, or None to search neighbours in every fit
+    feature_store : version of feature_store.write_tier_matrices output (or 'latest');
+                    workers then map the stored standardized matrices instead of
+                    receiving a shared-memory copy
+
+    Returns:
+    --------
+    results : DataFrame with one row per (tier, UMAP point, HDBSCAN point)
+    """
+    umap_points = [{**base_umap_params, **point} for point in parameter_grid(umap_grid)]
+    hdbscan_points = parameter_grid(hdbscan_grid)
+    max_workers = max_workers or os.cpu_count()
+
+    tiers = df_changes.groupby(tier_col)[feature_cols]
+    sizes = tiers.size().sort_values(ascending=False)
+
+    print(f"\n{'='*80}")
+    print("CLUSTERING PARAMETER SWEEP")
+    print(f"{'='*80}")
+    print(f"  Tiers: {', '.join(f'{tier} ({n:,})' for tier, n in sizes.items())}")
+    print(f"  UMAP fits: {len(sizes) * len(umap_points)} | HDBSCAN fits: "
+          f"{len(sizes) * len(umap_points) * len(hdbscan_points)} | Workers: {max_workers}")
+
+    blocks = []
+    rows = []
+    start = time.perf_counter()
+    try:
+        descriptors = {}
+        max_neighbors = max(point['n_neighbors'] for point in umap_points)
+        stored = None
+        if feature_store is not None:
+            stored = store_path(feature_store)
+            matrices, manifest = open_tier_matrices(feature_store, tiers=[str(tier) for tier in sizes.index])
+            if manifest['feature_cols'] != list(feature_cols):
+                raise ValueError(f"Feature store {feature_store} was written for different feature columns")
+        for tier in sizes.index:
+            if stored is None:
+                scaled = StandardScaler().fit_transform(tiers.get_group(tier))
+                shared = {'scaled': scaled}
+            else:
+                scaled = matrices[str(tier)]['features']
+                shared = {}
+                descriptors[tier] = {'scaled': os.path.join(stored, str(tier), 'features.npy')}
+            if knn_cache_dir is not None:
+                knn = cached_knn(scaled, max_neighbors, base_umap_params.get('metric', 'euclidean'),
+                                 base_umap_params.get('random_state'), knn_cache_dir, verbose=True)
+                shared['indices'] = knn['indices']
+                shared['dists'] = knn['dists']
+            descriptors.setdefault(tier, {})
+            for key, array in shared.items():
+                block, descriptors[tier][key] = share_array(array)
+                blocks.append(block)
+
+        # Spawn rather than fork: forking after numba's threads have started can deadlock
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context('spawn'),
+                                 initializer=warm_up_umap) as pool:
+            # Largest tier first so the slowest fits are not left for the end
+            futures = [pool.submit(_run_task, tier, descriptors[tier], umap_params, hdbscan_points)
+                       for tier in sizes.index for umap_params in umap_points]
+            for done, future in enumerate(as_completed(futures), 1):
+                rows.extend(future.result())
+                print(f"  {done}/{len(futures)} UMAP fits done", end='\r')
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = (pd.DataFrame(rows, columns=RESULT_COLUMNS)
+               .sort_values(['bank_tier', 'n_neighbors', 'min_dist', 'min_cluster_size', 'min_samples'])
+               .reset_index(drop=True))
+    print(f"\n✓ Sweep complete: {len(results)} runs in {time.perf_counter() - start:.1f}s")
+    return results
+
+
+def best_runs(results, score='silhouette', max_noise_fraction=0.5):
+    """
+    Best run per tier by ``score`` (lower is better for davies_bouldin).
+
+    Returns:
+    --------
+    best : DataFrame with one row per tier; ``umap_params_from`` and
+           ``hdbscan_params_from`` turn it into the per-tier settings
+           cluster_models.fit_tier_models takes
+    """
+    candidates = results[(results['noise_fraction'] <= max_noise_fraction) & results[score].notna()]
+    ascending = score == 'davies_bouldin'
+    return (candidates.sort_values(score, ascending=ascending)
+            .groupby('bank_tier', sort=True).head(1)
+            .sort_values('bank_tier')
+            .reset_index(drop=True))
+
+
+def umap_params_from(best, base_umap_params=UMAP_PARAMS):
+    """{tier: UMAP settings} with each tier's winning n_neighbors and min_dist from ``best_runs`` output."""
+    return {row['bank_tier']: {**base_umap_params, 'n_neighbors': int(row['n_neighbors']),
+                               'min_dist': float(row['min_dist'])}
+            for _, row in best.iterrows()}
+
+
+def hdbscan_params_from(best):
+    """{tier: {'min_cluster_size', 'min_samples'}} from ``best_runs`` output."""
+    params = {tier: dict(values) for tier, values in HDBSCAN_PARAMS.items()}
+    for _, row in best.iterrows():
+        params[row['bank_tier']] = {'min_cluster_size': int(row['min_cluster_size']),
+                                    'min_samples': int(row['min_samples'])}
+    return params
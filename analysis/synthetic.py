@@ -0,0 +1,328 @@
+"""
+SYNTHETIC CALL-REPORT PANELS
+============================
+Realistic stand-ins for the WRDS merged call-report panel at any size, and a
+benchmark suite that runs every pipeline stage on them at multiples of the
+current panel.
+
+``synthetic_call_reports`` writes the same raw columns the workflow reads
+(features.SOURCE_COLUMNS), dtyped like ``load_wrds_panel(compact=True)``:
+
+    assets      drawn to the current tier mix (TIER_MIX, from
+                cluster_summary_named.csv), skewed toward the bottom of each
+                tier's band, then a quarterly random walk, so some banks
+                cross tier thresholds
+    balance     RCON/RCFD stocks as bank-specific shares of assets
+    income      RIAD flows reported year-to-date (reset every Q1) as shares
+                of assets; each bank follows one of a few strategy archetypes
+                whose shares drift over time, giving the change scores
+                structure to cluster
+    2011 split  RCFD items reported before 2011 and RCON from 2011 on; banks
+                with foreign offices (part of the Large tier) keep filing
+                RCFD as well
+    gaps        banks entering after the first quarter and exiting through
+                mergers, skipped quarters, and incomplete filings: about 2%
+                of rows miss a few items, which keeps ~98% of rows complete
+                and ~0.14% of feature cells missing, as in the real panel
+                (extra columns are 0-40% missing)
+
+Size is set by ``n_banks``, ``n_quarters`` and ``extra_columns`` (additional
+dictionary fields, then generated RCON item codes).
+
+``benchmark_pipeline`` times each stage of pipeline.py from
+merge_split_columns through clustering at 1x, 10x and 100x the current panel
+(7,700 banks filing in 2010 and about 296,000 bank-quarters) and writes the per-scale run reports (instrument.py) as one JSON
+baseline; pass an earlier baseline to flag regressions. At 100x the raw
+panel is about 30 million rows, which needs tens of GB of memory.
+
+    python synthetic.py --scales 1 10 --baseline data/.run_reports/<old>.json
+"""
+
+import argparse
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from features import RCON_UNIVERSAL, RIAD_UNIVERSAL
+from instrument import RUN_REPORT_DIR, compare_reports, load_report, measure, new_report, write_report
+from pipeline import pipeline_stages, run_pipeline
+from schema import dictionary_column_types
+from split_columns import SPLIT_PAIRS
+from tiers import TIER_LABELS, TIER_THRESHOLDS
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Banks filing in the first quarter; with the exit rate below this gives the
+# current panel's ~296,000 bank-quarters over 2010-2021 and ~4,400 banks with 9+ years
+PANEL_BANKS = 7_700
+SPLIT_YEAR = 2011
+
+# Banks per tier in the current panel (Small 3,634 / Medium 630 / Large 120)
+TIER_MIX = {'Small': 0.829, 'Medium': 0.144, 'Large': 0.027}
+
+# Total assets band per tier, in thousands
+TIER_ASSET_BANDS = {
+    'Small': (30_000, TIER_THRESHOLDS[0]),
+    'Medium': TIER_THRESHOLDS,
+    'Large': (TIER_THRESHOLDS[1], 2_000_000_000),
+}
+
+FOREIGN_OFFICE_SHARE = 0.4   # of Large banks
+QUARTERLY_EXIT_RATE = 0.01   # mergers and failures
+LATE_ENTRY_SHARE = 0.03      # de novo banks, first report after the first quarter
+SKIPPED_QUARTER_RATE = 0.005
+INCOMPLETE_ROW_RATE = 0.02   # filings with some items missing
+INCOMPLETE_ITEM_RATE = 0.07  # share of items missing in such a filing
+
+# Balance-sheet items (merged split names and RCON columns): share of total assets
+STOCK_SHARES = {
+    'total_loans': 0.62,
+    'total_equity': 0.11,
+    'bank_equity_capital': 0.11,
+    'allowance_loan_losses': 0.009,
+    'agricultural_loans': 0.02,
+    'htm_securities': 0.04,
+    'afs_securities': 0.15,
+    'goodwill': 0.005,
+    'cash_items_process': 0.002,
+    'farmland_loans': 0.025,
+    'multifamily_loans': 0.03,
+    'cash_due_from_banks': 0.06,
+    'fed_funds_sold': 0.01,
+    'nonaccrual_loans': 0.008,
+    'real_estate_loans': 0.45,
+    'consumer_loans': 0.04,
+    'rcon2_rcon2200': 0.82,
+    'rcon2_rcon2202': 0.28,
+    'rcon2_rcon2215': 0.54,
+    'rcon2_rcon6631': 0.18,
+    'rcon1_rcon1766': 0.10,
+}
+
+# Income-statement items: annual flow as a share of total assets
+FLOW_SHARES = {
+    'riad4074': 0.032,
+    'riad4079': 0.009,
+    'riad4080': 0.003,
+    'riad4092': 0.004,
+    'riad4093': 0.028,
+    'riad4107': 0.038,
+    'riad4115': 0.0025,
+    'riad4135': 0.013,
+    'riad4230': 0.003,
+    'riad4340': 0.010,
+    'riad4415': 0.0004,
+    'riad4635': 0.003,
+}
+DEFAULT_FLOW_SHARE = 0.002
+DEFAULT_STOCK_SHARE = 0.01
+
+N_ARCHETYPES = 4
+ARCHETYPE_DRIFT = 0.06  # per-year log drift of a share, standard deviation across archetypes
+
+
+# ============================================================================
+# GENERATOR
+# ============================================================================
+
+def _segment_cumsum(values, starts):
+    """Cumulative sum restarting at every row flagged in ``starts`` (bool array)."""
+    total = np.cumsum(values, axis=0)
+    segment = np.maximum.accumulate(np.where(starts, np.arange(len(starts)), 0))
+    before = np.concatenate([np.zeros((1,) + values.shape[1:]), total[:-1]])
+    return total - before[segment]
+
+
+def extra_column_names(n, exclude=()):
+    """Dictionary fields not already generated, then made-up RCON item codes."""
+    exclude = set(exclude)
+    names = [col for col in dictionary_column_types()
+             if col.startswith(('riad', 'rcon', 'rcfd')) and col not in exclude][:n]
+    code = 9000
+    while len(names) < n:
+        name = f'rcon9_rcon{code}'
+        if name not in exclude:
+            names.append(name)
+        code += 1
+    return names
+
+
+def synthetic_call_reports(n_banks=PANEL_BANKS, n_quarters=48, start_year=2010, extra_columns=0,
+                           tier_mix=TIER_MIX, seed=42):
+    """
+    Synthetic raw call-report panel.
+
+    Parameters:
+    -----------
+    n_banks : banks filing in the first quarter (PANEL_BANKS is the current panel)
+    n_quarters : quarters from Q1 of ``start_year``
+    extra_columns : additional numeric columns beyond the workflow's source columns
+    tier_mix : {tier: share of banks} at the first report
+
+    Returns:
+    --------
+    raw : DataFrame with rssd9001, rssd9017, rssd9999 (report date), the
+          RIAD/RCON columns and RCFD/RCON split pairs, plus any extra columns
+    """
+    rng = np.random.default_rng(seed)
+
+    # Panel shape: late entry, exit through mergers, skipped quarters
+    first = np.where(rng.random(n_banks) < LATE_ENTRY_SHARE, rng.integers(1, n_quarters, n_banks), 0)
+    lifetime = rng.geometric(QUARTERLY_EXIT_RATE, n_banks) if QUARTERLY_EXIT_RATE else n_quarters
+    last = np.minimum(first + lifetime, n_quarters)
+    lengths = last - first
+    bank = np.repeat(np.arange(n_banks), lengths)
+    period = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + first[bank]
+    bank_start = np.zeros(len(bank), dtype=bool)
+    bank_start[np.cumsum(lengths) - lengths] = True
+    reported = rng.random(len(bank)) >= SKIPPED_QUARTER_RATE
+    incomplete = rng.random(len(bank)) < INCOMPLETE_ROW_RATE
+
+    year = start_year + period // 4
+    quarter = period % 4 + 1
+    years_in = period / 4.0
+
+    # Total assets: tier band at entry, then a random walk
+    tier = rng.choice(len(TIER_LABELS), size=n_banks, p=[tier_mix[label] for label in TIER_LABELS])
+    bands = np.log(np.array([TIER_ASSET_BANDS[label] for label in TIER_LABELS], dtype=float))
+    start_log = rng.triangular(bands[tier, 0], bands[tier, 0], bands[tier, 1])
+    growth = rng.normal(0.007, 0.008, n_banks)
+    steps = rng.normal(0, 0.025, len(bank)) + growth[bank]
+    steps[bank_start] = 0.0
+    assets = np.exp(start_log[bank] + _segment_cumsum(steps, bank_start))
+
+    # Shares of assets: bank level, archetype drift over time, quarterly noise
+    split_names = [new_name for _, _, new_name in SPLIT_PAIRS]
+    stock_items = split_names + RCON_UNIVERSAL
+    flow_items = list(RIAD_UNIVERSAL)
+    items = stock_items + flow_items
+    base = np.array([STOCK_SHARES.get(item, DEFAULT_STOCK_SHARE) for item in stock_items]
+                    + [FLOW_SHARES.get(item, DEFAULT_FLOW_SHARE) for item in flow_items])
+    archetype = rng.integers(0, N_ARCHETYPES, n_banks)
+    drift = rng.normal(0, ARCHETYPE_DRIFT, (N_ARCHETYPES, len(items)))
+    bank_level = rng.normal(0, 0.25, (n_banks, len(items)))
+
+    values = {}
+    year_start = bank_start | (quarter == 1)
+    for j, item in enumerate(items):
+        log_share = (np.log(base[j]) + bank_level[bank, j] + drift[archetype[bank], j] * years_in
+                     + rng.normal(0, 0.05, len(bank)))
+        if item == 'total_assets':
+            level = assets
+        elif j < len(stock_items):
+            level = assets * np.exp(log_share)
+        else:
+            # Year-to-date: quarterly flows summed since Q1
+            level = _segment_cumsum(assets * np.exp(log_share) / 4, year_start)
+        level = level.astype(np.float32)
+        level[incomplete & (rng.random(len(bank)) < INCOMPLETE_ITEM_RATE)] = np.nan
+        values[item] = level
+
+    # 2011 split: RCFD before, RCON after; banks with foreign offices keep RCFD
+    foreign = (tier == TIER_LABELS.index('Large')) & (rng.random(n_banks) < FOREIGN_OFFICE_SHARE)
+    after_split = year >= SPLIT_YEAR
+    rcfd_rows = ~after_split | foreign[bank]
+    columns = {}
+    for rcfd_col, rcon_col, new_name in SPLIT_PAIRS:
+        merged = values.pop(new_name)
+        columns[rcfd_col] = np.where(rcfd_rows, merged, np.float32(np.nan))
+        columns[rcon_col] = np.where(after_split, merged, np.float32(np.nan))
+    columns.update(values)
+
+    extras = extra_column_names(extra_columns, exclude=columns)
+    for name in extras:
+        level = (assets * np.exp(np.log(DEFAULT_STOCK_SHARE) + rng.normal(0, 0.5, n_banks)[bank])).astype(np.float32)
+        level[rng.random(len(bank)) < rng.uniform(0, 0.4)] = np.nan
+        columns[name] = level
+
+    ids = rng.choice(np.arange(10_000, 10_000 + 100 * n_banks), n_banks, replace=False)
+    dates = pd.Categorical([f'{y}-{3 * q:02d}-{30 if q in (2, 3) else 31}'
+                            for y, q in zip(year[reported], quarter[reported])])
+    raw = pd.DataFrame({
+        'rssd9001': ids[bank][reported].astype(np.int64),
+        'rssd9017': pd.Categorical.from_codes(bank[reported], [f'SYNTHETIC BANK {i:06d}' for i in range(n_banks)]),
+        'rssd9999': dates,
+    })
+    return pd.concat([raw, pd.DataFrame({name: col[reported] for name, col in columns.items()})], axis=1)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_pipeline(scales=(1, 10, 100), n_quarters=48, extra_columns=0, targets=None,
+                       baseline=None, report_dir=RUN_REPORT_DIR, seed=42):
+    """
+    Time every pipeline stage on synthetic panels at multiples of the current panel.
+
+    Parameters:
+    -----------
+    scales : multiples of PANEL_BANKS
+    targets : pipeline stages to run (default: all, through 'clusters')
+    baseline : path of an earlier benchmark JSON to compare against
+    report_dir : where the benchmark JSON is written (None to skip)
+
+    Returns:
+    --------
+    results : DataFrame with one row per (scale, stage): wall and CPU
+              seconds, peak RSS, rows in and out
+    """
+    print(f"\n{'='*80}")
+    print("PIPELINE SCALE BENCHMARK")
+    print(f"{'='*80}")
+
+    benchmark = new_report('benchmark')
+    benchmark['scales'] = {}
+    rows = []
+    for scale in scales:
+        report = new_report(f'{scale}x')
+        raw = measure(report, 'generate', synthetic_call_reports, PANEL_BANKS * scale, n_quarters,
+                      extra_columns=extra_columns, seed=seed + scale)
+        with tempfile.TemporaryDirectory() as workdir:
+            stages = pipeline_stages(feature_store_dir=os.path.join(workdir, 'feature_store'))
+            run_pipeline(stages, targets=targets, data={'load': raw}, cache_dir=workdir, quiet=True,
+                         report=report, report_dir=None, verbose=False)
+        del raw
+        for record in report['stages']:
+            record.pop('log', None)
+            rows.append({'scale': scale, **{key: record.get(key) for key in
+                         ('stage', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rows_in', 'rows_out')}})
+        benchmark['scales'][str(scale)] = report
+        print(f"\n{scale}x ({PANEL_BANKS * scale:,} banks, {report['stages'][0]['rows_out']:,} rows)")
+        for record in report['stages']:
+            print(f"  {record['stage']:<14} {record['wall_seconds']:>9.2f}s wall | "
+                  f"{record['cpu_seconds']:>9.2f}s CPU | {record['peak_rss_mb']:>9,.0f} MB peak")
+
+    benchmark['stages'] = []
+    if report_dir:
+        path = os.path.join(report_dir, f"{benchmark['started'].replace(':', '')}-benchmark.json")
+        os.makedirs(report_dir, exist_ok=True)
+        print(f"\n✓ Benchmark: {write_report(benchmark, path)}")
+
+    if baseline:
+        previous = load_report(baseline)['scales']
+        for scale, report in benchmark['scales'].items():
+            if scale not in previous:
+                continue
+            comparison = compare_reports(previous[scale], report)
+            flagged = comparison[comparison['regression']]
+            print(f"\n{scale}x vs baseline: {len(flagged)} regression(s)")
+            for row in flagged.itertuples():
+                print(f"⚠️  {row.stage:<14} {row.previous_seconds:.2f}s -> {row.current_seconds:.2f}s "
+                      f"({row.ratio:.2f}x)")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic call-report panels.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--quarters', type=int, default=48)
+    parser.add_argument('--extra-columns', type=int, default=0)
+    parser.add_argument('--targets', nargs='+', help="stages to run (default: all)")
+    parser.add_argument('--baseline', help="earlier benchmark JSON to compare against")
+    args = parser.parse_args()
+    benchmark_pipeline(args.scales, args.quarters, args.extra_columns, args.targets, args.baseline)
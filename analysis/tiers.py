@@ -0,0 +1,254 @@
+"""
+STICKY BANK TIERS
+=================
+Vectorized tier assignment for the quarterly call-report panel.
+
+A bank only changes tier after its raw (asset-threshold) tier has pointed at
+the same new tier for ``min_consecutive_quarters`` quarters in a row. The
+state machine is evaluated on run-lengths of raw tier codes, so the whole
+panel is processed with a handful of NumPy passes instead of one Python loop
+per bank.
+
+Run ``python tiers.py`` for a parity check against the original per-bank loop
+and a scaling benchmark.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Tier thresholds (in thousands) - upper bounds, exclusive
+TIER_THRESHOLDS = (1_000_000, 10_000_000)
+TIER_LABELS = ('Small', 'Medium', 'Large')
+
+# Code used for observations with missing assets
+MISSING_TIER = -1
+
+
+# ============================================================================
+# ARRAY ENGINE
+# ============================================================================
+
+def raw_tier_codes(assets, thresholds=TIER_THRESHOLDS):
+    """
+    Map asset values to integer tier codes.
+
+    Code ``i`` means ``thresholds[i-1] <= assets < thresholds[i]``; missing
+    assets get ``MISSING_TIER``.
+    """
+    assets = np.asarray(assets, dtype=float)
+    codes = np.searchsorted(np.asarray(thresholds, dtype=float), assets, side='right')
+    codes = codes.astype(np.int8)
+    codes[np.isnan(assets)] = MISSING_TIER
+    return codes
+
+
+def group_offsets(keys):
+    """
+    Start offsets of each contiguous block of equal ``keys``.
+
+    Returns an array of length ``n_groups + 1`` whose last entry is ``len(keys)``,
+    so group ``g`` occupies ``[offsets[g], offsets[g+1])``.
+    """
+    keys = np.asarray(keys)
+    n = len(keys)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    return np.concatenate(([0], starts, [n])).astype(np.int64)
+
+
+def sticky_tier_codes(raw, offsets, min_consecutive_quarters=3):
+    """
+    Apply the sticky-tier state machine to grouped raw tier codes.
+
+    Parameters:
+    -----------
+    raw : 1-D integer array of raw tier codes, sorted by (bank, time)
+    offsets : group offsets as returned by ``group_offsets``
+    min_consecutive_quarters : int, number of consecutive quarters needed to change tier
+
+    Returns:
+    --------
+    sticky : array of sticky tier codes aligned with ``raw``
+    n_changes : int, number of tier changes across all groups
+    """
+    raw = np.asarray(raw)
+    n = len(raw)
+    if n == 0:
+        return raw.copy(), 0
+
+    k = max(int(min_consecutive_quarters), 1)
+
+    group_start = np.zeros(n, dtype=bool)
+    starts = np.asarray(offsets[:-1])
+    group_start[starts[starts < n]] = True
+
+    # Runs of identical raw codes, never spanning two banks
+    is_run_start = group_start.copy()
+    is_run_start[1:] |= raw[1:] != raw[:-1]
+    run_starts = np.flatnonzero(is_run_start)
+    run_lengths = np.diff(np.append(run_starts, n))
+    run_values = raw[run_starts]
+    first_run = group_start[run_starts]
+
+    # A run sets the sticky tier if it opens the bank's history or lasts k quarters.
+    # The tier in force before each run is the value of the last such run.
+    qualifies = first_run | (run_lengths >= k)
+    run_idx = np.arange(len(run_starts))
+    last_qualifying = np.maximum.accumulate(np.where(qualifies, run_idx, 0))
+    prior_run = np.concatenate(([0], last_qualifying[:-1]))
+    prior_value = run_values[prior_run]
+
+    row_run = np.cumsum(is_run_start) - 1
+    position_in_run = np.arange(n) - run_starts[row_run]
+    switch_position = np.where(first_run, 0, k - 1)
+    takes_run_value = qualifies[row_run] & (position_in_run >= switch_position[row_run])
+    sticky = np.where(takes_run_value, run_values[row_run], prior_value[row_run])
+
+    n_changes = int(np.count_nonzero(qualifies & ~first_run & (run_values != prior_value)))
+    return sticky.astype(raw.dtype, copy=False), n_changes
+
+
+def tier_labels_from_codes(codes, labels=TIER_LABELS):
+    """Convert tier codes back to label strings (``None`` for missing)."""
+    lookup = np.array(list(labels) + [None], dtype=object)
+    codes = np.asarray(codes)
+    return lookup[np.where(codes == MISSING_TIER, len(labels), codes)]
+
+
+# ============================================================================
+# DATAFRAME INTERFACE
+# ============================================================================
+
+def assign_sticky_bank_tiers(df, asset_col='total_assets', min_consecutive_quarters=3,
+                             thresholds=TIER_THRESHOLDS, labels=TIER_LABELS,
+                             bank_col='rssd9001', offsets=None):
+    """
+    Assign bank tiers with stickiness - requires crossing threshold for
+    min_consecutive_quarters before tier changes.
+
+    Parameters:
+    -----------
+    df : DataFrame with columns [bank_col, year, quarter, asset_col]
+    asset_col : str, name of the assets column
+    min_consecutive_quarters : int, number of consecutive quarters needed to change tier
+    thresholds : ascending tier upper bounds (in thousands)
+    labels : tier names, one more than thresholds
+    bank_col : str, column identifying a bank
+    offsets : per-bank offsets from ``panel.build_panel``; when given, ``df`` is
+              taken to be sorted already and is not re-sorted or copied
+
+    Returns:
+    --------
+    df : DataFrame with new categorical 'bank_tier' column
+    """
+    if len(labels) != len(thresholds) + 1:
+        raise ValueError(f"Expected {len(thresholds) + 1} labels for {len(thresholds)} thresholds, "
+                         f"got {len(labels)}")
+
+    print(f"\n{'='*80}")
+    print(f"ASSIGNING STICKY BANK TIERS ({min_consecutive_quarters} consecutive quarters)")
+    print(f"{'='*80}")
+
+    if offsets is None:
+        # Sort by bank and time
+        df = df.sort_values([bank_col, 'year', 'quarter']).copy()
+        offsets = group_offsets(df[bank_col].to_numpy())
+    raw = raw_tier_codes(df[asset_col].to_numpy(), thresholds)
+    sticky, tier_changes = sticky_tier_codes(raw, offsets, min_consecutive_quarters)
+    df['bank_tier'] = pd.Categorical.from_codes(sticky, dtype=pd.CategoricalDtype(list(labels), ordered=True))
+
+    total_banks = len(offsets) - 1
+    print(f"✓ Processed {total_banks:,} banks")
+    print(f"✓ Total tier changes: {tier_changes:,}")
+    print(f"\nTier distribution:")
+    tier_counts = df.groupby('bank_tier', observed=True)[bank_col].nunique()
+    for tier in labels:
+        if tier in tier_counts.index:
+            count = tier_counts[tier]
+            pct = (count / total_banks) * 100
+            print(f"  {tier:8s}: {count:>6,} banks ({pct:>5.1f}%)")
+
+    return df
+
+
+# ============================================================================
+# PARITY CHECK AND BENCHMARK
+# ============================================================================
+
+def _reference_sticky_tiers(raw, offsets, min_consecutive_quarters=3):
+    """Original per-bank loop, kept only to verify the vectorized engine."""
+    sticky = np.empty_like(raw)
+    for g in range(len(offsets) - 1):
+        lo, hi = offsets[g], offsets[g + 1]
+        current_tier = raw[lo]
+        sticky[lo] = current_tier
+        consecutive_count = 0
+        potential_new_tier = None
+        for i in range(lo + 1, hi):
+            if raw[i] != current_tier:
+                if raw[i] == potential_new_tier:
+                    consecutive_count += 1
+                else:
+                    potential_new_tier = raw[i]
+                    consecutive_count = 1
+                if consecutive_count >= min_consecutive_quarters:
+                    current_tier = potential_new_tier
+                    consecutive_count = 0
+                    potential_new_tier = None
+            else:
+                consecutive_count = 0
+                potential_new_tier = None
+            sticky[i] = current_tier
+    return sticky
+
+
+def synthetic_asset_panel(n_banks, n_quarters=48, seed=42):
+    """Random-walk log assets around the tier thresholds, sorted by bank and quarter."""
+    rng = np.random.default_rng(seed)
+    start = rng.normal(np.log(2_000_000), 1.5, size=n_banks)
+    steps = rng.normal(0.01, 0.08, size=(n_banks, n_quarters))
+    assets = np.exp(start[:, None] + np.cumsum(steps, axis=1)).ravel()
+    assets[rng.random(assets.size) < 0.01] = np.nan
+    offsets = np.arange(n_banks + 1, dtype=np.int64) * n_quarters
+    return assets, offsets
+
+
+def benchmark_sticky_tiers(base_banks=4_384, n_quarters=48, scales=(1, 2, 5, 10),
+                           min_consecutive_quarters=3):
+    """Time the vectorized engine at multiples of the current panel size."""
+    print(f"\n{'='*80}")
+    print("STICKY TIER BENCHMARK")
+    print(f"{'='*80}")
+
+    assets, offsets = synthetic_asset_panel(500, n_quarters)
+    raw = raw_tier_codes(assets)
+    for k in (1, 2, 3, 4):
+        expected = _reference_sticky_tiers(raw, offsets, k)
+        actual, _ = sticky_tier_codes(raw, offsets, k)
+        if not np.array_equal(expected, actual):
+            raise AssertionError(f"Vectorized tiers differ from reference loop (k={k})")
+    print("✓ Matches reference loop on 500 synthetic banks (k = 1..4)")
+
+    print(f"\n{'Scale':>6} {'Rows':>12} {'Seconds':>10} {'ns/row':>10}")
+    print("-" * 42)
+    results = []
+    for scale in scales:
+        assets, offsets = synthetic_asset_panel(base_banks * scale, n_quarters, seed=scale)
+        start = time.perf_counter()
+        raw = raw_tier_codes(assets)
+        sticky_tier_codes(raw, offsets, min_consecutive_quarters)
+        elapsed = time.perf_counter() - start
+        results.append({'scale': scale, 'rows': len(assets), 'seconds': elapsed})
+        print(f"{scale:>5}x {len(assets):>12,} {elapsed:>10.3f} {elapsed / len(assets) * 1e9:>10.1f}")
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    benchmark_sticky_tiers()
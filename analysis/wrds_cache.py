@@ -0,0 +1,225 @@
+"""
+WRDS CALL-REPORT COLUMNAR CACHE
+===============================
+Converts the wide WRDS merged call-report CSVs into a Parquet dataset
+partitioned by report year, then serves column- and year-pruned reads.
+
+The CSV is parsed once per version of the file. Each cache directory is named
+after the SHA-256 of its source, so editing or replacing a CSV invalidates
+the old cache automatically. Hashes are remembered in a small manifest and
+only recomputed when the file's size or modification time changes.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+from features import SOURCE_COLUMNS
+from schema import apply_pandas_schema
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+CACHE_DIR = os.path.join(DATA_DIR, '.wrds_cache')
+MANIFEST_FILE = os.path.join(CACHE_DIR, 'manifest.json')
+
+WRDS_FILES = [
+    os.path.join(DATA_DIR, 'wrds_bank_data_MERGED_2010-2015.csv'),
+    os.path.join(DATA_DIR, 'wrds_bank_data_MERGED_2016-2021.csv'),
+]
+
+IDENTIFIER_COLUMNS = ['rssd9001', 'rssd9017', 'rssd9999']
+
+# Call-report schedules are numeric; everything else is kept as text
+NUMERIC_COLUMN_PATTERN = re.compile(r'^(riad|rcon|rcfd)', re.IGNORECASE)
+
+# Raw columns read by the Jdorval clustering workflow
+PIPELINE_COLUMNS = SOURCE_COLUMNS
+
+
+# ============================================================================
+# HASHING AND MANIFEST
+# ============================================================================
+
+def file_sha256(path, chunk_size=16 * 1024 * 1024):
+    """Stream a file through SHA-256."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _load_manifest():
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_manifest(manifest):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = MANIFEST_FILE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST_FILE)
+
+
+def source_hash(path, manifest):
+    """Return the file hash, reusing the manifest entry if size and mtime match."""
+    stat = os.stat(path)
+    entry = manifest.get(os.path.basename(path), {})
+    if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+        return entry['sha256']
+    return file_sha256(path)
+
+
+def cache_path(path, sha256):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{sha256[:16]}")
+
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def _csv_column_types(path):
+    """Pin column types so streamed blocks agree with each other."""
+    with open(path, newline='') as f:
+        header_names = next(csv.reader(f))
+    types = {}
+    for name in header_names:
+        if name == 'rssd9001':
+            types[name] = pa.int64()
+        elif NUMERIC_COLUMN_PATTERN.match(name):
+            types[name] = pa.float64()
+        else:
+            types[name] = pa.string()
+    return types
+
+
+def _with_year(batch, date_col='rssd9999'):
+    """Append the report year parsed from the leading digits of the report date."""
+    prefix = pc.utf8_slice_codeunits(batch.column(date_col), 0, 4)
+    is_year = pc.match_substring_regex(prefix, r'^\d{4}$')
+    year = pc.cast(pc.if_else(is_year, prefix, pa.scalar(None, pa.string())), pa.int32())
+    return pa.RecordBatch.from_arrays(batch.columns + [year], names=batch.schema.names + ['year'])
+
+
+def build_cache(path, sha256, block_size=64 * 1024 * 1024):
+    """Stream one CSV into a year-partitioned Parquet dataset."""
+    target = cache_path(path, sha256)
+    staging = target + '.building'
+    shutil.rmtree(staging, ignore_errors=True)
+
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(column_types=_csv_column_types(path),
+                                             null_values=['', 'NA', 'NaN', 'nan']),
+    )
+    schema = reader.schema.append(pa.field('year', pa.int32()))
+    batches = (_with_year(batch) for batch in reader)
+
+    ds.write_dataset(
+        batches,
+        staging,
+        schema=schema,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([('year', pa.int32())]), flavor='hive'),
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    os.replace(staging, target)
+    return target
+
+
+def ensure_cache(path, verbose=True):
+    """Return the cache directory for ``path``, building it if the source changed."""
+    manifest = _load_manifest()
+    name = os.path.basename(path)
+    sha256 = source_hash(path, manifest)
+    target = cache_path(path, sha256)
+
+    if not os.path.isdir(target):
+        if verbose:
+            print(f"  Building columnar cache for {name} (one-time)...")
+        # Drop caches built from earlier versions of this file
+        stale = manifest.get(name, {}).get('sha256')
+        if stale and stale != sha256:
+            shutil.rmtree(cache_path(path, stale), ignore_errors=True)
+        build_cache(path, sha256)
+
+    stat = os.stat(path)
+    manifest[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    _save_manifest(manifest)
+    return target
+
+
+# ============================================================================
+# READ
+# ============================================================================
+
+def load_wrds_panel(sources=None, columns=None, years=None, compact=True, verbose=True):
+    """
+    Load WRDS call-report data from the columnar cache.
+
+    Parameters:
+    -----------
+    sources : list of CSV paths (defaults to the two WRDS merged files)
+    columns : list of columns to read; identifiers are always included.
+              None reads every column.
+    years : optional (first_year, last_year) inclusive range
+    compact : bool, apply the compact dtype schema (schema.py): float32
+              amounts, categorical names and report dates, small integers
+    verbose : bool, print progress
+
+    Returns:
+    --------
+    df : pandas DataFrame with the requested columns plus 'year'
+    """
+    sources = WRDS_FILES if sources is None else sources
+
+    if verbose:
+        print(f"\n{'='*80}")
+        print("LOADING WRDS CALL-REPORT DATA (COLUMNAR CACHE)")
+        print(f"{'='*80}")
+
+    row_filter = None
+    if years is not None:
+        first_year, last_year = years
+        row_filter = (ds.field('year') >= first_year) & (ds.field('year') <= last_year)
+
+    tables = []
+    for path in sources:
+        dataset = ds.dataset(ensure_cache(path, verbose), format='parquet', partitioning='hive')
+        available = set(dataset.schema.names)
+        if columns is None:
+            wanted = dataset.schema.names
+        else:
+            requested = list(dict.fromkeys(IDENTIFIER_COLUMNS + list(columns) + ['year']))
+            wanted = [col for col in requested if col in available]
+            missing = [col for col in requested if col not in available]
+            if missing and verbose:
+                print(f"  ⚠️  {os.path.basename(path)}: {len(missing)} columns not found: {missing}")
+        table = dataset.to_table(columns=wanted, filter=row_filter)
+        tables.append(table)
+        if verbose:
+            print(f"✓ {os.path.basename(path):45s} | {table.num_rows:>9,} rows | {len(wanted):>4} columns")
+
+    df = pa.concat_tables(tables, promote_options='default').to_pandas()
+    if compact:
+        df = apply_pandas_schema(df)
+    if verbose:
+        print(f"\n✓ Loaded {len(df):,} rows x {len(df.columns)} columns "
+              f"({df.memory_usage(deep=True).sum() / 1e6:,.1f} MB)")
+    return df
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+BANK INNOVATION DATASET - STREAMING PROFILER
+============================================
+Single pass over bank_innovation_dataset_FINAL.csv in fixed-size chunks,
+computing the statistics help.py prints and puts in the data dictionary:
+row count, unique banks, year range, per-column and per-year completeness,
+numeric min/max and approximate quantiles.
+
+Memory depends on the chunk size, the number of columns, years and banks -
+not on the number of rows. Quantiles come from a mergeable compactor sketch
+(KLL-style), whose rank error is about 1/k of the row count for k = SKETCH_SIZE.
+
+The finished profile is written next to the data as
+<file>.stats.json, keyed by the file's SHA-256, and reused until the file
+changes.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis'))
+from wrds_cache import file_sha256
+
+CHUNK_SIZE = 100_000
+SKETCH_SIZE = 512
+PROFILE_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+BANK_COL = 'RSSD_ID'
+YEAR_COL = 'Year'
+
+
+def sidecar_path(data_file):
+    return f"{data_file}.stats.json"
+
+
+# ============================================================================
+# QUANTILE SKETCH
+# ============================================================================
+
+class QuantileSketch:
+    """
+    Compactor quantile sketch.
+
+    Level h holds items of weight 2**h. When a level reaches ``k`` items it is
+    sorted and every other item (random offset) moves up a level, so memory
+    stays O(k log(n / k)).
+    """
+
+    def __init__(self, k=SKETCH_SIZE, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) >= self.k:
+                items = np.sort(self.levels[h])
+                # An odd item out stays at this level with its own weight
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                items = items[:len(items) - len(keep)]
+                promoted = items[self._rng.integers(2)::2]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h] = keep
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def quantiles(self, qs):
+        if not self.count:
+            return [None] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='mergesort')
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, np.asarray(qs) * cumulative[-1], side='left')
+        return items[np.minimum(positions, len(items) - 1)].tolist()
+
+
+# ============================================================================
+# PROFILER
+# ============================================================================
+
+def _stream_profile(data_file, chunk_size, quantiles):
+    total_records = 0
+    columns = None
+    non_null = None
+    banks = set()
+    year_min, year_max = np.inf, -np.inf
+    year_rows = {}
+    year_non_null = {}
+    minima, maxima, sketches = {}, {}, {}
+
+    for chunk in pd.read_csv(data_file, chunksize=chunk_size, low_memory=False):
+        if columns is None:
+            columns = list(chunk.columns)
+            non_null = pd.Series(0, index=columns, dtype='int64')
+        total_records += len(chunk)
+        present = chunk.notna()
+        non_null += present.sum()
+
+        if BANK_COL in chunk.columns:
+            banks.update(chunk[BANK_COL].dropna().unique().tolist())
+
+        if YEAR_COL in chunk.columns:
+            years = pd.to_numeric(chunk[YEAR_COL], errors='coerce')
+            if years.notna().any():
+                year_min = min(year_min, years.min())
+                year_max = max(year_max, years.max())
+            by_year = present.groupby(years).sum()
+            rows_by_year = years.value_counts()
+            for year, counts in by_year.iterrows():
+                key = int(year)
+                year_rows[key] = year_rows.get(key, 0) + int(rows_by_year[year])
+                year_non_null[key] = year_non_null.get(key, 0) + counts
+
+        for col in chunk.select_dtypes(include='number').columns:
+            values = chunk[col].to_numpy(dtype=float)
+            if np.isnan(values).all():
+                continue
+            minima[col] = min(minima.get(col, np.inf), np.nanmin(values))
+            maxima[col] = max(maxima.get(col, -np.inf), np.nanmax(values))
+            sketches.setdefault(col, QuantileSketch()).update(values)
+
+    if columns is None:
+        columns = list(pd.read_csv(data_file, nrows=0).columns)
+        non_null = pd.Series(0, index=columns, dtype='int64')
+
+    def pct(count, rows):
+        return 100 * float(count) / rows if rows else 0.0
+
+    return {
+        'total_records': total_records,
+        'unique_banks': len(banks),
+        'year_range': f"{year_min:.0f}-{year_max:.0f}" if np.isfinite(year_min) else 'N/A',
+        'total_columns': len(columns),
+        'completeness': {col: pct(non_null[col], total_records) for col in columns},
+        'year_completeness': {
+            str(year): {col: pct(year_non_null[year][col], year_rows[year]) for col in columns}
+            for year in sorted(year_rows)
+        },
+        'numeric': {
+            col: {
+                'min': float(minima[col]),
+                'max': float(maxima[col]),
+                'quantiles': dict(zip([str(q) for q in quantiles], sketches[col].quantiles(quantiles))),
+            }
+            for col in minima
+        },
+    }
+
+
+def profile_dataset(data_file, chunk_size=CHUNK_SIZE, quantiles=PROFILE_QUANTILES, refresh=False,
+                    verbose=True):
+    """
+    Streaming profile of ``data_file``, cached in a sidecar keyed by file hash.
+
+    Returns:
+    --------
+    stats : dict with total_records, unique_banks, year_range, total_columns,
+            completeness (all columns), year_completeness and numeric
+            (min, max, quantiles); None if the file does not exist
+    """
+    if not os.path.exists(data_file):
+        return None
+
+    file_hash = file_sha256(data_file)
+    sidecar = sidecar_path(data_file)
+    if not refresh and os.path.exists(sidecar):
+        with open(sidecar) as f:
+            cached = json.load(f)
+        if cached.get('sha256') == file_hash and cached.get('quantiles') == list(quantiles):
+            if verbose:
+                print(f"✓ Using cached profile: {sidecar}")
+            return cached['stats']
+
+    if verbose:
+        print(f"Profiling {data_file} in chunks of {chunk_size:,} rows...")
+    stats = _stream_profile(data_file, chunk_size, quantiles)
+    with open(sidecar, 'w') as f:
+        json.dump({'sha256': file_hash, 'quantiles': list(quantiles), 'stats': stats}, f, indent=1)
+    if verbose:
+        print(f"✓ Profile written to {sidecar}")
+    return stats
+
+
+if __name__ == "__main__":
+    profile = profile_dataset(sys.argv[1], refresh='--refresh' in sys.argv)
+    if profile is None:
+        print(f"✗ Dataset not found: {sys.argv[1]}")
+    else:
+        print(json.dumps({key: profile[key] for key in
+                          ('total_records', 'unique_banks', 'year_range', 'total_columns')}, indent=2))
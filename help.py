@@ -19,7 +19,16 @@ from reportlab.platypus import (
 )
 from reportlab.lib import colors
 from datetime import datetime
+import html
+import io
 import os
+import sys
+import time
+
+from dataset_stats import profile_dataset
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis'))
+from instrument import measure, new_report, print_report, write_report
 
 # ============================================================================
 # CONFIGURATION
@@ -30,6 +39,14 @@ FINAL_PROJECT_DIR = r"C:\Users\jdorv\Coding Fun\Bank Innovation\Final-project"
 DATA_FILE = os.path.join(FINAL_PROJECT_DIR, "data", "bank_innovation_dataset_FINAL.csv")
 OUTPUT_PDF = os.path.join(FINAL_PROJECT_DIR, "data", "Data_Dictionary.pdf")
 
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DICTIONARY_FILE = os.path.join(REPO_DIR, "COMPLETE_DATA_DICTIONARY_180_FIELDS.csv")
+OUTPUT_MD = os.path.join(REPO_DIR, "report", "data_dictionary.md")
+OUTPUT_HTML = os.path.join(REPO_DIR, "report", "data_dictionary.html")
+
+# Fields per consolidated table in the PDF (reportlab lays out long tables slowly)
+FIELDS_PER_TABLE = 40
+
 # ============================================================================
 # FIELD DEFINITIONS
 # ============================================================================
@@ -325,31 +342,127 @@ FIELD_DEFINITIONS = {
     }
 }
 
+# Raw WRDS call-report fields from COMPLETE_DATA_DICTIONARY_180_FIELDS.csv
+TABLE_SOURCES = {
+    'ALL': 'WRDS Identifiers',
+    'RCFD': 'Call Report RCFD (Consolidated)',
+    'RCON': 'Call Report RCON (Domestic)',
+    'RIAD': 'Call Report RIAD (Income Statement)',
+}
+
+SOURCE_ORDER = [
+    'Identifier',
+    'FFIEC Call Report',
+    'SOD (Summary of Deposits)',
+    'SOD (Calculated)',
+    'Edgar SEC Filings',
+    'Edgar (Derived)',
+    'Calculated',
+] + list(TABLE_SOURCES.values())
+
+
+def load_dictionary_fields(dictionary_file=DICTIONARY_FILE):
+    """Raw WRDS fields from the data dictionary CSV, keyed by WRDS column name."""
+    fields = pd.read_csv(dictionary_file, dtype=str).fillna('')
+    definitions = {}
+    for row in fields.itertuples(index=False):
+        table = row.Table
+        column = row.Field_ID if table == 'ALL' else f"{table.lower().replace('_', '')}_{row.Field_ID.lower()}"
+        currency = row.Data_Type.startswith('Currency')
+        definitions[column] = {
+            'source': TABLE_SOURCES.get(table.split('_')[0], table),
+            'description': row.Description,
+            'type': 'Float' if currency else row.Data_Type,
+            'unit': 'Thousands of USD' if currency else 'N/A',
+            'example': 'N/A',
+            'table': table,
+            'importance': row.Importance,
+            'innovation_metric': 'YES' in row.Innovation_Metric.upper(),
+        }
+    return definitions
+
+
+def all_field_definitions(dictionary_file=DICTIONARY_FILE):
+    """Final-dataset fields followed by every raw field in the data dictionary CSV."""
+    fields = dict(FIELD_DEFINITIONS)
+    if os.path.exists(dictionary_file):
+        fields.update(load_dictionary_fields(dictionary_file))
+    return fields
+
+
+def fields_by_source(fields):
+    """{source: {field: info}} in SOURCE_ORDER (unknown sources last)."""
+    grouped = {}
+    for field_name, field_info in fields.items():
+        grouped.setdefault(field_info['source'], {})[field_name] = field_info
+    order = SOURCE_ORDER + [source for source in grouped if source not in SOURCE_ORDER]
+    return {source: grouped[source] for source in order if source in grouped}
+
+
+def field_notes(field_info):
+    """Example / importance line shown under a field's description."""
+    notes = []
+    if field_info.get('example', 'N/A') != 'N/A':
+        notes.append(f"Example: {field_info['example']}")
+    if field_info.get('table'):
+        notes.append(f"Table: {field_info['table']}")
+    if field_info.get('importance'):
+        notes.append(f"Importance: {field_info['importance']}")
+    if field_info.get('innovation_metric'):
+        notes.append("Innovation metric")
+    return ' · '.join(notes)
+
+
+# ============================================================================
+# SHARED TABLE STYLES
+# ============================================================================
+
+HEADER_BLUE = HexColor('#4472C4')
+ROW_SHADE = HexColor('#F2F2F2')
+
+FIELD_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, ROW_SHADE]),
+    ('LEFTPADDING', (0, 0), (-1, -1), 3),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+    ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+COMPLETENESS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, ROW_SHADE]),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+])
+
+
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
 def get_data_statistics(data_file):
-    """Load dataset and compute statistics."""
-    if not os.path.exists(data_file):
+    """Compute dataset statistics with the streaming profiler (cached per file hash)."""
+    stats = profile_dataset(data_file)
+    if stats is None:
         return None
     
-    df = pd.read_csv(data_file)
-    
-    stats = {
-        'total_records': len(df),
-        'unique_banks': df['RSSD_ID'].nunique() if 'RSSD_ID' in df.columns else 0,
-        'year_range': f"{df['Year'].min():.0f}-{df['Year'].max():.0f}" if 'Year' in df.columns else 'N/A',
-        'total_columns': len(df.columns),
-        'completeness': {}
-    }
-    
-    # Calculate completeness for key fields
-    for col in df.columns:
-        if col in FIELD_DEFINITIONS:
-            stats['completeness'][col] = 100 * df[col].notna().sum() / len(df)
-    
-    return stats, df
+    # Completeness for documented fields only
+    stats['completeness'] = {col: pct for col, pct in stats['completeness'].items()
+                             if col in FIELD_DEFINITIONS}
+    return stats
 
 
 def create_title_page(story, styles):
@@ -478,41 +591,36 @@ def create_overview_section(story, styles, stats):
 
 
 def create_field_section(story, styles, source_name, fields_dict):
-    """Create a section for fields from a specific source."""
-    story.append(Paragraph(f"<b>{source_name}</b>", styles['Heading2']))
+    """Create a section for fields from a specific source (a few consolidated tables)."""
+    story.append(Paragraph(f"<b>{source_name}</b> ({len(fields_dict)} fields)", styles['Heading2']))
     story.append(Spacer(1, 0.15*inch))
     
+    header = [Paragraph('<b>Field</b>', styles['FieldHeader']),
+              Paragraph('<b>Type / Unit</b>', styles['FieldHeader']),
+              Paragraph('<b>Description</b>', styles['FieldHeader'])]
+    rows = []
     for field_name, field_info in fields_dict.items():
-        # Field name and type
-        field_header = f"<b>{field_name}</b> ({field_info['type']})"
-        story.append(Paragraph(field_header, styles['FieldName']))
-        
-        # Create info table
-        info_data = [
-            ['<b>Unit:</b>', field_info['unit']],
-            ['<b>Example:</b>', field_info['example']],
-            ['<b>Description:</b>', field_info['description']]
-        ]
-        
-        info_table = Table(info_data, colWidths=[1*inch, 5*inch])
-        info_table.setStyle(TableStyle([
-            ('FONT', (0, 0), (0, -1), 'Helvetica-Bold', 9),
-            ('FONT', (1, 0), (-1, -1), 'Helvetica', 9),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        
-        story.append(info_table)
+        description = field_info['description']
+        notes = field_notes(field_info)
+        if notes:
+            description += f"<br/><i>{notes}</i>"
+        rows.append([
+            Paragraph(f"<b>{field_name}</b>", styles['FieldCell']),
+            Paragraph(f"{field_info['type']}<br/>{field_info['unit']}", styles['FieldCell']),
+            Paragraph(description, styles['FieldCell']),
+        ])
+    
+    for i in range(0, len(rows), FIELDS_PER_TABLE):
+        field_table = Table([header] + rows[i:i + FIELDS_PER_TABLE],
+                            colWidths=[1.6*inch, 1.2*inch, 4.2*inch], repeatRows=1)
+        field_table.setStyle(FIELD_TABLE_STYLE)
+        story.append(field_table)
         story.append(Spacer(1, 0.15*inch))
     
     story.append(Spacer(1, 0.1*inch))
 
 
-def create_data_quality_section(story, styles, stats):
+def create_data_quality_section(story, styles, stats, fields=FIELD_DEFINITIONS):
     """Create data quality section."""
     story.append(Paragraph("<b>3. DATA QUALITY METRICS</b>", styles['Heading1']))
     story.append(Spacer(1, 0.2*inch))
@@ -529,12 +637,8 @@ def create_data_quality_section(story, styles, stats):
     story.append(Spacer(1, 0.1*inch))
     
     # Group by source and create tables
-    sources = ['Identifier', 'FFIEC Call Report', 'SOD (Summary of Deposits)', 
-               'SOD (Calculated)', 'Edgar SEC Filings', 'Edgar (Derived)', 'Calculated']
-    
-    for source in sources:
-        source_fields = {k: v for k, v in FIELD_DEFINITIONS.items() if v['source'] == source}
-        if not source_fields:
+    for source, source_fields in fields_by_source(fields).items():
+        if not any(field_name in stats['completeness'] for field_name in source_fields):
             continue
         
         story.append(Paragraph(f"<b>{source}</b>", styles['Normal']))
@@ -549,18 +653,7 @@ def create_data_quality_section(story, styles, stats):
         
         if len(completeness_data) > 1:
             comp_table = Table(completeness_data, colWidths=[3.5*inch, 1.5*inch])
-            comp_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), HexColor('#4472C4')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
-                ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
-                ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-                ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, HexColor('#F2F2F2')]),
-                ('TOPPADDING', (0, 0), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ]))
+            comp_table.setStyle(COMPLETENESS_TABLE_STYLE)
             story.append(comp_table)
             story.append(Spacer(1, 0.15*inch))
     
@@ -647,34 +740,84 @@ def create_usage_notes(story, styles):
     story.append(Paragraph(citation_text, styles['Normal']))
 
 
+# ============================================================================
+# MARKDOWN / HTML OUTPUT
+# ============================================================================
+
+def _markdown_cell(text):
+    return str(text).replace('|', '\\|').replace('\n', ' ')
+
+
+def render_markdown(fields, stats=None):
+    """Data dictionary as Markdown (one table per source), for the Quarto report."""
+    lines = ["# Bank Innovation Dataset - Data Dictionary", ""]
+    if stats:
+        lines += [f"{stats['total_records']:,} bank-year observations, {stats['unique_banks']:,} unique banks, "
+                  f"{stats['year_range']}, {stats['total_columns']} columns.", ""]
+    for source, source_fields in fields_by_source(fields).items():
+        lines += [f"## {source}", "", "| Field | Type | Unit | Description | Notes |",
+                  "|---|---|---|---|---|"]
+        for field_name, field_info in source_fields.items():
+            lines.append("| " + " | ".join(_markdown_cell(value) for value in (
+                f"`{field_name}`", field_info['type'], field_info['unit'],
+                field_info['description'], field_notes(field_info))) + " |")
+        lines.append("")
+    if stats and stats.get('completeness'):
+        lines += ["## Field Completeness", "", "| Field | Completeness |", "|---|---:|"]
+        lines += [f"| `{col}` | {pct:.1f}% |" for col, pct in sorted(stats['completeness'].items())]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def render_html(fields, stats=None):
+    """Data dictionary as a standalone HTML page with one shared stylesheet."""
+    parts = [
+        "<!DOCTYPE html>",
+        "<html><head><meta charset='utf-8'><title>Bank Innovation Dataset - Data Dictionary</title>",
+        "<style>",
+        "body{font-family:Helvetica,Arial,sans-serif;margin:2em;color:#222}",
+        "h1{color:#1F4E78}h2{color:#4472C4}",
+        "table{border-collapse:collapse;width:100%;margin-bottom:1.5em;font-size:0.85em}",
+        "th{background:#4472C4;color:#fff;text-align:left}",
+        "th,td{border:1px solid #999;padding:4px;vertical-align:top}",
+        "tr:nth-child(even) td{background:#F2F2F2}",
+        "td.notes{font-style:italic}",
+        "</style></head><body>",
+        "<h1>Bank Innovation Dataset - Data Dictionary</h1>",
+    ]
+    if stats:
+        parts.append(f"<p>{stats['total_records']:,} bank-year observations, {stats['unique_banks']:,} unique "
+                     f"banks, {html.escape(stats['year_range'])}, {stats['total_columns']} columns.</p>")
+    for source, source_fields in fields_by_source(fields).items():
+        parts.append(f"<h2>{html.escape(source)}</h2>")
+        parts.append("<table><tr><th>Field</th><th>Type</th><th>Unit</th><th>Description</th><th>Notes</th></tr>")
+        parts.extend(
+            f"<tr><td><code>{html.escape(field_name)}</code></td><td>{html.escape(field_info['type'])}</td>"
+            f"<td>{html.escape(field_info['unit'])}</td><td>{html.escape(field_info['description'])}</td>"
+            f"<td class='notes'>{html.escape(field_notes(field_info))}</td></tr>"
+            for field_name, field_info in source_fields.items()
+        )
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def write_text_dictionaries(fields, stats=None, output_md=OUTPUT_MD, output_html=OUTPUT_HTML):
+    """Write the Markdown and HTML data dictionaries."""
+    for path, text in ((output_md, render_markdown(fields, stats)), (output_html, render_html(fields, stats))):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"✓ Wrote {path}")
+
+
 # ============================================================================
 # MAIN PDF GENERATION
 # ============================================================================
 
-def create_data_dictionary_pdf(data_file, output_pdf):
-    """Generate the complete data dictionary PDF."""
-    print("="*80)
-    print("GENERATING DATA DICTIONARY PDF")
-    print("="*80)
-    
-    # Load data and compute statistics
-    print(f"\nLoading dataset: {data_file}")
-    stats, df = get_data_statistics(data_file)
-    
-    if stats is None:
-        print(f"✗ Dataset not found: {data_file}")
-        print("  Please ensure the integration script has been run.")
-        return
-    
-    print(f"✓ Loaded dataset:")
-    print(f"  - {stats['total_records']:,} records")
-    print(f"  - {stats['unique_banks']:,} unique banks")
-    print(f"  - {stats['total_columns']} columns")
-    print(f"  - Years: {stats['year_range']}")
-    
-    # Create PDF
-    print(f"\nGenerating PDF: {output_pdf}")
-    doc = SimpleDocTemplate(
+def create_document(output_pdf):
+    """Letter-size document template (output_pdf may be a path or a file object)."""
+    return SimpleDocTemplate(
         output_pdf,
         pagesize=letter,
         rightMargin=0.75*inch,
@@ -682,8 +825,10 @@ def create_data_dictionary_pdf(data_file, output_pdf):
         topMargin=0.75*inch,
         bottomMargin=0.75*inch
     )
-    
-    # Custom styles
+
+
+def create_styles():
+    """Paragraph styles shared by every section."""
     styles = getSampleStyleSheet()
     
     # Title style
@@ -732,58 +877,100 @@ def create_data_dictionary_pdf(data_file, output_pdf):
     styles['Normal'].leading = 14
     styles['Normal'].alignment = TA_JUSTIFY
     
-    # Build document
+    # Consolidated field table cells
+    styles.add(ParagraphStyle(
+        name='FieldCell',
+        parent=styles['Normal'],
+        fontSize=8,
+        leading=10,
+        alignment=TA_LEFT
+    ))
+    styles.add(ParagraphStyle(
+        name='FieldHeader',
+        parent=styles['FieldCell'],
+        fontSize=9,
+        textColor=colors.white,
+        fontName='Helvetica-Bold'
+    ))
+    
+    return styles
+
+
+def build_story(stats, styles, fields=None, verbose=True):
+    """Flowables for the whole dictionary: title, overview, fields, quality, usage."""
+    fields = all_field_definitions() if fields is None else fields
+    log = print if verbose else (lambda *args: None)
+    
     story = []
     
     # Title page
-    print("  Creating title page...")
+    log("  Creating title page...")
     create_title_page(story, styles)
     
     # Overview
-    print("  Creating overview section...")
+    log("  Creating overview section...")
     create_overview_section(story, styles, stats)
     
     # Field definitions by source
-    print("  Creating field definitions...")
+    log(f"  Creating field definitions ({len(fields)} fields)...")
     story.append(Paragraph("<b>2. FIELD DEFINITIONS</b>", styles['Heading1']))
     story.append(Spacer(1, 0.2*inch))
     
-    # Group fields by source
-    sources = {}
-    for field_name, field_info in FIELD_DEFINITIONS.items():
-        source = field_info['source']
-        if source not in sources:
-            sources[source] = {}
-        sources[source][field_name] = field_info
-    
-    # Order sources logically
-    source_order = [
-        'Identifier',
-        'FFIEC Call Report', 
-        'SOD (Summary of Deposits)',
-        'SOD (Calculated)',
-        'Edgar SEC Filings',
-        'Edgar (Derived)',
-        'Calculated'
-    ]
-    
-    for source in source_order:
-        if source in sources:
-            create_field_section(story, styles, source, sources[source])
-            if source != source_order[-1]:
-                story.append(PageBreak())
+    sources = fields_by_source(fields)
+    for i, (source, source_fields) in enumerate(sources.items()):
+        create_field_section(story, styles, source, source_fields)
+        if i < len(sources) - 1:
+            story.append(PageBreak())
     
     # Data quality
-    print("  Creating data quality section...")
-    create_data_quality_section(story, styles, stats)
+    log("  Creating data quality section...")
+    create_data_quality_section(story, styles, stats, fields)
     
     # Usage notes
-    print("  Creating usage notes...")
+    log("  Creating usage notes...")
     create_usage_notes(story, styles)
+    return story
+
+
+def create_data_dictionary_pdf(data_file, output_pdf, report=None):
+    """
+    Generate the complete data dictionary PDF.
+
+    ``report`` (instrument.new_report) receives the profile, story and PDF
+    build steps with their wall/CPU time and peak memory. Returns the dataset
+    statistics (None if the dataset is missing) so callers can reuse them.
+    """
+    print("="*80)
+    print("GENERATING DATA DICTIONARY PDF")
+    print("="*80)
+    
+    # Profile data (reuses the cached stats sidecar when the file is unchanged)
+    print(f"\nProfiling dataset: {data_file}")
+    stats = measure(report, 'profile_dataset', get_data_statistics, data_file)
+    
+    if stats is None:
+        print(f"✗ Dataset not found: {data_file}")
+        print("  Please ensure the integration script has been run.")
+        return None
+    
+    print(f"✓ Loaded dataset:")
+    print(f"  - {stats['total_records']:,} records")
+    print(f"  - {stats['unique_banks']:,} unique banks")
+    print(f"  - {stats['total_columns']} columns")
+    print(f"  - Years: {stats['year_range']}")
+    
+    # Create PDF
+    print(f"\nGenerating PDF: {output_pdf}")
+    doc = create_document(output_pdf)
+    
+    styles = create_styles()
+    
+    # Build document
+    story = measure(report, 'build_story', build_story, stats, styles)
     
     # Build PDF
     print("\n  Building PDF document...")
-    doc.build(story)
+    measure(report, 'build_pdf', doc.build, story)
     
     print(f"\n✓ PDF generated successfully!")
     print(f"  Location: {output_pdf}")
@@ -795,7 +982,49 @@ def create_data_dictionary_pdf(data_file, output_pdf):
     print("\n" + "="*80)
     print("DATA DICTIONARY COMPLETE")
     print("="*80)
+    return stats
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def benchmark_data_dictionary(n_runs=3):
+    """Time PDF, Markdown and HTML generation for every field in the dictionary CSV."""
+    fields = all_field_definitions()
+    stats = {
+        'total_records': 0, 'unique_banks': 0, 'year_range': '2010-2021',
+        'total_columns': len(fields),
+        'completeness': {field_name: 100.0 for field_name in fields},
+    }
+    print(f"Benchmarking data dictionary generation: {len(fields)} fields, {n_runs} runs")
+    
+    timings = {'pdf': [], 'markdown': [], 'html': []}
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        create_document(io.BytesIO()).build(build_story(stats, create_styles(), fields, verbose=False))
+        timings['pdf'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        render_markdown(fields, stats)
+        timings['markdown'].append(time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        render_html(fields, stats)
+        timings['html'].append(time.perf_counter() - start)
+    
+    for output, seconds in timings.items():
+        print(f"  {output:9s} best {min(seconds):.3f}s | mean {sum(seconds) / len(seconds):.3f}s")
+    return timings
 
 
 if __name__ == "__main__":
-    create_data_dictionary_pdf(DATA_FILE, OUTPUT_PDF)
\ No newline at end of file
+    if '--benchmark' in sys.argv:
+        benchmark_data_dictionary()
+    else:
+        run_report = new_report('data_dictionary')
+        stats = create_data_dictionary_pdf(DATA_FILE, OUTPUT_PDF, report=run_report)
+        measure(run_report, 'text_dictionaries', write_text_dictionaries,
+                all_field_definitions(), stats)
+        print_report(run_report)
+        print(f"✓ Run report: {write_report(run_report)}")
\ No newline at end of file